@@ -0,0 +1,49 @@
+"""Create counters
+
+Revision ID: 3f9c1d2a7b64
+Revises: 85a421dad9ec
+Create Date: 2026-10-19 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1d2a7b64'
+down_revision: Union[str, Sequence[str], None] = '85a421dad9ec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.Enum('owner_posts', 'access_posts', 'role_active_users', name='counterscopeenum'), nullable=False),
+    sa.Column('key', sa.String(length=60), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('scope', 'key', name='uq_counters_scope_key')
+    )
+    # Начальное заполнение счётчиков по существующим данным
+    op.execute(
+        "INSERT INTO counters (scope, key, value) "
+        "SELECT 'owner_posts', CAST(owner_id AS VARCHAR), COUNT(*) FROM posts GROUP BY owner_id"
+    )
+    op.execute(
+        "INSERT INTO counters (scope, key, value) "
+        "SELECT 'access_posts', CAST(required_access_id AS VARCHAR), COUNT(*) FROM posts GROUP BY required_access_id"
+    )
+    op.execute(
+        "INSERT INTO counters (scope, key, value) "
+        "SELECT 'role_active_users', CAST(role AS VARCHAR), COUNT(*) FROM users WHERE is_active GROUP BY role"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('counters')
+    sa.Enum(name='counterscopeenum').drop(op.get_bind(), checkfirst=True)
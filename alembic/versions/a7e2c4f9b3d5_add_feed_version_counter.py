@@ -0,0 +1,32 @@
+"""Add feed version counter
+
+Revision ID: a7e2c4f9b3d5
+Revises: f4b8d2e6a9c1
+Create Date: 2026-10-20 10:04:18.527193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c4f9b3d5'
+down_revision: Union[str, Sequence[str], None] = 'f4b8d2e6a9c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # Новое значение enum можно использовать только после коммита ALTER TYPE
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE counterscopeenum ADD VALUE IF NOT EXISTS 'feed_version'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Значение из enum PostgreSQL не удаляется, удаляются только строки счётчика
+    op.execute(sa.text("DELETE FROM counters WHERE scope = 'feed_version'"))
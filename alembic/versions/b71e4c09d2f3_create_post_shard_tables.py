@@ -0,0 +1,40 @@
+"""Create post shard tables
+
+Revision ID: b71e4c09d2f3
+Revises: 3f9c1d2a7b64
+Create Date: 2026-10-19 13:47:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e4c09d2f3'
+down_revision: Union[str, Sequence[str], None] = '3f9c1d2a7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_shard_placements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.String(length=60), nullable=False),
+    sa.Column('moving', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('owner_id')
+    )
+    op.create_table('post_id_allocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('post_id_allocations')
+    op.drop_table('post_shard_placements')
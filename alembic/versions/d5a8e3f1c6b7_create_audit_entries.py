@@ -0,0 +1,39 @@
+"""Create audit entries
+
+Revision ID: d5a8e3f1c6b7
+Revises: b71e4c09d2f3
+Create Date: 2026-10-19 15:12:40.527913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8e3f1c6b7'
+down_revision: Union[str, Sequence[str], None] = 'b71e4c09d2f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('audit_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ts', sa.DateTime(), nullable=False),
+    sa.Column('actor_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=30), nullable=False),
+    sa.Column('entity', sa.String(length=30), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=True),
+    sa.Column('changes', sa.JSON(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_audit_entries_ts'), 'audit_entries', ['ts'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_audit_entries_ts'), table_name='audit_entries')
+    op.drop_table('audit_entries')
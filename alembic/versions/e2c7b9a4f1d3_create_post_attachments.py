@@ -0,0 +1,41 @@
+"""Create post attachments
+
+Revision ID: e2c7b9a4f1d3
+Revises: d5a8e3f1c6b7
+Create Date: 2026-10-19 18:40:12.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2c7b9a4f1d3'
+down_revision: Union[str, Sequence[str], None] = 'd5a8e3f1c6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('post_attachments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_post_attachments_post_id'), 'post_attachments', ['post_id'], unique=False)
+    op.create_index(op.f('ix_post_attachments_sha256'), 'post_attachments', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_post_attachments_sha256'), table_name='post_attachments')
+    op.drop_index(op.f('ix_post_attachments_post_id'), table_name='post_attachments')
+    op.drop_table('post_attachments')
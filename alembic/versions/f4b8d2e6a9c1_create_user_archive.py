@@ -0,0 +1,60 @@
+"""Create user archive
+
+Revision ID: f4b8d2e6a9c1
+Revises: e2c7b9a4f1d3
+Create Date: 2026-10-19 19:20:41.734052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d2e6a9c1'
+down_revision: Union[str, Sequence[str], None] = 'e2c7b9a4f1d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('deactivated_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_users_deactivated_at'), 'users', ['deactivated_at'], unique=False)
+    # Время выключения уже неактивных пользователей неизвестно: отсчёт срока до архива начинается сейчас
+    op.execute(sa.text("UPDATE users SET deactivated_at = CURRENT_TIMESTAMP WHERE NOT is_active"))
+    op.create_table('users_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('username', sa.String(length=60), nullable=False),
+    sa.Column('email', sa.String(length=60), nullable=False),
+    sa.Column('password', sa.String(length=100), nullable=False),
+    sa.Column('role', postgresql.ENUM('admin', 'base_user', 'moderator', 'premium_user', name='roleenum',
+                                      create_type=False), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('access_id', sa.Integer(), nullable=False),
+    sa.Column('deactivated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('posts_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('tittle', sa.String(length=70), nullable=False),
+    sa.Column('description', sa.String(length=250), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('required_access_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_posts_archive_owner_id'), 'posts_archive', ['owner_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_posts_archive_owner_id'), table_name='posts_archive')
+    op.drop_table('posts_archive')
+    op.drop_table('users_archive')
+    op.drop_index(op.f('ix_users_deactivated_at'), table_name='users')
+    op.drop_column('users', 'deactivated_at')
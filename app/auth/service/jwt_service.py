@@ -1,16 +1,26 @@
+import time
 from datetime import datetime, timedelta
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.auth.service.password_hashing import password_stats
+from app.core.audit import current_actor
+from app.core.traffic_capture import capture_actor
 from app.core.config import settings
+from app.core.tracing import span
 from app.core.db_helper import db_helper
 from app.models import User
+from app.models.user import RoleEnum
+from app.repositories.user_loader import load_user_by_email
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max равны целевой стоимости: хеши с другой стоимостью needs_update перехеширует
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__rounds=settings.password_bcrypt_rounds,
+                           bcrypt__min_rounds=settings.password_bcrypt_rounds,
+                           bcrypt__max_rounds=settings.password_bcrypt_rounds)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -20,7 +30,14 @@ def get_password_hash(password: str) -> str:
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(password, hashed_password)
+    started = time.perf_counter()
+    valid = pwd_context.verify(password, hashed_password)
+    password_stats.observe_verify(hashed_password, (time.perf_counter() - started) * 1000)
+    return valid
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
 
 
 def create_access_token(data: dict) -> str:
@@ -37,11 +54,12 @@ def decode_access_token(token: str) -> dict:
 
 def verify_access_token(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(
-            token,
-            settings.jwt_public_key_path,
-            algorithms=[settings.jwt_algorithm]
-        )
+        with span("auth.decode_jwt"):
+            payload = jwt.decode(
+                token,
+                settings.jwt_public_key_path,
+                algorithms=[settings.jwt_algorithm]
+            )
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -75,9 +93,17 @@ async def get_current_user(token: str = Depends(verify_access_token),
     if email is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    result = await session.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
+    with span("auth.get_current_user"):
+        user = await load_user_by_email(session, email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
+    current_actor.set(user.id)
+    capture_actor(user)
     return user
+
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != RoleEnum.admin or not current_user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Недостаточно прав")
+    return current_user
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from passlib.hash import bcrypt
+
+# Ниже этой стоимости bcrypt не опускаемся, даже если бюджет не укладывается
+MIN_BCRYPT_ROUNDS = 10
+MAX_BCRYPT_ROUNDS = 16
+
+
+def hash_cost(hashed_password: str | None) -> int | None:
+    """Стоимость bcrypt из хеша вида $2b$12$...; None для других форматов."""
+    if not hashed_password or not hashed_password.startswith("$2"):
+        return None
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def measure_hash_ms(rounds: int, samples: int = 3) -> float:
+    hasher = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(budget_ms: float, samples: int = 3) -> tuple[int, dict[int, float]]:
+    """Наибольшая стоимость bcrypt, при которой хеш на этой машине укладывается в budget_ms.
+
+    Каждый следующий раунд вдвое дороже предыдущего, поэтому измерение
+    останавливается на первой стоимости, вышедшей за бюджет.
+    """
+    timings: dict[int, float] = {}
+    chosen = MIN_BCRYPT_ROUNDS
+    for rounds in range(MIN_BCRYPT_ROUNDS, MAX_BCRYPT_ROUNDS + 1):
+        timings[rounds] = measure_hash_ms(rounds, samples)
+        if timings[rounds] > budget_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+class PasswordHashStats:
+    """Проверки паролей по стоимости хеша и фоновые перехеширования в этом процессе."""
+
+    def __init__(self):
+        self.verifications: dict[int, int] = {}
+        self.verify_ms: dict[int, float] = {}
+        self.rehashed = 0
+        self.rehash_failures = 0
+
+    def observe_verify(self, hashed_password: str, elapsed_ms: float) -> None:
+        cost = hash_cost(hashed_password) or 0
+        self.verifications[cost] = self.verifications.get(cost, 0) + 1
+        self.verify_ms[cost] = self.verify_ms.get(cost, 0.0) + elapsed_ms
+
+    def as_dict(self) -> dict:
+        return {
+            "verifications": {str(cost): count for cost, count in sorted(self.verifications.items())},
+            "mean_verify_ms": {str(cost): round(self.verify_ms[cost] / count, 2)
+                               for cost, count in sorted(self.verifications.items())},
+            "rehashed": self.rehashed,
+            "rehash_failures": self.rehash_failures,
+        }
+
+
+password_stats = PasswordHashStats()
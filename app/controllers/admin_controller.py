@@ -0,0 +1,153 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.auth.service.jwt_service import get_current_admin
+from app.auth.service.password_hashing import password_stats
+from app.core.audit import audit_log
+from app.core.traffic_capture import traffic_capture
+from app.core.concurrency import concurrency_limits
+from app.core.config import settings
+from app.core.db_helper import db_helper, query_stats
+from app.core.deadlines import deadlines
+from app.core.post_events import post_events
+from app.core.single_flight import single_flight
+from app.core.tracing import tracer
+from app.repositories import user_repository
+from app.schemas.audit import AuditStats
+from app.schemas.capture import CaptureStats
+from app.schemas.concurrency import ConcurrencyLimitsRead
+from app.schemas.deadline import DeadlinesRead
+from app.schemas.password_hashing import PasswordHashingRead
+from app.schemas.post_events import PostEventsStats
+from app.schemas.query_stats import QueryStatsRead
+from app.schemas.single_flight import SingleFlightRead
+from app.schemas.tracing import TracesRead
+
+router = APIRouter(tags=['admin'], dependencies=[Depends(get_current_admin)])
+
+
+@router.get('/queries', response_model=QueryStatsRead,
+            summary="Получить самые затратные SQL-запросы",
+            description="Эндпоинт возвращает top-N отпечатков SQL-запросов по суммарному, среднему, "
+                        "p95 времени или количеству выполнений. Доступен только администратору.")
+async def get_query_stats(limit: int = Query(20, ge=1, le=500),
+                          order_by: Literal["total", "mean", "p95", "max", "count"] = "total"):
+    return QueryStatsRead(
+        fingerprints=len(query_stats.entries),
+        max_fingerprints=query_stats.max_fingerprints,
+        evicted=query_stats.evicted,
+        slow_threshold_ms=query_stats.slow_threshold * 1000,
+        top=[entry.as_dict() for entry in query_stats.top(limit=limit, order_by=order_by)],
+    )
+
+
+@router.delete('/queries', status_code=status.HTTP_204_NO_CONTENT,
+               summary="Сбросить статистику SQL-запросов",
+               description="Эндпоинт очищает накопленную статистику по отпечаткам запросов.")
+async def reset_query_stats():
+    query_stats.reset()
+    return None
+
+
+@router.get('/audit', response_model=AuditStats,
+            summary="Получить состояние журнала аудита",
+            description="Эндпоинт возвращает количество записанных и отброшенных записей аудита, "
+                        "заполненность очереди и текущий сегмент журнала.")
+async def get_audit_stats():
+    return AuditStats(**audit_log.stats())
+
+
+@router.get('/capture', response_model=CaptureStats,
+            summary="Получить состояние записи трафика",
+            description="Эндпоинт возвращает долю записываемых запросов, число записанных и отброшенных "
+                        "при переполнении очереди запросов и текущий сегмент записи.")
+async def get_capture_stats():
+    return CaptureStats(**traffic_capture.stats())
+
+
+@router.get('/limits', response_model=ConcurrencyLimitsRead,
+            summary="Получить состояние лимитов конкурентности",
+            description="Эндпоинт возвращает текущий адаптивный лимит, число выполняющихся и ожидающих "
+                        "запросов и счётчики отброшенных запросов по каждому маршруту.")
+async def get_concurrency_limits():
+    return ConcurrencyLimitsRead(enabled=settings.concurrency_enabled, routes=concurrency_limits.snapshot())
+
+
+@router.get('/deadlines', response_model=DeadlinesRead,
+            summary="Получить статистику сроков обработки запросов",
+            description="Эндпоинт возвращает сроки маршрутов, число превышений срока по маршрутам и этапам "
+                        "(функция приложения, на которой стоял обработчик), число отключений клиентов до "
+                        "ответа и последние такие запросы с выполнявшимся SQL.")
+async def get_deadlines():
+    return DeadlinesRead(enabled=settings.deadline_enabled, **deadlines.snapshot())
+
+
+@router.delete('/deadlines', status_code=status.HTTP_204_NO_CONTENT,
+               summary="Сбросить статистику сроков обработки запросов")
+async def reset_deadlines():
+    deadlines.reset()
+    return None
+
+
+@router.get('/single-flight', response_model=SingleFlightRead,
+            summary="Получить статистику объединения одинаковых чтений",
+            description="Эндпоинт возвращает по каждому типу чтения число вызовов, выполненных запросов к БД "
+                        "и вызовов, получивших результат уже выполняющегося запроса.")
+async def get_single_flight_stats():
+    return SingleFlightRead(**single_flight.snapshot())
+
+
+@router.delete('/single-flight', status_code=status.HTTP_204_NO_CONTENT,
+               summary="Сбросить статистику объединения чтений")
+async def reset_single_flight_stats():
+    single_flight.reset()
+    return None
+
+
+@router.get('/password-hashing', response_model=PasswordHashingRead,
+            summary="Получить распределение стоимости хешей паролей",
+            description="Эндпоинт возвращает целевую стоимость bcrypt, число пользователей по стоимости "
+                        "сохранённых хешей, проверки паролей по стоимости в этом процессе и число "
+                        "перехеширований после входа.")
+async def get_password_hashing_stats(session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    return PasswordHashingRead(
+        bcrypt_rounds=settings.password_bcrypt_rounds,
+        budget_ms=settings.password_hash_budget_ms,
+        stored_costs=await user_repository.password_cost_distribution(session),
+        **password_stats.as_dict(),
+    )
+
+
+@router.get('/events', response_model=PostEventsStats,
+            summary="Получить состояние потока событий постов",
+            description="Эндпоинт возвращает число SSE-подписчиков по уровням доступа, число разосланных "
+                        "событий, отключённых медленных клиентов и переподключений с Last-Event-ID.")
+async def get_post_events_stats():
+    return PostEventsStats(**post_events.stats())
+
+
+@router.get('/traces', response_model=TracesRead,
+            summary="Получить последние трассы запросов",
+            description="Эндпоинт возвращает последние выбранные для трассировки запросы (новые первыми) "
+                        "с деревом спанов: аутентификация, функции репозиториев, SQL и рендер шаблонов. "
+                        "min_duration_ms отбирает только медленные запросы.")
+async def get_traces(limit: int = Query(20, ge=1, le=500), min_duration_ms: float = Query(0.0, ge=0)):
+    return TracesRead(**tracer.snapshot(limit=limit, min_duration_ms=min_duration_ms))
+
+
+@router.get('/traces/otlp',
+            summary="Получить последние трассы в формате OTLP JSON",
+            description="Эндпоинт возвращает трассы из памяти процесса как ExportTraceServiceRequest "
+                        "(OTLP/JSON) для загрузки в коллектор или просмотрщик трасс.")
+async def get_traces_otlp(limit: int = Query(200, ge=1, le=10000), min_duration_ms: float = Query(0.0, ge=0)):
+    return tracer.otlp(tracer.traces(limit=limit, min_duration_ms=min_duration_ms))
+
+
+@router.delete('/traces', status_code=status.HTTP_204_NO_CONTENT,
+               summary="Очистить трассы в памяти")
+async def reset_traces():
+    tracer.reset()
+    return None
@@ -1,24 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException
+import mimetypes
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.auth.service.jwt_service import get_current_user
+from app.core.attachments import AttachmentResponse, attachment_storage
+from app.core.config import settings
 from app.core.db_helper import db_helper
 from app.models import User
+from app.repositories import archive_repository
+from app.repositories import attachment_repository
 from app.repositories import post_repository
 from app.repositories import similar_repository
-from app.schemas.post import PostRead, PostCreate, PostUpdate
+from app.repositories import feed_repository
+from app.repositories.user_loader import UserLoader, user_loader_dependency, with_authors
+from app.schemas.attachment import AttachmentRead
+from app.schemas.post import PostRead, PostCreate, PostUpdate, FeedPage, PostWithAuthor
 
 router = APIRouter(tags=['posts'])
 
 
-@router.get('/', response_model=list[PostRead],
+@router.get('/', response_model=list[PostWithAuthor], response_model_exclude_unset=True,
             summary="Получить все посты из базы данных",
-            description="Эндпоинт для получения всех постов из базы данных.")
-async def get_all_posts(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
-                        current_user: User = Depends(get_current_user)):
-    return await post_repository.get_posts(session=session, owner_id=current_user.id,
-                                           required_access=current_user.access_id)
+            description="Эндпоинт для получения всех постов из базы данных. "
+                        "С embed_author=true к каждому посту добавляется краткая информация об авторе.")
+async def get_all_posts(embed_author: bool = False,
+                        session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+                        current_user: User = Depends(get_current_user),
+                        loader: UserLoader = Depends(user_loader_dependency)):
+    posts = await post_repository.get_posts(session=session, owner_id=current_user.id,
+                                            required_access=current_user.access_id,
+                                            archived=current_user.archived)
+    if not embed_author:
+        return posts
+    loader.prime(current_user)
+    return await with_authors(loader, posts)
+
+
+@router.get('/feed', response_model=FeedPage, response_model_exclude_unset=True,
+            summary="Лента постов всех авторов",
+            description="Эндпоинт возвращает самые новые посты всех авторов, доступные уровню доступа пользователя. "
+                        "Для следующей страницы передайте before_id из ответа. "
+                        "С embed_author=true авторы страницы загружаются одним запросом.")
+async def get_feed(limit: int = Query(settings.feed_page_size, ge=1, le=100),
+                   before_id: int | None = Query(None, ge=1),
+                   embed_author: bool = False,
+                   session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+                   current_user: User = Depends(get_current_user),
+                   loader: UserLoader = Depends(user_loader_dependency)):
+    items = await feed_repository.get_feed(session=session, access_level=current_user.access_id,
+                                           limit=limit, before_id=before_id)
+    next_before_id = items[-1].id if len(items) == limit else None
+    if embed_author:
+        loader.prime(current_user)
+        posts = await with_authors(loader, items)
+    else:
+        posts = [PostWithAuthor.model_validate(item) for item in items]
+    return FeedPage(items=posts, next_before_id=next_before_id)
 
 
 async def get_post_by_id(post_id: int, session: AsyncSession = Depends(db_helper.scoped_session_dependency),
@@ -38,6 +77,8 @@ async def create_post(
         session: AsyncSession = Depends(db_helper.scoped_session_dependency),
         current_user: User = Depends(get_current_user)
 ):
+    # Пост архивного пользователя ссылается на строку users: сначала пользователь возвращается из архива
+    await archive_repository.ensure_hot(current_user)
     return await post_repository.create_post(session=session, post_in=post_in, required_access=current_user.access_id,
                                              owner_id=current_user.id)
 
@@ -88,3 +129,63 @@ async def delete_post(post_id: int, session: AsyncSession = Depends(db_helper.sc
         raise HTTPException(status_code=404, detail="Post not found")
     await post_repository.delete_post(session=session, post=post)
     return None
+
+
+@router.post('/{post_id}/attachments', response_model=AttachmentRead, status_code=status.HTTP_201_CREATED,
+             summary="Добавить вложение к посту",
+             description="Эндпоинт для загрузки файла к посту. Тело запроса - содержимое файла "
+                         "(пишется в хранилище по мере получения), имя файла передаётся в filename, "
+                         "тип - заголовком Content-Type.")
+async def upload_attachment(request: Request, filename: str = Query(..., min_length=1, max_length=255),
+                            post: PostRead = Depends(get_post_by_id),
+                            session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > attachment_storage.max_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Размер вложения превышает {attachment_storage.max_size} байт")
+    # Из пути, присланного браузером или клиентом, остаётся только имя файла
+    filename = filename.replace("\\", "/").rsplit("/", 1)[-1]
+    if not filename:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Пустое имя файла")
+    content_type = (request.headers.get("content-type") or mimetypes.guess_type(filename)[0]
+                    or "application/octet-stream")
+    return await attachment_repository.create_attachment(session=session, post_id=post.id, filename=filename,
+                                                         content_type=content_type[:100], chunks=request.stream())
+
+
+@router.get('/{post_id}/attachments', response_model=list[AttachmentRead],
+            summary="Получить вложения поста",
+            description="Эндпоинт для получения списка вложений поста.")
+async def get_attachments(post: PostRead = Depends(get_post_by_id),
+                          session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    return await attachment_repository.get_attachments(session=session, post_id=post.id)
+
+
+@router.api_route('/{post_id}/attachments/{attachment_id}', methods=["GET", "HEAD"],
+                  response_class=AttachmentResponse,
+                  summary="Скачать вложение поста",
+                  description="Эндпоинт для получения содержимого вложения. Поддерживаются заголовки "
+                              "Range (частичная загрузка) и If-None-Match (ETag - sha256 содержимого).")
+async def download_attachment(attachment_id: int, post: PostRead = Depends(get_post_by_id),
+                              session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    attachment = await attachment_repository.get_attachment(session=session, post_id=post.id,
+                                                            attachment_id=attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return AttachmentResponse(attachment_storage.path(attachment.sha256), sha256=attachment.sha256,
+                              filename=attachment.filename, media_type=attachment.content_type,
+                              chunk_size=attachment_storage.chunk_size)
+
+
+@router.delete('/{post_id}/attachments/{attachment_id}', status_code=status.HTTP_204_NO_CONTENT,
+               summary="Удалить вложение поста",
+               description="Эндпоинт для удаления вложения. Файл удаляется из хранилища, "
+                           "если на него не ссылаются другие вложения.")
+async def delete_attachment(attachment_id: int, post: PostRead = Depends(get_post_by_id),
+                            session: AsyncSession = Depends(db_helper.scoped_session_dependency)):
+    attachment = await attachment_repository.get_attachment(session=session, post_id=post.id,
+                                                            attachment_id=attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    await attachment_repository.delete_attachment(session=session, attachment=attachment)
+    return None
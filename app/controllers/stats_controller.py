@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.service.jwt_service import get_current_user
+from app.core.db_helper import db_helper
+from app.models import User
+from app.models.counter import CounterScopeEnum
+from app.repositories import counter_repository
+from app.schemas.counter import Stats
+
+router = APIRouter(tags=['stats'])
+
+
+@router.get('/', response_model=Stats,
+            summary="Получить агрегированную статистику",
+            description="Эндпоинт возвращает заранее посчитанные счётчики: количество постов пользователя, "
+                        "постов по уровням доступа и активных пользователей по ролям. "
+                        "Таблица posts при этом не сканируется.")
+async def get_stats(session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+                    current_user: User = Depends(get_current_user)):
+    return Stats(
+        my_posts=await counter_repository.get_counter(session, CounterScopeEnum.owner_posts, current_user.id),
+        posts_by_access=await counter_repository.get_scope(session, CounterScopeEnum.access_posts),
+        active_users_by_role=await counter_repository.get_scope(session, CounterScopeEnum.role_active_users),
+    )
+
+
+@router.get('/owner/{owner_id}', response_model=int,
+            summary="Получить количество постов пользователя",
+            description="Эндпоинт возвращает количество постов пользователя по его ID из таблицы счётчиков.")
+async def get_owner_posts_count(owner_id: int, session: AsyncSession = Depends(db_helper.scoped_session_dependency),
+                                current_user: User = Depends(get_current_user)):
+    return await counter_repository.get_counter(session, CounterScopeEnum.owner_posts, owner_id)
@@ -1,18 +1,28 @@
 from pathlib import Path
 
-from fastapi import APIRouter, Request, Form, Depends, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Request, Form, Depends, HTTPException, BackgroundTasks
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from starlette.status import HTTP_303_SEE_OTHER
 
-from app.auth.service.jwt_service import verify_password, create_access_token, decode_jwt_token
+from app.auth.service.jwt_service import verify_password, create_access_token, decode_jwt_token, \
+    password_needs_rehash
+from app.core.audit import audit_log, current_actor
+from app.core.traffic_capture import capture_actor
+from app.core.config import settings
 from app.core.db_helper import db_helper
-from app.models import User
+from app.core.post_events import post_events
+from app.core.static_files import static_url
+from app.core.streaming_templates import StreamingTemplates
+from app.core.tracing import TracedTemplate
+from app.models.counter import CounterScopeEnum
 from app.models.user import RoleEnum
-from app.repositories import user_repository, post_repository, similar_repository
+from app.repositories import user_repository, post_repository, similar_repository, counter_repository, \
+    archive_repository
+from app.repositories import feed_repository
+from app.repositories.user_loader import UserLoader, load_user_by_email
 from app.schemas.post import PostCreate, PostUpdate
 from app.schemas.user import UserCreate, UserUpdate
 
@@ -20,6 +30,11 @@ router = APIRouter()
 BASE_DIR = Path(__file__).parent.parent.parent
 TEMPLATES_DIR = BASE_DIR / "templates"
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+templates.env.template_class = TracedTemplate
+templates.env.globals["static_url"] = static_url
+# Большие страницы со списками постов отдаются по мере рендера
+streaming_templates = StreamingTemplates(directory=str(TEMPLATES_DIR),
+                                         chunk_size=settings.template_stream_chunk_size)
 
 
 @router.get("/login")
@@ -34,13 +49,18 @@ async def register_page(request: Request):
 
 @router.post("/login")
 async def login_submit(
+        background_tasks: BackgroundTasks,
         email: str = Form(...),
         password: str = Form(...),
         session: AsyncSession = Depends(db_helper.scoped_session_dependency)
 ):
     db_user = await user_repository.get_user_by_email(session, email)
     if not db_user or not verify_password(password, db_user.password):
+        await audit_log.record("login_failed", "user", changes={"email": email})
         return RedirectResponse("/login?msg=Неправильный логин или пароль.", status_code=HTTP_303_SEE_OTHER)
+    await audit_log.record("login", "user", db_user.id, actor_id=db_user.id)
+    if password_needs_rehash(db_user.password):
+        background_tasks.add_task(user_repository.rehash_password, db_user.id, password, db_user.password)
     token = create_access_token({"sub": db_user.email})
     response = RedirectResponse("/index", status_code=HTTP_303_SEE_OTHER)
     response.set_cookie(key="access_token", value=token, httponly=True)
@@ -85,10 +105,11 @@ async def get_current_user_from_cookie(request: Request, session: AsyncSession):
     email = payload.get("sub")
     if not email:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    result = await session.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
+    user = await load_user_by_email(session, email)
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    current_actor.set(user.id)
+    capture_actor(user)
     return user
 
 
@@ -103,9 +124,10 @@ async def get_current_user_from_cookie_optional(request: Request, session: Async
     email = payload.get("sub")
     if not email:
         return None
-    result = await session.execute(select(User).where(User.email == email))
-    user = result.scalars().first()
-
+    user = await load_user_by_email(session, email)
+    if user:
+        current_actor.set(user.id)
+        capture_actor(user)
     return user
 
 
@@ -122,16 +144,39 @@ async def index(
         session: AsyncSession = Depends(db_helper.scoped_session_dependency)
 ):
     user = await get_current_user_from_cookie_optional(request, session)
-    posts = await post_repository.get_all_posts(session=session)
+    access_level = user.access_id if user else feed_repository.ANY_LEVEL
+    posts = await feed_repository.get_feed(session=session, access_level=access_level,
+                                           limit=settings.feed_page_size)
     if not user:
-        return templates.TemplateResponse(
-            "index.html", {"request": request, "posts": posts}
+        return streaming_templates.TemplateResponse(
+            request, "index.html", {"posts": posts}
         )
-    return templates.TemplateResponse(
-        "index_auth.html", {"request": request, "user": user, "posts": posts}
+    loader = UserLoader(session)
+    loader.prime(user)
+    authors = await loader.load_many(post.owner_id for post in posts)
+    return streaming_templates.TemplateResponse(
+        request, "index_auth.html", {"user": user, "posts": posts, "authors": authors,
+                                     "last_event_id": post_events.event_id(post_events.seq)}
     )
 
 
+@router.get("/events/posts")
+async def post_events_stream(
+        request: Request,
+        last_event_id: str | None = None,
+        session: AsyncSession = Depends(db_helper.scoped_session_dependency)
+):
+    """SSE-поток созданных, изменённых и удалённых постов, видимых пользователю.
+
+    Страница передаёт last_event_id, актуальный на момент рендера; при
+    переподключении браузер сам присылает заголовок Last-Event-ID.
+    """
+    user = await get_current_user_from_cookie(request, session)
+    events = post_events.stream(user.access_id, request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.post("/create_post")
 async def create_post(
         request: Request,
@@ -143,6 +188,7 @@ async def create_post(
     user = await get_current_user_from_cookie(request, session)
     if not user:
         return RedirectResponse("/login", status_code=HTTP_303_SEE_OTHER)
+    await archive_repository.ensure_hot(user)
     await post_repository.create_post(session, PostCreate(
         tittle=title,
         description=description,
@@ -227,8 +273,12 @@ async def my_posts(request: Request, session: AsyncSession = Depends(db_helper.s
     if not user:
         return RedirectResponse("/login?msg=Для доступа авторизуйтесь", status_code=HTTP_303_SEE_OTHER)
 
-    posts = await post_repository.get_posts(session=session, owner_id=user.id, required_access=user.access_id)
-    return templates.TemplateResponse("my_posts.html", {"request": request, "user": user, "posts": posts})
+    posts_count = await counter_repository.get_counter(session, CounterScopeEnum.owner_posts, user.id)
+    posts = post_repository.stream_posts(owner_id=user.id, required_access=user.access_id,
+                                         batch_size=settings.template_stream_batch_size,
+                                         archived=user.archived)
+    return streaming_templates.TemplateResponse(request, "my_posts.html", {"user": user, "posts": posts,
+                                                                           "posts_count": posts_count})
 
 
 @router.get("/profile")
@@ -237,8 +287,9 @@ async def my_profile(request: Request, session: AsyncSession = Depends(db_helper
     if not user:
         return RedirectResponse("/login?msg=Для доступа авторизуйтесь", status_code=HTTP_303_SEE_OTHER)
 
-    posts = await post_repository.get_posts(session=session, owner_id=user.id, required_access=user.access_id)
-    return templates.TemplateResponse("profile.html", {"request": request, "user": user, "posts": posts})
+    posts_count = await counter_repository.get_counter(session, CounterScopeEnum.owner_posts, user.id)
+    return streaming_templates.TemplateResponse(request, "profile.html", {"user": user,
+                                                                          "posts_count": posts_count})
 
 
 @router.post("/update_user_partial")
@@ -0,0 +1,215 @@
+"""Хранилище вложений постов и отдача их содержимого.
+
+Файлы лежат в attachments_dir/<первые два символа sha256>/<sha256>: путь
+определяется содержимым, одинаковые файлы хранятся один раз, а sha256
+служит строгим ETag.
+"""
+import asyncio
+import hashlib
+import mmap
+import os
+import secrets
+from pathlib import Path
+from typing import AsyncIterable, Awaitable, Callable
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from .config import settings
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+class AttachmentStorage:
+    """Запись тела запроса в хранилище без буферизации файла целиком.
+
+    Поток копится до chunk_size и пишется во временный файл в потоке
+    исполнителя вместе с подсчётом sha256 - цикл событий не ждёт диска,
+    а загрузка не читает следующий кусок, пока предыдущий не записан.
+    Готовый файл публикуется под именем хеша жёсткой ссылкой, а временный
+    остаётся до confirm() после коммита записи вложения. Удаление файла
+    (release) и загрузка того же содержимого не согласованы блокировкой,
+    поэтому обе стороны перепроверяют друг друга: release переносит файл
+    в сторону и возвращает его, если ссылка появилась, а confirm заново
+    публикует содержимое, если файл успели удалить.
+    """
+
+    def __init__(self, root: str, chunk_size: int, max_size: int):
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+        self.max_size = max_size
+
+    def path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    def _temporary(self, suffix: str = "") -> Path:
+        temporary = self.root / "tmp" / f"{os.getpid()}-{secrets.token_hex(8)}{suffix}"
+        temporary.parent.mkdir(parents=True, exist_ok=True)
+        return temporary
+
+    async def save(self, chunks: AsyncIterable[bytes]) -> tuple[str, int, Path]:
+        """Записывает и публикует поток. Возвращает sha256, размер и временный файл для confirm/discard."""
+        temporary = self._temporary()
+        digest = hashlib.sha256()
+        size = 0
+        file = open(temporary, "wb")
+        try:
+            buffer = bytearray()
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.max_size:
+                    raise AttachmentTooLarge(self.max_size)
+                buffer += chunk
+                if len(buffer) >= self.chunk_size:
+                    await asyncio.to_thread(_write, file, digest, buffer)
+                    buffer = bytearray()
+            await asyncio.to_thread(_write, file, digest, buffer)
+            await asyncio.to_thread(_sync, file)
+        except BaseException:
+            file.close()
+            temporary.unlink(missing_ok=True)
+            raise
+        file.close()
+        sha256 = digest.hexdigest()
+        await asyncio.to_thread(self._publish, temporary, self.path(sha256))
+        return sha256, size, temporary
+
+    def confirm(self, sha256: str, temporary: Path) -> None:
+        """Вызывается после коммита записи вложения: возвращает файл, удалённый параллельным release."""
+        self._publish(temporary, self.path(sha256))
+        temporary.unlink(missing_ok=True)
+
+    @staticmethod
+    def discard(temporary: Path) -> None:
+        temporary.unlink(missing_ok=True)
+
+    async def release(self, sha256: str, referenced: Callable[[], Awaitable[bool]]) -> None:
+        """Удаляет файл, если referenced() сообщает, что на содержимое никто не ссылается.
+
+        Файл сначала переносится в сторону, затем ссылки проверяются ещё раз:
+        вложение с тем же содержимым, закоммиченное между проверками, получает
+        файл обратно. Закоммиченное позже само опубликует его в confirm().
+        """
+        if await referenced():
+            return
+        target = self.path(sha256)
+        removed = self._temporary(".removed")
+        try:
+            os.replace(target, removed)
+        except FileNotFoundError:
+            return
+        if await referenced():
+            self._publish(removed, target)
+        removed.unlink(missing_ok=True)
+
+    @staticmethod
+    def _publish(source: Path, target: Path) -> None:
+        if target.exists():
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            # Жёсткая ссылка: файл появляется под именем хеша сразу целиком, source остаётся
+            os.link(source, target)
+        except FileExistsError:
+            pass
+
+
+def _write(file, digest, data: bytearray) -> None:
+    # hashlib и write отпускают GIL на больших буферах
+    digest.update(data)
+    file.write(data)
+
+
+def _sync(file) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+
+
+class AttachmentResponse(FileResponse):
+    """FileResponse для вложения: ETag - sha256, If-None-Match отвечается 304.
+
+    Если сервер поддерживает расширение ASGI http.response.zerocopysend,
+    тело (целиком или запрошенный диапазон) отдаётся через sendfile.
+    Иначе файл отображается в память, и серверу передаются срезы
+    memoryview без чтения в промежуточные буферы; следующий кусок
+    заранее запрашивается у ядра (MADV_WILLNEED), чтобы обращение к
+    странице не останавливало цикл событий чтением с диска.
+    На запрос нескольких диапазонов отдаётся весь файл (RFC 9110 это
+    допускает): multipart-ответ FileResponse объявляет неверную длину.
+    """
+
+    def __init__(self, path: Path, sha256: str, filename: str, media_type: str, chunk_size: int):
+        super().__init__(path, media_type=media_type, filename=filename,
+                         headers={"ETag": f'"{sha256}"', "Cache-Control": "private, no-cache"})
+        self.chunk_size = chunk_size
+        self.zerocopy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, self.headers["etag"]):
+            response = Response(status_code=304, headers={
+                key: value for key, value in self.headers.items() if key in ("etag", "cache-control")
+            })
+            return await response(scope, receive, send)
+        self.zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool, send_pathsend: bool) -> None:
+        if send_header_only or (send_pathsend and not self.zerocopy):
+            return await super()._handle_simple(send, send_header_only, send_pathsend)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._send_file(send, 0, int(self.headers["content-length"]))
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int,
+                                   send_header_only: bool) -> None:
+        if send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._send_file(send, start, end)
+
+    async def _handle_multiple_ranges(self, send: Send, ranges: list[tuple[int, int]], file_size: int,
+                                      send_header_only: bool) -> None:
+        await self._handle_simple(send, send_header_only, send_pathsend=False)
+
+    async def _send_file(self, send: Send, start: int, end: int) -> None:
+        if start == end:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        with open(self.path, "rb") as file:
+            if self.zerocopy:
+                await send({"type": ZEROCOPY_EXTENSION, "file": file, "offset": start, "count": end - start})
+                return
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # Отображение не закрывается явно: сервер может ещё держать переданный срез,
+        # память освобождается вместе с последним memoryview
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        position = start
+        while position < end:
+            stop = min(position + self.chunk_size, end)
+            if stop < end and hasattr(mmap, "MADV_WILLNEED"):
+                aligned = stop - stop % mmap.PAGESIZE
+                mapped.madvise(mmap.MADV_WILLNEED, aligned, min(self.chunk_size, end - aligned))
+            await send({"type": "http.response.body", "body": view[position:stop], "more_body": stop < end})
+            position = stop
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+attachment_storage = AttachmentStorage(
+    root=settings.attachments_dir,
+    chunk_size=settings.attachment_chunk_size,
+    max_size=settings.attachment_max_size,
+)
@@ -0,0 +1,239 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# id пользователя, от имени которого выполняется запрос; выставляется при аутентификации
+current_actor: ContextVar[int | None] = ContextVar("current_actor", default=None)
+
+SEGMENT_PREFIX = "audit-"
+SEGMENT_SUFFIX = ".log"
+# Поля, значения которых не попадают в журнал
+SECRET_FIELDS = frozenset({"password"})
+
+
+def segment_name(started_at: float, writer: int) -> str:
+    # Время начала сегмента в имени: читатель выбирает сегменты по интервалу без открытия файлов.
+    # writer (pid) разделяет файлы процессов, если воркеров несколько.
+    return f"{SEGMENT_PREFIX}{int(started_at * 1000):013d}-{writer}{SEGMENT_SUFFIX}"
+
+
+def parse_segment_name(path: Path) -> tuple[float, str]:
+    started_at, _, writer = path.name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].partition("-")
+    return int(started_at) / 1000, writer
+
+
+def encode(record: tuple) -> bytes:
+    """Строка журнала: время, табуляция, JSON. Время вынесено, чтобы фильтровать без разбора JSON."""
+    ts, actor_id, action, entity, entity_id, changes = record
+    payload = {"actor_id": actor_id, "action": action, "entity": entity, "entity_id": entity_id}
+    if changes:
+        payload["changes"] = changes
+    return f"{ts:.6f}\t{json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str)}\n".encode()
+
+
+def mask_changes(changes: dict | None) -> dict | None:
+    if not changes:
+        return None
+    return {key: "***" if key in SECRET_FIELDS else value for key, value in changes.items()}
+
+
+class AuditLog:
+    """Журнал изменений, который не задерживает обработчики запросов.
+
+    record() кладёт компактную запись в ограниченную очередь. Фоновая задача
+    забирает записи пачками (до batch_size или раз в flush_interval секунд) и
+    дописывает их в текущий сегмент через буферизованный файл; сегмент
+    закрывается по достижении segment_bytes. При переполнении очереди запись
+    отбрасывается (overflow="drop", учитывается в dropped) или обработчик ждёт
+    места в очереди (overflow="block"). Если задан loader, каждая пачка после
+    записи в файл передаётся ему для массовой загрузки в БД.
+    """
+
+    def __init__(self, directory: str, queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 0.5, segment_bytes: int = 64 * 1024 * 1024,
+                 overflow: str = "drop", loader=None):
+        self.directory = Path(directory)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.overflow = overflow
+        self.loader = loader
+        self.queue: asyncio.Queue | None = None
+        self.task: asyncio.Task | None = None
+        self.file = None
+        self.segment_size = 0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.load_errors = 0
+
+    async def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    async def record(self, action: str, entity: str, entity_id: int | None = None,
+                     changes: dict | None = None, actor_id: int | None = None) -> None:
+        if self.task is None:
+            return
+        if actor_id is None:
+            actor_id = current_actor.get()
+        item = (time.time(), actor_id, action, entity, entity_id, mask_changes(changes))
+        if self.overflow == "block":
+            await self.queue.put(item)
+        else:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                return
+        self.enqueued += 1
+
+    def stats(self) -> dict:
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "load_errors": self.load_errors,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "segment": self.file.name if self.file is not None else None,
+        }
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if not batch:
+                continue
+            try:
+                await asyncio.to_thread(self._write, batch)
+                self.written += len(batch)
+            except OSError:
+                logger.exception("Не удалось записать %d записей аудита", len(batch))
+                continue
+            if self.loader is not None:
+                try:
+                    await self.loader(batch)
+                except Exception:
+                    self.load_errors += 1
+                    logger.exception("Не удалось загрузить %d записей аудита в БД", len(batch))
+
+    async def _next_batch(self) -> tuple[list[tuple], bool]:
+        first = await self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if self.queue.empty():
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                else:
+                    item = self.queue.get_nowait()
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: list[tuple]) -> None:
+        data = b"".join(encode(record) for record in batch)
+        if self.file is None or self.segment_size >= self.segment_bytes:
+            self._rotate(batch[0][0])
+        self.file.write(data)
+        self.file.flush()
+        self.segment_size += len(data)
+
+    def _rotate(self, started_at: float) -> None:
+        if self.file is not None:
+            self.file.close()
+        path = self.directory / segment_name(started_at, os.getpid())
+        self.file = open(path, "ab", buffering=1024 * 1024)
+        self.segment_size = os.path.getsize(path)
+
+
+audit_log = AuditLog(
+    directory=settings.audit_dir,
+    queue_size=settings.audit_queue_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval,
+    segment_bytes=settings.audit_segment_bytes,
+    overflow=settings.audit_overflow,
+)
+
+
+def segments(directory: str | Path, since: float | None = None,
+             until: float | None = None) -> dict[str, list[Path]]:
+    """Сегменты каждого процесса-писателя, которые могут содержать записи из [since, until]."""
+    by_writer: dict[str, list[tuple[float, Path]]] = {}
+    for path in Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"):
+        started_at, writer = parse_segment_name(path)
+        by_writer.setdefault(writer, []).append((started_at, path))
+    selected = {}
+    for writer, items in by_writer.items():
+        items.sort()
+        paths = []
+        for index, (started_at, path) in enumerate(items):
+            next_start = items[index + 1][0] if index + 1 < len(items) else float("inf")
+            if until is not None and started_at > until:
+                break
+            if since is not None and next_start < since:
+                continue
+            paths.append(path)
+        if paths:
+            selected[writer] = paths
+    return selected
+
+
+def _read_writer(paths: list[Path], low: float, high: float) -> Iterator[tuple[float, bytes]]:
+    for path in paths:
+        with open(path, "rb") as file:
+            for line in file:
+                ts_raw, _, payload = line.partition(b"\t")
+                ts = float(ts_raw)
+                if ts > high:
+                    return
+                if ts >= low:
+                    yield ts, payload
+
+
+def read(directory: str | Path, since: float | None = None, until: float | None = None) -> Iterator[dict]:
+    """Записи журнала за интервал по возрастанию времени.
+
+    Записи одного писателя идут по времени, поэтому чтение его сегментов
+    прекращается на первой строке позже until, а потоки разных писателей
+    сливаются. JSON разбирается только у подходящих по времени строк.
+    """
+    low = since if since is not None else float("-inf")
+    high = until if until is not None else float("inf")
+    streams = [_read_writer(paths, low, high) for paths in segments(directory, since, until).values()]
+    for ts, payload in heapq.merge(*streams, key=lambda item: item[0]):
+        record = json.loads(payload)
+        record["ts"] = ts
+        yield record
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import deque
+
+from .config import settings
+
+
+class Overloaded(Exception):
+    """Запрос отброшен: лимит и очередь маршрута заняты или истёк срок ожидания."""
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов одного маршрута, подстраиваемый по AIMD.
+
+    baseline - задержка маршрута без нагрузки: опускается до минимальной
+    наблюдённой и медленно поднимается вслед за остальными. Пока задержка
+    запроса не превышает baseline * tolerance, лимит растёт на 1/limit за
+    запрос (примерно +1 за «поколение» запросов). Если превышает - лимит
+    умножается на backoff, но не чаще раза за время такого запроса, чтобы
+    одна волна медленных ответов не обрушила его до минимума.
+
+    Сверх лимита запросы ждут в очереди до queue_size штук и не дольше
+    queue_timeout секунд, остальные сразу получают Overloaded.
+    """
+
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float, queue_size: int,
+                 queue_timeout: float, tolerance: float = 2.0, backoff: float = 0.9):
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.baseline: float | None = None
+        self.last_latency: float | None = None
+        self.last_decrease = 0.0
+        self.accepted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    async def acquire(self) -> None:
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.accepted += 1
+            return
+        if len(self.waiters) >= self.queue_size:
+            self.shed += 1
+            raise Overloaded
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже передан этому запросу - возвращаем его следующему
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise Overloaded
+        self.accepted += 1
+
+    def release(self, latency: float | None) -> None:
+        if latency is not None:
+            self._observe(latency)
+        self.in_flight -= 1
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _remove(self, waiter: asyncio.Future) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _observe(self, latency: float) -> None:
+        self.last_latency = latency
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * 0.01
+        now = time.monotonic()
+        if latency > self.baseline * self.tolerance:
+            if now - self.last_decrease > latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        elif self.in_flight >= int(self.limit) - 1:
+            # Растём, только когда лимит действительно используется
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+            "last_latency_ms": round(self.last_latency * 1000, 2) if self.last_latency is not None else None,
+            "accepted": self.accepted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+class ConcurrencyLimits:
+    """Лимитеры по маршрутам, создаются при первом запросе к маршруту."""
+
+    def __init__(self, initial_limit: float, min_limit: float, max_limit: float, queue_size: int,
+                 queue_timeout: float, tolerance: float = 2.0, backoff: float = 0.9):
+        self.options = dict(initial_limit=initial_limit, min_limit=min_limit, max_limit=max_limit,
+                            queue_size=queue_size, queue_timeout=queue_timeout,
+                            tolerance=tolerance, backoff=backoff)
+        self.limiters: dict[str, AdaptiveLimiter] = {}
+
+    def limiter(self, route: str) -> AdaptiveLimiter:
+        limiter = self.limiters.get(route)
+        if limiter is None:
+            limiter = self.limiters[route] = AdaptiveLimiter(**self.options)
+        return limiter
+
+    def snapshot(self) -> dict[str, dict]:
+        return {route: limiter.as_dict() for route, limiter in sorted(self.limiters.items())}
+
+
+concurrency_limits = ConcurrencyLimits(
+    initial_limit=settings.concurrency_initial_limit,
+    min_limit=settings.concurrency_min_limit,
+    max_limit=settings.concurrency_max_limit,
+    queue_size=settings.concurrency_queue_size,
+    queue_timeout=settings.concurrency_queue_timeout,
+    tolerance=settings.concurrency_latency_tolerance,
+    backoff=settings.concurrency_backoff,
+)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -14,6 +15,137 @@ class Settings(BaseSettings):
     jwt_access_token_expire_minutes: int = 60
     jwt_response_token_expire_days: int = 7
 
+    # Стоимость bcrypt подбирается командой python -m scripts.calibrate_password_hashing
+    password_bcrypt_rounds: int = 12
+    password_hash_budget_ms: float = 250.0
+
+    profiling_sample_rate: float = 0.0
+    profiling_header: str = 'X-Profile'
+    profiling_interval_ms: float = 2.0
+    profiling_dir: str = str(BASE_DIR / "profiles")
+
+    # Трассировка: доля выбранных запросов, memory - только кольцо для /admin/traces,
+    # file - кольцо и OTLP JSON в tracing_dir
+    tracing_sample_rate: float = 0.0
+    tracing_exporter: Literal["memory", "file"] = "memory"
+    tracing_ring_size: int = 200
+    tracing_max_spans: int = 1000
+    tracing_dir: str = str(BASE_DIR / "traces")
+    tracing_service_name: str = "test_task_effective_mobile"
+
+    slow_query_threshold_ms: float = 200.0
+    query_stats_max_fingerprints: int = 500
+    query_stats_window: int = 256
+
+    feed_ring_size: int = 500
+    feed_page_size: int = 20
+    # Раз в столько секунд кольца ленты сверяют версию постов в БД и сбрасываются, если посты
+    # изменил другой процесс (другой воркер, scripts.archive_users); 0 - сверять при каждом запросе
+    feed_version_ttl: float = 1.0
+
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    template_stream_chunk_size: int = 16384
+    template_stream_batch_size: int = 500
+
+    audit_enabled: bool = True
+    audit_dir: str = str(BASE_DIR / "audit")
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 0.5
+    audit_segment_bytes: int = 64 * 1024 * 1024
+    # drop - отбрасывать записи при переполнении очереди, block - ждать места в очереди
+    audit_overflow: Literal["drop", "block"] = "drop"
+    audit_db_enabled: bool = False
+
+    # Вложения постов: файлы по sha256 содержимого, запись и отдача кусками attachment_chunk_size
+    attachments_dir: str = str(BASE_DIR / "attachments")
+    attachment_chunk_size: int = 1024 * 1024
+    attachment_max_size: int = 10 * 1024 ** 3
+
+    concurrency_enabled: bool = True
+    concurrency_initial_limit: float = 10
+    concurrency_min_limit: float = 2
+    concurrency_max_limit: float = 50
+    concurrency_queue_size: int = 20
+    concurrency_queue_timeout: float = 0.5
+    concurrency_latency_tolerance: float = 2.0
+    concurrency_backoff: float = 0.9
+    concurrency_retry_after: int = 1
+    # Префиксы путей без ограничения: проверки живости, метрики, админка, статика, долгие SSE-потоки
+    concurrency_exempt_paths: list[str] = ["/health", "/metrics", "/admin", "/static", "/events"]
+    # Маршруты "METHOD /шаблон" без ограничения: загрузка и скачивание вложений идут минутами
+    concurrency_exempt_routes: list[str] = [
+        "POST /post/{post_id}/attachments",
+        "GET /post/{post_id}/attachments/{attachment_id}",
+        "HEAD /post/{post_id}/attachments/{attachment_id}",
+    ]
+
+    # Срок обработки запроса, с: по умолчанию и по маршрутам "METHOD /шаблон"; 0 - без срока.
+    # Заголовок deadline_header задаёт срок запроса в пределах [deadline_min, deadline_max]
+    deadline_enabled: bool = True
+    deadline_default: float = 10.0
+    deadline_routes: dict[str, float] = {
+        "GET /index": 5.0,
+        "GET /post/": 5.0,
+        "GET /post/feed": 3.0,
+        "GET /post/{post_id}": 2.0,
+        "POST /post/{post_id}/attachments": 0,
+        "GET /post/{post_id}/attachments/{attachment_id}": 0,
+        "HEAD /post/{post_id}/attachments/{attachment_id}": 0,
+    }
+    deadline_header: str = "X-Request-Timeout"
+    deadline_min: float = 0.05
+    deadline_max: float = 30.0
+    # Запас statement_timeout БД сверх срока запроса: первой срабатывает отмена обработчика
+    deadline_statement_slack: float = 0.1
+    deadline_exempt_paths: list[str] = ["/health", "/static", "/events"]
+
+    # Запись обезличенной выборки запросов для scripts/replay_traffic.py; тела больше
+    # capture_max_body байт записываются только размером
+    capture_enabled: bool = False
+    capture_sample_rate: float = 1.0
+    capture_dir: str = str(BASE_DIR / "captures")
+    capture_max_body: int = 64 * 1024
+    capture_segment_bytes: int = 64 * 1024 * 1024
+    capture_queue_size: int = 10000
+    capture_exempt_paths: list[str] = ["/health", "/metrics", "/admin", "/static", "/events"]
+
+    # События постов для SSE: кадров в буфере соединения до отключения, событий в журнале для Last-Event-ID
+    post_events_buffer_size: int = 256
+    post_events_replay_size: int = 1000
+    post_events_keepalive: float = 15.0
+
+    # Архив: python -m scripts.archive_users переносит пользователей, выключенных дольше archive_after_days
+    # дней, и их посты в users_archive/posts_archive пачками по archive_batch_size с паузой archive_batch_pause.
+    # archive_fallback_enabled - чтения, не нашедшие строку в горячих таблицах, ищут её в архиве
+    archive_after_days: int = 180
+    archive_batch_size: int = 500
+    archive_batch_pause: float = 0.05
+    archive_fallback_enabled: bool = True
+
+    # sqlalchemy - БД, memory - хранилище в памяти процесса для бенчмарков без ввода-вывода
+    repository_backend: Literal["sqlalchemy", "memory"] = "sqlalchemy"
+
+    single_flight_enabled: bool = True
+    statement_warmup_enabled: bool = True
+
+    # Шарды постов: {"имя": "url"}. Пусто - посты хранятся в основной БД.
+    post_shards: dict[str, str] = {}
+    post_shard_vnodes: int = 128
+    post_shard_placement_ttl: float = 5.0
+
+    # Запуск через python -m serve: 0 воркеров - по числу доступных ядер. Кольца ленты сверяются
+    # между воркерами через feed_version_ttl, а SSE, single-flight и ограничитель нагрузки у каждого воркера свои
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1
+    server_max_requests: int = 10000
+    server_max_requests_jitter: int = 1000
+    server_graceful_timeout: float = 30.0
+
     api_v1_prefix: str = '/api/v1'
     alembic_prefix: str = '/alembic'
 
@@ -2,6 +2,16 @@ from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, asyn
 from asyncio import current_task
 
 from .config import settings
+from .profiler import install_db_timer
+from .query_stats import QueryStats, install_query_stats
+from .deadlines import install_statement_deadline
+from .tracing import install_sql_spans
+
+query_stats = QueryStats(
+    max_fingerprints=settings.query_stats_max_fingerprints,
+    window=settings.query_stats_window,
+    slow_threshold_ms=settings.slow_query_threshold_ms,
+)
 
 
 class DataBaseHelper:
@@ -13,6 +23,10 @@ class DataBaseHelper:
             pool_size=5,
             max_overflow=10
         )
+        install_db_timer(self.engine.sync_engine)
+        install_query_stats(self.engine.sync_engine, query_stats)
+        install_sql_spans(self.engine.sync_engine)
+        install_statement_deadline(self.engine.sync_engine, settings.deadline_statement_slack)
         self.session_factory = async_sessionmaker(
             bind=self.engine,
             autoflush=True,
@@ -29,13 +43,18 @@ class DataBaseHelper:
 
     async def session_dependency(self) -> AsyncSession:
         async with self.session_factory() as session:
-            yield session
-            await session.close()
+            try:
+                yield session
+            finally:
+                await session.close()
 
     async def scoped_session_dependency(self) -> AsyncSession:
         session = self.get_scoped_session()
-        yield session
-        await session.close()
+        try:
+            yield session
+        finally:
+            # И при отмене запроса по сроку: соединение возвращается в пул, а не ждёт сборщика мусора
+            await session.close()
 
 
 db_helper = DataBaseHelper(
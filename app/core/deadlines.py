@@ -0,0 +1,186 @@
+"""Сроки выполнения запросов (дедлайны) и их передача в БД.
+
+DeadlineMiddleware кладёт Deadline в current_deadline, и все запросы к БД,
+выполняемые обработчиком, получают ограничение на стороне сервера:
+statement_timeout на транзакцию в PostgreSQL, прерывание через progress
+handler в SQLite. Ограничение БД выставляется с запасом statement_slack,
+чтобы первой срабатывала отмена обработчика в middleware, а БД лишь
+освобождала соединение, если отмена до неё не дошла.
+"""
+import logging
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.util import await_only
+
+from .config import settings
+from .query_stats import fingerprint
+
+logger = logging.getLogger("app.deadline")
+
+# Кадры этих модулей не считаются этапом: это обёртки вокруг настоящей работы
+_WRAPPER_MODULES = ("app.core.deadlines", "app.core.tracing", "app.middleware.deadline_middleware")
+# Как часто SQLite вызывает progress handler (число инструкций виртуальной машины)
+_SQLITE_PROGRESS_STEPS = 1000
+
+current_deadline: ContextVar["Deadline | None"] = ContextVar("current_deadline", default=None)
+
+
+class Deadline:
+    """Срок одного запроса и SQL, выполняемый в данный момент (для отчёта об этапе)."""
+
+    __slots__ = ("budget", "started", "expires_at", "statement")
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget
+        self.statement: str | None = None
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+
+class Deadlines:
+    """Бюджеты времени маршрутов и статистика превышений.
+
+    Бюджет маршрута - routes["METHOD /шаблон/пути"] или default, 0 - без
+    дедлайна. Заголовок header задаёт бюджет запроса в секундах в пределах
+    [minimum, maximum].
+    """
+
+    def __init__(self, default: float, routes: dict[str, float], header: str, minimum: float, maximum: float,
+                 statement_slack: float, recent_size: int = 100):
+        self.default = default
+        self.routes = routes
+        self.header = header
+        self.minimum = minimum
+        self.maximum = maximum
+        self.statement_slack = statement_slack
+        self.exceeded: dict[str, dict[str, int]] = {}
+        self.disconnected: dict[str, int] = {}
+        self.recent: deque[dict] = deque(maxlen=recent_size)
+
+    def budget(self, route: str, requested: str | None) -> float | None:
+        budget = self.routes.get(route, self.default)
+        if not budget:
+            return None
+        if requested:
+            try:
+                budget = min(max(float(requested), self.minimum), self.maximum)
+            except ValueError:
+                pass
+        return budget
+
+    def record(self, route: str, reason: str, stage: str, deadline: Deadline) -> None:
+        if reason == "timeout":
+            stages = self.exceeded.setdefault(route, {})
+            stages[stage] = stages.get(stage, 0) + 1
+            logger.warning("Дедлайн %.3f с превышен (%s) на этапе %s%s", deadline.budget, route, stage,
+                           f": {fingerprint(deadline.statement)}" if deadline.statement else "")
+        else:
+            self.disconnected[route] = self.disconnected.get(route, 0) + 1
+        self.recent.append({
+            "route": route,
+            "reason": reason,
+            "stage": stage,
+            "statement": fingerprint(deadline.statement) if deadline.statement else None,
+            "budget_ms": round(deadline.budget * 1000, 1),
+            "elapsed_ms": round(deadline.elapsed() * 1000, 1),
+            "at": time.time(),
+        })
+
+    def snapshot(self) -> dict:
+        return {
+            "default": self.default,
+            "routes": self.routes,
+            "header": self.header,
+            "exceeded": self.exceeded,
+            "disconnected": self.disconnected,
+            "recent": list(reversed(self.recent)),
+        }
+
+    def reset(self) -> None:
+        self.exceeded.clear()
+        self.disconnected.clear()
+        self.recent.clear()
+
+
+def stage_of(task) -> str:
+    """Самый глубокий кадр кода приложения в цепочке await задачи: <модуль>.<функция>."""
+    stage = "handler"
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None)
+        if frame is None:
+            break
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and module not in _WRAPPER_MODULES:
+            stage = f"{module.rsplit('.', 1)[-1]}.{frame.f_code.co_qualname}"
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None)
+    return stage
+
+
+def install_statement_deadline(engine: Engine, slack: float) -> None:
+    """Ограничивает SQL на стороне БД сроком текущего запроса."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        deadline = current_deadline.get()
+        if deadline is None:
+            return
+        deadline.statement = statement
+        if conn.dialect.name == "postgresql":
+            if not conn.info.get("statement_timeout_set"):
+                # set_config(..., true) действует до конца транзакции, как SET LOCAL
+                timeout_ms = max(int((deadline.remaining() + slack) * 1000), 1)
+                cursor.execute("SELECT set_config('statement_timeout', $1, true)", (str(timeout_ms),))
+                conn.info["statement_timeout_set"] = True
+        elif conn.dialect.name == "sqlite":
+            conn.connection.info["sqlite_deadline"][0] = deadline.expires_at + slack
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        deadline = current_deadline.get()
+        if deadline is not None:
+            deadline.statement = None
+
+    @event.listens_for(engine, "commit")
+    @event.listens_for(engine, "rollback")
+    def _end(conn):
+        conn.info.pop("statement_timeout_set", None)
+
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection, connection_record):
+            # Срок хранится в изменяемом списке: progress handler выполняется в потоке aiosqlite
+            expires_at: list[float | None] = [None]
+            connection_record.info["sqlite_deadline"] = expires_at
+
+            def interrupt() -> int:
+                return 1 if expires_at[0] is not None and time.monotonic() > expires_at[0] else 0
+
+            await_only(dbapi_connection.driver_connection.set_progress_handler(interrupt, _SQLITE_PROGRESS_STEPS))
+
+        # Строки результата SQLite читает уже после after_cursor_execute, поэтому срок
+        # снимается только при возврате соединения в пул
+        @event.listens_for(engine, "checkin")
+        def _checkin(dbapi_connection, connection_record):
+            if "sqlite_deadline" in connection_record.info:
+                connection_record.info["sqlite_deadline"][0] = None
+
+
+deadlines = Deadlines(
+    default=settings.deadline_default,
+    routes=settings.deadline_routes,
+    header=settings.deadline_header,
+    minimum=settings.deadline_min,
+    maximum=settings.deadline_max,
+    statement_slack=settings.deadline_statement_slack,
+)
@@ -0,0 +1,21 @@
+def negotiate_encoding(accept_encoding: str, available: tuple[str, ...] = ("br", "gzip")) -> str | None:
+    """Выбирает кодировку из available по заголовку Accept-Encoding с учётом q-значений.
+
+    При равном q предпочтение отдаётся кодировке, стоящей раньше в available.
+    """
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if not available:
+        return None
+    wildcard = offered.get("*", 0.0)
+    best = max(available, key=lambda name: offered.get(name, wildcard))
+    return best if offered.get(best, wildcard) > 0 else None
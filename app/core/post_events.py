@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import secrets
+from collections import deque
+
+from .config import settings
+
+POST_FIELDS = ("id", "tittle", "description", "required_access_id", "owner_id")
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+KEEPALIVE_FRAME = b": keepalive\n\n"
+# Пауза браузера перед переподключением после обрыва или отключения
+RETRY_FRAME = b"retry: 3000\n\n"
+
+
+def visible_kind(kind: str, required_access: int, previous_access: int | None, level: int) -> str | None:
+    """Каким событие выглядит для подписчика уровня level, None - не видно.
+
+    Изменение уровня доступа поста превращается в появление или удаление:
+    подписчик, который не видел пост, получает created, переставший видеть - deleted.
+    """
+    visible = required_access <= level
+    if kind == "updated" and previous_access is not None:
+        was_visible = previous_access <= level
+        if visible and not was_visible:
+            return "created"
+        if was_visible and not visible:
+            return "deleted"
+    return kind if visible else None
+
+
+class Subscriber:
+    """Одно SSE-соединение: кадры ждут отправки в buffer, wakeup будит поток ответа."""
+
+    __slots__ = ("level", "buffer", "wakeup", "evicted")
+
+    def __init__(self, level: int):
+        self.level = level
+        self.buffer: list[bytes] = []
+        self.wakeup = asyncio.Event()
+        self.evicted = False
+
+    def drain(self) -> bytes:
+        chunk = b"".join(self.buffer)
+        self.buffer = []
+        return chunk
+
+
+class PostEvents:
+    """Рассылка событий постов подписчикам SSE в пределах процесса.
+
+    publish вызывается из путей записи репозиториев и не ждёт подписчиков:
+    кадр события собирается один раз на вид события и кладётся в буферы
+    подписчиков, сгруппированных по уровню доступа. Подписчик, у которого
+    в буфере накопилось buffer_size кадров, отключается; браузер
+    переподключится с Last-Event-ID и дочитает пропущенное из журнала
+    последних replay_size событий. Если нужных событий в журнале уже нет,
+    подписчик получает reset и перезагружает страницу.
+    """
+
+    def __init__(self, buffer_size: int, replay_size: int, keepalive: float):
+        self.buffer_size = buffer_size
+        self.keepalive = keepalive
+        self.replay: deque[tuple[int, str, dict, int | None]] = deque(maxlen=replay_size)
+        self.levels: dict[int, set[Subscriber]] = {}
+        self.restart()
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+        self.resumed = 0
+        self.resets = 0
+
+    def restart(self) -> None:
+        """Новая нумерация событий. Id включают метку процесса, поэтому id, выданные
+        до перезапуска или другим воркером, не продолжаются, а ведут к reset."""
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        self.replay.clear()
+        self.levels.clear()
+
+    def publish(self, kind: str, post, previous_access: int | None = None) -> None:
+        self.seq += 1
+        self.published += 1
+        data = {field: getattr(post, field) for field in POST_FIELDS}
+        self.replay.append((self.seq, kind, data, previous_access))
+        frames: dict[str, bytes] = {}
+        for level, subscribers in self.levels.items():
+            seen_as = visible_kind(kind, data["required_access_id"], previous_access, level)
+            if seen_as is None:
+                continue
+            frame = frames.get(seen_as)
+            if frame is None:
+                frame = frames[seen_as] = self._frame(self.seq, seen_as, data)
+            for subscriber in list(subscribers):
+                self._push(subscriber, frame)
+
+    def subscribe(self, level: int, last_event_id: str | None = None) -> Subscriber:
+        subscriber = Subscriber(level)
+        if last_event_id:
+            self._resume(subscriber, last_event_id)
+        self.levels.setdefault(level, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self.levels.get(subscriber.level)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self.levels[subscriber.level]
+
+    async def stream(self, level: int, last_event_id: str | None = None):
+        """Тело ответа text/event-stream.
+
+        Подписка оформляется при старте генератора, а отключение клиента
+        отменяет его - подписчик не остаётся висеть без соединения.
+        """
+        subscriber = self.subscribe(level, last_event_id)
+        try:
+            yield RETRY_FRAME
+            while not subscriber.evicted:
+                if subscriber.buffer:
+                    yield subscriber.drain()
+                    continue
+                subscriber.wakeup.clear()
+                try:
+                    async with asyncio.timeout(self.keepalive):
+                        await subscriber.wakeup.wait()
+                except TimeoutError:
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": sum(len(subscribers) for subscribers in self.levels.values()),
+            "by_level": {str(level): len(subscribers) for level, subscribers in sorted(self.levels.items())},
+            "last_event_id": self.event_id(self.seq),
+            "replay_events": len(self.replay),
+            "published": self.published,
+            "delivered": self.delivered,
+            "evicted": self.evicted,
+            "resumed": self.resumed,
+            "resets": self.resets,
+        }
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _frame(self, seq: int, kind: str, data: dict) -> bytes:
+        payload = {"id": data["id"]} if kind == "deleted" else data
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return f"id: {self.event_id(seq)}\nevent: {kind}\ndata: {body}\n\n".encode()
+
+    def _push(self, subscriber: Subscriber, frame: bytes) -> None:
+        if subscriber.evicted:
+            return
+        if len(subscriber.buffer) >= self.buffer_size:
+            # Медленный клиент: отключаем, он дочитает пропущенное при переподключении
+            subscriber.evicted = True
+            subscriber.buffer = []
+            self.evicted += 1
+            self.unsubscribe(subscriber)
+        else:
+            subscriber.buffer.append(frame)
+            self.delivered += 1
+        subscriber.wakeup.set()
+
+    def _resume(self, subscriber: Subscriber, last_event_id: str) -> None:
+        epoch, _, seq = last_event_id.partition("-")
+        oldest = self.replay[0][0] if self.replay else self.seq + 1
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq or int(seq) + 1 < oldest:
+            self.resets += 1
+            subscriber.buffer.append(RESET_FRAME)
+            return
+        self.resumed += 1
+        missed = [event for event in self.replay if event[0] > int(seq)]
+        for event_seq, kind, data, previous_access in missed:
+            seen_as = visible_kind(kind, data["required_access_id"], previous_access, subscriber.level)
+            if seen_as is not None:
+                subscriber.buffer.append(self._frame(event_seq, seen_as, data))
+        if len(subscriber.buffer) > self.buffer_size:
+            self.resets += 1
+            subscriber.buffer = [RESET_FRAME]
+
+
+post_events = PostEvents(
+    buffer_size=settings.post_events_buffer_size,
+    replay_size=settings.post_events_replay_size,
+    keepalive=settings.post_events_keepalive,
+)
+# Воркеры, порождённые fork из предзагруженного мастера (serve.py), получают свою нумерацию
+os.register_at_fork(after_in_child=post_events.restart)
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Профиль текущего запроса. None для всех непрофилируемых запросов,
+# поэтому обработчики событий SQLAlchemy стоят одного ContextVar.get().
+current_profile: ContextVar["RequestProfile | None"] = ContextVar("current_profile", default=None)
+
+WAITING_FRAME = "[await]"
+
+
+class RequestProfile:
+    """Статистический профиль одного запроса.
+
+    Отдельный поток с заданным интервалом снимает стек задачи asyncio,
+    обслуживающей запрос. Если задача выполняется - берётся реальный стек
+    потока event loop, обрезанный до корутины задачи. Если задача ждёт
+    (ввод-вывод, БД, пул потоков) - берётся цепочка cr_await, поэтому время
+    ожидания тоже попадает в профиль (wall-clock).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self.db_time = 0.0
+        self.db_statements = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread_id: int | None = None
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.current_task()
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self.started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self.started_at
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stack = self._sample()
+            if stack:
+                self.samples[stack] += 1
+
+    def _sample(self) -> tuple[str, ...]:
+        task = self._task
+        running = getattr(asyncio.tasks, "_current_tasks", {}).get(self._loop)
+        if running is task:
+            frame = sys._current_frames().get(self._thread_id)
+            return _thread_stack(frame, task.get_coro())
+        return _await_stack(task.get_coro()) + (WAITING_FRAME,)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame, root_coro) -> tuple[str, ...]:
+    root = getattr(root_coro, "cr_frame", None)
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _await_stack(coro) -> tuple[str, ...]:
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(stack)
+
+
+def install_db_timer(engine: Engine) -> None:
+    """Подключает учёт времени SQL к профилю текущего запроса."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is not None and conn.info.get("profile_start"):
+            profile.db_time += time.perf_counter() - conn.info["profile_start"].pop()
+            profile.db_statements += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("profile_start"):
+            connection.info["profile_start"].pop()
+
+
+def save_profile(profile: RequestProfile, directory: Path, route: str, principal: str | None) -> Path:
+    """Сохраняет профиль в формате speedscope и рядом - в формате collapsed stacks."""
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    slug = route.replace(" ", "").strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    base = directory / f"{stamp}-{slug}-{id(profile):x}"
+    metadata = {
+        "route": route,
+        "principal": principal,
+        "duration_ms": round(profile.duration * 1000, 3),
+        "db_time_ms": round(profile.db_time * 1000, 3),
+        "db_statements": profile.db_statements,
+        "interval_ms": profile.interval * 1000,
+        "samples": sum(profile.samples.values()),
+    }
+
+    frames: list[dict] = []
+    frame_index: dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in profile.samples.items():
+        indexes = []
+        for name in stack:
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            indexes.append(frame_index[name])
+        samples.append(indexes)
+        weights.append(count * profile.interval * 1000)
+    speedscope = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": f"{route} ({principal or 'anonymous'})",
+        "exporter": "app.core.profiler",
+        "metadata": metadata,
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": route,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+    base.with_suffix(".speedscope.json").write_text(json.dumps(speedscope, ensure_ascii=False), encoding="utf-8")
+    with open(base.with_suffix(".collapsed"), "w", encoding="utf-8") as f:
+        for stack, count in profile.samples.items():
+            f.write(";".join(name.replace(";", ",") for name in stack) + f" {count}\n")
+    return base.with_suffix(".speedscope.json")
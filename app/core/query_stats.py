@@ -0,0 +1,184 @@
+import logging
+import re
+import sys
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("app.slow_query")
+
+APP_DIR = str(Path(__file__).resolve().parent.parent)
+CORE_DIR = str(Path(__file__).resolve().parent)
+REPOSITORIES_DIR = str(Path(APP_DIR) / "repositories")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|:\w+|\?|__\[POSTCOMPILE_\w+\]")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\)\s*,\s*\((?:\s*\?\s*,?)+\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Приводит SQL к виду без литералов и параметров.
+
+    Запросы, различающиеся только значениями, длиной IN (...) или числом
+    строк в VALUES, получают одинаковый отпечаток.
+    """
+    sql = _STRING.sub("?", statement)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?)", sql)
+    sql = _VALUES_LIST.sub(")", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+class FingerprintStats:
+    __slots__ = ("fingerprint", "count", "total", "max", "rows", "recent")
+
+    def __init__(self, fingerprint: str, window: int):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def add(self, duration: float, rows: int) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.rows += rows
+        self.recent.append(duration)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def p95(self) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def as_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.mean * 1000, 3),
+            "p95_ms": round(self.p95 * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class QueryStats:
+    """Агрегаты по отпечаткам запросов в таблице фиксированного размера.
+
+    Когда таблица заполнена, новый отпечаток вытесняет запись с наименьшим
+    суммарным временем, поэтому память ограничена max_fingerprints * window.
+    p95 считается по последним window выполнениям.
+    """
+
+    def __init__(self, max_fingerprints: int = 500, window: int = 256, slow_threshold_ms: float = 200.0):
+        self.max_fingerprints = max_fingerprints
+        self.window = window
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.entries: dict[str, FingerprintStats] = {}
+        self.evicted = 0
+
+    def record(self, statement: str, duration: float, rows: int) -> str:
+        key = fingerprint(statement)
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_fingerprints:
+                victim = min(self.entries.values(), key=lambda item: item.total)
+                del self.entries[victim.fingerprint]
+                self.evicted += 1
+            entry = self.entries[key] = FingerprintStats(key, self.window)
+        entry.add(duration, rows)
+        return key
+
+    def top(self, limit: int = 20, order_by: str = "total") -> list[FingerprintStats]:
+        return sorted(self.entries.values(), key=lambda item: getattr(item, order_by), reverse=True)[:limit]
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self.evicted = 0
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Описывает параметры запроса типами и размерами, без самих значений."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameter_shape(parameters[0]) if parameters else None
+        return {"batch": len(parameters), "row": first}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_shape(value) for value in parameters]
+    return type(parameters).__name__
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def calling_frames():
+    """Кадры текущего стека, включая корутины, ожидающие greenlet SQLAlchemy."""
+    frame = sys._getframe(1)
+    current = greenlet.getcurrent()
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+        if frame is None and current.parent is not None:
+            frame = current.parent.gr_frame
+            current = current.parent
+
+
+def repository_origin() -> str | None:
+    """Функция репозитория, выполнившая запрос, либо первая функция приложения вне app/core."""
+    fallback = None
+    for frame in calling_frames():
+        filename = frame.f_code.co_filename
+        if filename.startswith(REPOSITORIES_DIR):
+            return f"{Path(filename).stem}.{frame.f_code.co_name}"
+        if fallback is None and filename.startswith(APP_DIR) and not filename.startswith(CORE_DIR):
+            fallback = f"{Path(filename).stem}.{frame.f_code.co_name}"
+    return fallback
+
+
+def install_query_stats(engine: Engine, stats: QueryStats) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_start")
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        rows = max(getattr(cursor, "rowcount", 0) or 0, 0)
+        key = stats.record(statement, duration, rows)
+        if duration >= stats.slow_threshold:
+            logger.warning(
+                "Медленный запрос %.1f мс (%s): %s params=%s",
+                duration * 1000, repository_origin() or "unknown", key,
+                parameter_shape(parameters, executemany),
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_start"):
+            connection.info["query_start"].pop()
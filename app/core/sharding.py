@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import time
+from bisect import bisect
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from sqlalchemy import MetaData, Table, Column, select, insert, text, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from starlette import status
+
+from app.models import Post, Counter, PostShardPlacement, PostIdAllocation
+from app.models.counter import CounterScopeEnum
+
+from .config import settings
+from .db_helper import db_helper, query_stats
+from .profiler import install_db_timer
+from .query_stats import install_query_stats
+from .deadlines import install_statement_deadline
+from .tracing import install_sql_spans
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Консистентное хеширование с виртуальными узлами.
+
+    При добавлении или удалении шарда меняется владелец только примерно
+    1/N ключей, остальные владельцы остаются на своих шардах.
+    """
+
+    def __init__(self, nodes: list[str], vnodes: int = 128):
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key) -> str:
+        index = bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._nodes[index]
+
+
+def _shard_metadata() -> MetaData:
+    """Таблицы шарда: posts и counters без внешних ключей на основную БД."""
+    metadata = MetaData()
+    # id постов выдаёт основная БД (PostIdAllocation), поэтому без автоинкремента
+    Table(Post.__tablename__, metadata,
+          *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                   autoincrement=False if column.primary_key else "auto")
+            for column in Post.__table__.columns])
+    Counter.__table__.to_metadata(metadata)
+    return metadata
+
+
+class Shard:
+    def __init__(self, name: str, url: str, echo: bool = False):
+        self.name = name
+        self.engine = create_async_engine(url=url, echo=echo, future=True)
+        self.session_factory = async_sessionmaker(bind=self.engine, autoflush=True, expire_on_commit=False)
+        install_db_timer(self.engine.sync_engine)
+        install_query_stats(self.engine.sync_engine, query_stats)
+        install_sql_spans(self.engine.sync_engine)
+        install_statement_deadline(self.engine.sync_engine, settings.deadline_statement_slack)
+
+
+class ShardRouter:
+    """Маршрутизация постов по owner_id между несколькими БД.
+
+    Шард владельца вычисляется по кольцу хешей. Исключения (владельцы,
+    перенесённые или закреплённые при решардинге) хранятся в основной БД в
+    post_shard_placements и кешируются на placement_ttl секунд.
+    """
+
+    def __init__(self, shards: dict[str, str], vnodes: int = 128, placement_ttl: float = 5.0, echo: bool = False):
+        self.shards = {name: Shard(name, url, echo) for name, url in shards.items()}
+        self.vnodes = vnodes
+        self.ring = HashRing(list(self.shards), vnodes)
+        self.placement_ttl = placement_ttl
+        self.placements: dict[int, tuple[str, bool]] = {}
+        self.placements_loaded_at = float("-inf")
+        self.placements_lock = asyncio.Lock()
+
+    async def create_all(self) -> None:
+        metadata = _shard_metadata()
+        for shard in self.shards.values():
+            async with shard.engine.begin() as conn:
+                await conn.run_sync(metadata.create_all)
+            if shard.engine.dialect.name == "postgresql":
+                # create_all не меняет существующий тип: значения enum, добавленные позже, дописываем сами
+                async with shard.engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    for scope in CounterScopeEnum:
+                        await conn.execute(text(f"ALTER TYPE counterscopeenum ADD VALUE IF NOT EXISTS '{scope.name}'"))
+
+    async def refresh_placements(self, force: bool = False) -> None:
+        if not force and time.monotonic() - self.placements_loaded_at < self.placement_ttl:
+            return
+        async with self.placements_lock:
+            if not force and time.monotonic() - self.placements_loaded_at < self.placement_ttl:
+                return
+            async with db_helper.session_factory() as session:
+                result = await session.execute(
+                    select(PostShardPlacement.owner_id, PostShardPlacement.shard, PostShardPlacement.moving))
+                self.placements = {owner_id: (shard, moving) for owner_id, shard, moving in result.all()}
+            self.placements_loaded_at = time.monotonic()
+
+    def home_shard(self, owner_id: int) -> Shard:
+        return self.shards[self.ring.node_for(owner_id)]
+
+    async def shard_for(self, owner_id: int, write: bool = False) -> Shard:
+        await self.refresh_placements()
+        placement = self.placements.get(owner_id)
+        if placement is None:
+            return self.home_shard(owner_id)
+        shard, moving = placement
+        if write and moving:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Посты пользователя переносятся, повторите запрос позже",
+                                headers={"Retry-After": str(int(self.placement_ttl) + 1)})
+        return self.shards[shard]
+
+    @asynccontextmanager
+    async def session(self, owner_id: int, write: bool = False):
+        shard = await self.shard_for(owner_id, write=write)
+        async with shard.session_factory() as session:
+            yield session
+
+    async def scatter(self, fn) -> list:
+        """Выполняет fn(session) на всех шардах параллельно, каждый в своей сессии."""
+
+        async def run(shard: Shard):
+            async with shard.session_factory() as session:
+                return await fn(session)
+
+        return await asyncio.gather(*(run(shard) for shard in self.shards.values()))
+
+    async def allocate_post_id(self) -> int:
+        async with db_helper.session_factory() as session:
+            result = await session.execute(insert(PostIdAllocation).returning(PostIdAllocation.id))
+            post_id = result.scalar_one()
+            await session.commit()
+            # id не выше постов основной БД: scripts.reshard import-main ещё не резервировал их,
+            # и пост на шарде столкнулся бы с постом, который будет перенесён туда же
+            if post_id <= ((await session.execute(select(func.max(Post.id)))).scalar() or 0):
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    detail="Посты ещё не перенесены на шарды, повторите запрос позже",
+                                    headers={"Retry-After": str(int(self.placement_ttl) + 1)})
+        return post_id
+
+    async def dispose(self) -> None:
+        for shard in self.shards.values():
+            await shard.engine.dispose()
+
+
+shard_router = ShardRouter(
+    shards=settings.post_shards,
+    vnodes=settings.post_shard_vnodes,
+    placement_ttl=settings.post_shard_placement_ttl,
+    echo=settings.db_echo,
+) if settings.post_shards else None
+
+
+@asynccontextmanager
+async def owner_session(session: AsyncSession, owner_id: int, write: bool = False):
+    """Сессия, в которой лежат посты владельца: шард или переданная сессия основной БД."""
+    if shard_router is None:
+        yield session
+        return
+    async with shard_router.session(owner_id, write=write) as shard_session:
+        yield shard_session
+
+
+async def attach(session: AsyncSession, instance):
+    """Привязывает объект, загруженный в другой (уже закрытой) сессии, к session без SELECT."""
+    if instance in session:
+        return instance
+    return await session.merge(instance, load=False)
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable
+
+from .config import settings
+from .deadlines import current_deadline
+from .tracing import span
+
+
+class FlightStats:
+    __slots__ = ("calls", "executed", "coalesced")
+
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+class SingleFlight:
+    """Объединение одинаковых одновременных чтений (single-flight).
+
+    Первый вызов run() с ключом запускает fn() отдельной задачей, остальные
+    вызовы с тем же ключом, пришедшие до её завершения, ждут тот же результат.
+    Каждый вызывающий ждёт задачу через shield: отмена одного запроса (клиент
+    отключился) не отменяет общий запрос к БД для остальных. Поэтому fn должна
+    работать в своей сессии, а не в сессии запроса, которая может закрыться.
+
+    Задача выполняется без срока запроса, который её запустил (current_deadline):
+    иначе короткий X-Request-Timeout ведущего стал бы statement_timeout общего
+    запроса и оборвал его для остальных. Каждый ожидающий по-прежнему отменяется
+    по своему сроку.
+
+    invalidate(namespace) вызывается после записи: чтения, начатые позже, не
+    присоединяются к запросам, стартовавшим до записи, и видят новые данные.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.flights: dict[tuple, asyncio.Task] = {}
+        self.generations: dict[str, int] = {}
+        self.stats: dict[str, FlightStats] = {}
+
+    async def run(self, namespace: str, key, fn: Callable[[], Awaitable[Any]]):
+        if not self.enabled:
+            return await fn()
+        stats = self.stats.get(namespace)
+        if stats is None:
+            stats = self.stats[namespace] = FlightStats()
+        stats.calls += 1
+        flight_key = (namespace, self.generations.get(namespace, 0), key)
+        task = self.flights.get(flight_key)
+        # Задача создаётся внутри спана: запросы ведущего попадают в его трассу под этим спаном
+        with span(f"single_flight.{namespace}", **{"single_flight.coalesced": task is not None}):
+            if task is None:
+                stats.executed += 1
+                context = contextvars.copy_context()
+                context.run(current_deadline.set, None)
+                task = asyncio.create_task(fn(), context=context)
+                self.flights[flight_key] = task
+                task.add_done_callback(lambda done: self._finish(flight_key, done))
+            else:
+                stats.coalesced += 1
+            return await asyncio.shield(task)
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+    def _finish(self, flight_key: tuple, task: asyncio.Task) -> None:
+        if self.flights.get(flight_key) is task:
+            del self.flights[flight_key]
+        if not task.cancelled():
+            # Если все ожидающие отменены, исключение иначе попадёт в лог как неполученное
+            task.exception()
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self.flights),
+            "namespaces": {namespace: stats.as_dict() for namespace, stats in sorted(self.stats.items())},
+        }
+
+    def reset(self) -> None:
+        self.stats.clear()
+
+
+single_flight = SingleFlight(enabled=settings.single_flight_enabled)
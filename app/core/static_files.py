@@ -0,0 +1,79 @@
+import json
+import mimetypes
+from pathlib import Path
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.core.http_encoding import negotiate_encoding
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+STATIC_DIR = BASE_DIR / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+STATIC_URL = "/static"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def load_manifest(path: Path = MANIFEST_PATH) -> dict[str, str]:
+    """Соответствие исходного имени файла и его копии с хешем содержимого."""
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+manifest = load_manifest()
+
+
+def static_url(name: str) -> str:
+    """URL статического файла для шаблонов. Без собранного manifest - исходный файл."""
+    hashed = manifest.get(name)
+    if hashed is None:
+        return f"{STATIC_URL}/{name}"
+    return f"{STATIC_URL}/dist/{hashed}"
+
+
+class HashedStaticFiles(StaticFiles):
+    """StaticFiles, отдающий файлы из dist/ как неизменяемые.
+
+    Имя такого файла содержит хеш, поэтому его можно кешировать навсегда.
+    Если рядом лежит заранее сжатая копия (.br/.gz) и клиент её принимает,
+    отдаётся она, без сжатия на лету.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if Path(path).parts[:1] != ("dist",):
+            return await super().get_response(path, scope)
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    async def _precompressed_response(self, path: str, scope: Scope) -> Response | None:
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            return None
+        full_path, stat_result = self.lookup_path(path + PRECOMPRESSED_SUFFIXES[encoding])
+        if stat_result is None and encoding == "br":
+            encoding = "gzip"
+            full_path, stat_result = self.lookup_path(path + PRECOMPRESSED_SUFFIXES[encoding])
+        if stat_result is None:
+            return None
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return Response(status_code=304, headers={
+                key: value for key, value in response.headers.items()
+                if key in ("etag", "vary")
+            })
+        return response
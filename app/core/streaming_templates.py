@@ -0,0 +1,61 @@
+import secrets
+from typing import AsyncIterator
+
+import jinja2
+from markupsafe import Markup
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from app.core.static_files import static_url
+from app.core.tracing import TracedTemplate
+
+# Комментарий с случайным токеном: пользовательский текст экранируется
+# автоэкранированием, поэтому сам собой в вывод он попасть не может
+FLUSH_MARKER = Markup(f"<!--flush:{secrets.token_hex(8)}-->")
+
+
+class StreamingTemplates:
+    """Шаблоны, которые отдаются клиенту по мере рендера.
+
+    Jinja рендерит шаблон через generate_async, поэтому в контекст можно
+    передавать асинхронные итераторы (например, поток строк из БД) и обходить
+    их в {% for %}. Вывод копится до chunk_size байт; {{ flush() }} в шаблоне
+    отправляет накопленное сразу - так шапка страницы уходит до первого
+    запроса к БД.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 16384):
+        self.env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(directory),
+            autoescape=jinja2.select_autoescape(),
+            enable_async=True,
+        )
+        self.env.template_class = TracedTemplate
+        self.env.globals["static_url"] = static_url
+        self.env.globals["flush"] = lambda: FLUSH_MARKER
+        self.chunk_size = chunk_size
+
+    def TemplateResponse(self, request: Request, name: str, context: dict, status_code: int = 200,
+                         headers: dict | None = None) -> StreamingResponse:
+        template = self.env.get_template(name)
+        context = {"request": request, **context}
+        return StreamingResponse(self._render(template, context), status_code=status_code,
+                                 headers=headers, media_type="text/html; charset=utf-8")
+
+    async def _render(self, template: jinja2.Template, context: dict) -> AsyncIterator[bytes]:
+        buffer: list[str] = []
+        size = 0
+        async for piece in template.generate_async(context):
+            if FLUSH_MARKER in piece:
+                before, _, after = piece.partition(FLUSH_MARKER)
+                buffer.append(before)
+                yield "".join(buffer).encode()
+                buffer, size = [after], len(after)
+                continue
+            buffer.append(piece)
+            size += len(piece)
+            if size >= self.chunk_size:
+                yield "".join(buffer).encode()
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode()
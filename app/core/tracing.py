@@ -0,0 +1,340 @@
+"""Трассировка запросов: дерево спанов в контексте запроса и экспорт в OTLP JSON.
+
+Решение о выборке принимается один раз на входе запроса (TracingMiddleware).
+Для невыбранных запросов current_span остаётся None, и каждая точка
+трассировки (декоратор traced, span, обработчики событий SQLAlchemy,
+рендер шаблонов) сводится к одному ContextVar.get().
+"""
+import functools
+import json
+import os
+import random
+import re
+import secrets
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+
+import jinja2
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .query_stats import fingerprint
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_NAMES = {SPAN_KIND_INTERNAL: "internal", SPAN_KIND_SERVER: "server", SPAN_KIND_CLIENT: "client"}
+STATUS_CODE_ERROR = 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Завершённые спаны одного запроса."""
+
+    __slots__ = ("trace_id", "remote_parent_id", "root", "spans", "dropped", "max_spans")
+
+    def __init__(self, trace_id: str, remote_parent_id: str | None, max_spans: int):
+        self.trace_id = trace_id
+        self.remote_parent_id = remote_parent_id
+        self.root: Span | None = None
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.max_spans = max_spans
+
+    def add(self, span: "Span") -> None:
+        if len(self.spans) < self.max_spans or span is self.root:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+
+
+class Span:
+    """Участок работы внутри трассы.
+
+    Как контекстный менеджер делает себя текущим, и спаны, начатые внутри,
+    становятся дочерними. Без with (например, в асинхронных генераторах,
+    которые продолжаются в чужом контексте) спан завершают вызовом end().
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns", "error",
+                 "token")
+
+    def __init__(self, trace: Trace, parent_id: str | None, name: str, kind: int = SPAN_KIND_INTERNAL,
+                 attributes: dict | None = None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+        self.token = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: BaseException | None = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.trace.add(self)
+
+    def __enter__(self) -> "Span":
+        self.token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        current_span.reset(self.token)
+        self.end(exc)
+        return False
+
+
+class _NoopSpan:
+    """Общий спан невыбранных запросов: ничего не делает и ничего не хранит."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value) -> None:
+        pass
+
+    def end(self, error: BaseException | None = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Span | _NoopSpan:
+    """Дочерний спан текущего. Вне выбранного запроса - NOOP_SPAN."""
+    parent = current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, parent.span_id, name, kind, attributes)
+
+
+def traced(func):
+    """Спан на каждый вызов асинхронной функции, имя - <модуль>.<функция>."""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        parent = current_span.get()
+        if parent is None:
+            return await func(*args, **kwargs)
+        with Span(parent.trace, parent.span_id, name):
+            return await func(*args, **kwargs)
+
+    return wrapper
+
+
+class Tracer:
+    """Выборка запросов и хранение завершённых трасс.
+
+    Последние ring_size трасс хранятся в памяти для GET /admin/traces.
+    С exporter="file" каждая трасса также дописывается строкой OTLP JSON
+    (ExportTraceServiceRequest, как у file exporter OpenTelemetry Collector)
+    в directory/traces-<pid>.jsonl.
+    """
+
+    def __init__(self, sample_rate: float, ring_size: int, max_spans: int, exporter: str, directory: str,
+                 service_name: str):
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        self.exporter = exporter
+        self.directory = Path(directory)
+        self.service_name = service_name
+        self.ring: deque[Trace] = deque(maxlen=ring_size)
+        self.sampled = 0
+        self.exported = 0
+        self._file = None
+
+    def start(self, name: str, traceparent: str | None = None) -> Span | None:
+        """Корневой спан выбранного запроса или None.
+
+        Входящий traceparent (W3C Trace Context) продолжает чужую трассу
+        и несёт её решение о выборке; без него запрос выбирается с
+        вероятностью sample_rate.
+        """
+        match = _TRACEPARENT.match(traceparent) if traceparent else None
+        if match is not None:
+            if not int(match.group(3), 16) & 1:
+                return None
+            trace = Trace(match.group(1), match.group(2), self.max_spans)
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            trace = Trace(secrets.token_hex(16), None, self.max_spans)
+        else:
+            return None
+        self.sampled += 1
+        trace.root = Span(trace, trace.remote_parent_id, name, SPAN_KIND_SERVER)
+        return trace.root
+
+    def finish(self, trace: Trace) -> None:
+        self.ring.append(trace)
+        if self.exporter == "file":
+            self._write(trace)
+
+    def traces(self, limit: int, min_duration_ms: float = 0.0) -> list[Trace]:
+        """Последние трассы, новые первыми."""
+        found = []
+        for trace in reversed(self.ring):
+            if _duration_ms(trace.root) >= min_duration_ms:
+                found.append(trace)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def snapshot(self, limit: int, min_duration_ms: float = 0.0) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "exporter": self.exporter,
+            "sampled": self.sampled,
+            "exported": self.exported,
+            "stored": len(self.ring),
+            "traces": [_trace_dict(trace) for trace in self.traces(limit, min_duration_ms)],
+        }
+
+    def reset(self) -> None:
+        self.ring.clear()
+
+    def otlp(self, traces: list[Trace]) -> dict:
+        """Трассы в формате OTLP/JSON (ExportTraceServiceRequest)."""
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name),
+                                        _otlp_attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(item) for trace in traces for item in trace.spans],
+            }],
+        }]}
+
+    def _write(self, trace: Trace) -> None:
+        if self._file is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.directory / f"traces-{os.getpid()}.jsonl", "a", encoding="utf-8")
+        self._file.write(json.dumps(self.otlp([trace]), ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self.exported += 1
+
+    def restart(self) -> None:
+        """После fork: у воркера свой файл трасс и своё кольцо."""
+        self._file = None
+        self.ring.clear()
+
+
+def _duration_ms(item: Span) -> float:
+    return (item.end_ns - item.start_ns) / 1e6
+
+
+def _trace_dict(trace: Trace) -> dict:
+    root = trace.root
+    return {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "started_at": root.start_ns / 1e9,
+        "duration_ms": round(_duration_ms(root), 3),
+        "dropped_spans": trace.dropped,
+        "spans": [{
+            "span_id": item.span_id,
+            "parent_span_id": item.parent_id,
+            "name": item.name,
+            "kind": SPAN_KIND_NAMES[item.kind],
+            "start_ms": round((item.start_ns - root.start_ns) / 1e6, 3),
+            "duration_ms": round(_duration_ms(item), 3),
+            "attributes": item.attributes,
+            "error": item.error,
+        } for item in sorted(trace.spans, key=lambda item: item.start_ns)],
+    }
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(item: Span) -> dict:
+    result = {
+        "traceId": item.trace.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": item.kind,
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns),
+        "attributes": [_otlp_attribute(key, value) for key, value in item.attributes.items()],
+        "status": {"code": STATUS_CODE_ERROR, "message": item.error} if item.error else {},
+    }
+    if item.parent_id:
+        result["parentSpanId"] = item.parent_id
+    return result
+
+
+def install_sql_spans(engine: Engine) -> None:
+    """Спан на каждое выполнение SQL в выбранном запросе. Текст - отпечаток без значений."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = current_span.get()
+        if parent is not None:
+            conn.info.setdefault("trace_spans", []).append(Span(
+                parent.trace, parent.span_id, f"sql {statement.split(None, 1)[0].upper()}", SPAN_KIND_CLIENT,
+                {"db.system": conn.dialect.name, "db.statement": fingerprint(statement)}))
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("trace_spans") and current_span.get() is not None:
+            item = conn.info["trace_spans"].pop()
+            item.set("db.rows", max(getattr(cursor, "rowcount", 0) or 0, 0))
+            item.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("trace_spans"):
+            connection.info["trace_spans"].pop().end(context.original_exception)
+
+
+class TracedTemplate(jinja2.Template):
+    """Шаблон Jinja со спаном на рендер (env.template_class)."""
+
+    def render(self, *args, **kwargs) -> str:
+        with span("template.render", **{"template.name": self.name}):
+            return super().render(*args, **kwargs)
+
+    async def generate_async(self, *args, **kwargs):
+        # Генератор обходит тело ответа уже после выхода из обработчика,
+        # поэтому спан не делается текущим, а только замеряет рендер
+        template_span = span("template.render", **{"template.name": self.name, "template.streaming": True})
+        try:
+            async for piece in super().generate_async(*args, **kwargs):
+                yield piece
+        finally:
+            template_span.end()
+
+
+tracer = Tracer(
+    sample_rate=settings.tracing_sample_rate,
+    ring_size=settings.tracing_ring_size,
+    max_spans=settings.tracing_max_spans,
+    exporter=settings.tracing_exporter,
+    directory=settings.tracing_dir,
+    service_name=settings.tracing_service_name,
+)
+os.register_at_fork(after_in_child=tracer.restart)
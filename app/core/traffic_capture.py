@@ -0,0 +1,285 @@
+"""Запись выборки реальных запросов для воспроизведения (scripts/replay_traffic.py).
+
+Запись - строки JSON в сегментах capture-<время начала, мс>-<pid>.jsonl,
+первая строка сегмента - заголовок с временем начала записи процесса, у
+запросов время t в секундах от этого начала.
+
+Данные обезличиваются при записи:
+- пользователь (владелец токена, email в форме входа) заменяется
+  псевдонимом - ключевым хешем email, ключ свой у каждого запуска мастера;
+  id пользователей в пути - <id:псевдоним>, email в теле - <email:псевдоним>;
+- пароли - "***", остальной свободный текст - "x" той же длины;
+- заголовки, токены и cookie не записываются, только способ аутентификации;
+- тела, кроме JSON и форм, и тела больше max_body - только размер.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+import jwt
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "capture-"
+SEGMENT_SUFFIX = ".jsonl"
+SECRET_FIELDS = frozenset({"password"})
+IDENTITY_FIELDS = frozenset({"email", "username"})
+# Значения перечислений, без которых запрос не пройдёт валидацию
+KEEP_FIELDS = frozenset({"role", "grant_type", "scope", "token_type"})
+# Параметры пути с id пользователя
+USER_PARAMS = frozenset({"user_id", "owner_id"})
+
+
+class CapturedActor:
+    """Пользователь запроса. Заполняется при аутентификации внутри обработчика."""
+
+    __slots__ = ("user_id", "email")
+
+    def __init__(self):
+        self.user_id: int | None = None
+        self.email: str | None = None
+
+
+current_capture: ContextVar[CapturedActor | None] = ContextVar("current_capture", default=None)
+
+
+def capture_actor(user) -> None:
+    """Отмечает пользователя записываемого запроса; вне записи ничего не делает."""
+    actor = current_capture.get()
+    if actor is not None:
+        actor.user_id = user.id
+        actor.email = user.email
+
+
+class TrafficCapture:
+    """Фоновая запись обезличенных запросов в сегменты по segment_bytes.
+
+    Как и журнал аудита, обработчик только кладёт запись в ограниченную
+    очередь; при переполнении запись отбрасывается (dropped).
+    """
+
+    def __init__(self, directory: str, sample_rate: float, max_body: int, segment_bytes: int, queue_size: int):
+        self.directory = Path(directory)
+        self.sample_rate = sample_rate
+        self.max_body = max_body
+        self.segment_bytes = segment_bytes
+        self.queue_size = queue_size
+        # Ключ псевдонимов создаётся при импорте: воркеры, порождённые fork, делят его с мастером
+        self.key = secrets.token_bytes(16)
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.queue: asyncio.Queue | None = None
+        self.task: asyncio.Task | None = None
+        self.file = None
+        self.segment_size = 0
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None
+
+    def pseudonym(self, value: str) -> str:
+        return hashlib.blake2b(value.lower().encode(), key=self.key, digest_size=6).hexdigest()
+
+    def record(self, scope: dict, route: str, path_params: dict, started: float, status: int,
+               body: bytes | None, body_size: int, actor: CapturedActor) -> None:
+        try:
+            entry = self._entry(scope, route, path_params, started, status, body, body_size, actor)
+        except Exception:
+            # Запись вызывается после ответа и разбирает данные клиента: ошибка разбора только теряет запись
+            logger.exception("Не удалось обезличить запрос %s", route)
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self.captured += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.active,
+            "sample_rate": self.sample_rate,
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+            "segment": self.file.name if self.file is not None else None,
+        }
+
+    def _entry(self, scope: dict, route: str, path_params: dict, started: float, status: int,
+               body: bytes | None, body_size: int, actor: CapturedActor) -> dict:
+        headers = dict(scope["headers"])
+        auth, email = _token_owner(headers)
+        email = actor.email or email
+        entry = {
+            "t": round(started - self.started, 4),
+            "method": scope["method"],
+            "route": route,
+            "path": self._path(route, path_params, actor),
+            "status": status,
+            "ms": round((time.monotonic() - started) * 1000, 2),
+        }
+        if email:
+            entry["user"] = self.pseudonym(email)
+        if auth:
+            entry["auth"] = auth
+        if scope["query_string"]:
+            entry["query"] = self._pairs(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+        content_type = headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+        if body_size:
+            entry["type"] = content_type
+            entry["size"] = body_size
+        if body is not None:
+            if content_type == "application/json":
+                try:
+                    entry["json"] = self._anonymize(json.loads(body))
+                except ValueError:
+                    pass
+            elif content_type == "application/x-www-form-urlencoded":
+                entry["form"] = self._pairs(parse_qsl(body.decode(errors="replace"), keep_blank_values=True))
+        return entry
+
+    def _path(self, route: str, path_params: dict, actor: CapturedActor) -> str:
+        path = route.split(" ", 1)[1]
+        for name, value in path_params.items():
+            if name in USER_PARAMS:
+                # Свой id пользователя связывается с его псевдонимом, чужие - с псевдонимом id
+                own = actor.user_id is not None and str(value) == str(actor.user_id)
+                value = f"<id:{self.pseudonym(actor.email) if own else self.pseudonym(f'id:{value}')}>"
+            path = path.replace(f"{{{name}}}", str(value))
+        return path
+
+    def _pairs(self, pairs: list[tuple[str, str]]) -> list[list[str]]:
+        return [[key, self._value(key, value)] for key, value in pairs]
+
+    def _anonymize(self, value, key: str | None = None):
+        if isinstance(value, dict):
+            return {name: self._anonymize(item, name) for name, item in value.items()}
+        if isinstance(value, list):
+            return [self._anonymize(item, key) for item in value]
+        if isinstance(value, str):
+            return self._value(key, value)
+        return value
+
+    def _value(self, key: str | None, value: str) -> str:
+        if key in SECRET_FIELDS:
+            return "***"
+        if key in IDENTITY_FIELDS and "@" in value:
+            return f"<email:{self.pseudonym(value)}>"
+        if key in KEEP_FIELDS or value.isdigit() or value in ("true", "false"):
+            return value
+        return "x" * len(value)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            batch, stopping = ([], True) if first is None else ([first], False)
+            while not stopping and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if not batch:
+                continue
+            try:
+                await asyncio.to_thread(self._write, batch)
+                self.written += len(batch)
+            except OSError:
+                logger.exception("Не удалось записать %d запросов", len(batch))
+
+    def _write(self, batch: list[dict]) -> None:
+        data = "".join(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n" for entry in batch)
+        if self.file is None or self.segment_size >= self.segment_bytes:
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.segment_size += len(data)
+
+    def _rotate(self) -> None:
+        if self.file is not None:
+            self.file.close()
+        now = time.time()
+        path = self.directory / f"{SEGMENT_PREFIX}{int(now * 1000):013d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self.file = open(path, "w", encoding="utf-8", buffering=1024 * 1024)
+        header = json.dumps({"capture": 1, "started_at": self.started_at, "pid": os.getpid()}) + "\n"
+        self.file.write(header)
+        self.segment_size = len(header)
+
+
+def _token_owner(headers: dict[bytes, bytes]) -> tuple[str | None, str | None]:
+    """Способ аутентификации и email из токена. Подпись проверяет обработчик, здесь нужен только sub."""
+    authorization = headers.get(b"authorization", b"")
+    if authorization[:7].lower() == b"bearer ":
+        auth, token = "bearer", authorization[7:].decode("latin-1")
+    else:
+        cookies = headers.get(b"cookie", b"").decode("latin-1")
+        token = next((item.split("=", 1)[1] for item in cookies.split("; ") if item.startswith("access_token=")),
+                     None)
+        if token is None:
+            return None, None
+        auth = "cookie"
+    try:
+        return auth, jwt.decode(token, options={"verify_signature": False}).get("sub")
+    except jwt.InvalidTokenError:
+        return auth, None
+
+
+def read(paths: list[Path]) -> list[dict]:
+    """Запросы из сегментов всех процессов по возрастанию времени; t - от первого запроса."""
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            for line in file:
+                entry = json.loads(line)
+                entry["at"] = header["started_at"] + entry["t"]
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["at"])
+    first = entries[0]["at"] if entries else 0.0
+    for entry in entries:
+        entry["t"] = entry.pop("at") - first
+    return entries
+
+
+def segments(directory: str | Path) -> list[Path]:
+    return sorted(Path(directory).glob(f"{SEGMENT_PREFIX}*{SEGMENT_SUFFIX}"))
+
+
+traffic_capture = TrafficCapture(
+    directory=settings.capture_dir,
+    sample_rate=settings.capture_sample_rate,
+    max_body=settings.capture_max_body,
+    segment_bytes=settings.capture_segment_bytes,
+    queue_size=settings.capture_queue_size,
+)
@@ -0,0 +1,62 @@
+import random
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.traffic_capture import CapturedActor, TrafficCapture, current_capture
+
+
+class TrafficCaptureMiddleware:
+    """Записывает выборку запросов в TrafficCapture.
+
+    Невыбранный запрос стоит одного вызова random(). У выбранного тело
+    запроса копируется по мере чтения обработчиком (до max_body байт),
+    маршрут и параметры пути берутся из scope после обработки, а
+    обезличенная запись уходит в очередь фоновой записи.
+    """
+
+    def __init__(self, app: ASGIApp, capture: TrafficCapture, exempt_paths: list[str]):
+        self.app = app
+        self.capture = capture
+        self.exempt_paths = tuple(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or not self.capture.active or scope["path"].startswith(self.exempt_paths)
+                or random.random() >= self.capture.sample_rate):
+            return await self.app(scope, receive, send)
+
+        started = time.monotonic()
+        chunks: list[bytes] | None = []
+        body_size = 0
+        status = 500
+
+        async def capture_receive() -> Message:
+            nonlocal chunks, body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                body_size += len(body)
+                if body_size > self.capture.max_body:
+                    chunks = None
+                elif chunks is not None:
+                    chunks.append(body)
+            return message
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # Обработчик может выполняться в дочерней задаче (DeadlineMiddleware): пользователя
+        # он записывает в общий изменяемый объект, а не в контекстную переменную
+        actor = CapturedActor()
+        token = current_capture.set(actor)
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            current_capture.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                self.capture.record(scope, f"{scope['method']} {route}", scope.get("path_params", {}), started,
+                                    status, b"".join(chunks) if chunks is not None else None, body_size, actor)
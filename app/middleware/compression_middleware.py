@@ -0,0 +1,125 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.http_encoding import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаём gzip
+    brotli = None
+
+# Типы, которые уже сжаты или не должны буферизоваться сжатием
+SKIP_CONTENT_TYPES = (
+    "image/", "video/", "audio/", "font/woff", "application/zip", "application/gzip",
+    "application/x-gzip", "application/x-brotli", "application/octet-stream", "application/pdf",
+    "text/event-stream",
+)
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы gzip или brotli.
+
+    Ответ короче minimum_size отдаётся как есть. Если тело приходит частями
+    (StreamingResponse), каждая часть сжимается и сбрасывается сразу, чтобы
+    клиент получал данные без ожидания конца ответа.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.available = ("br", "gzip") if brotli is not None else ("gzip",)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.available)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start: Message | None = None
+        self.compressor: _Compressor | None = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            # Файлы с поддержкой Range (вложения, статика) отдаются байт в байт:
+            # диапазоны считаются по несжатому содержимому
+            self.passthrough = ("content-encoding" in headers or "accept-ranges" in headers
+                                or content_type.startswith(SKIP_CONTENT_TYPES))
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            if "etag" in headers:
+                headers["ETag"] = _weak_etag(headers["etag"])
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level,
+                                          self.middleware.brotli_quality)
+            if not more_body:
+                compressed = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self.send(start)
+
+        if more_body:
+            await self.send({"type": "http.response.body", "body": self.compressor.compress(body), "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.compressor.finish(body)})
+
+
+def _weak_etag(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
@@ -0,0 +1,71 @@
+import time
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.concurrency import ConcurrencyLimits, Overloaded
+
+
+class ConcurrencyLimitMiddleware:
+    """Ограничивает число одновременных запросов к каждому маршруту.
+
+    Маршрут определяется по шаблону пути (GET /post/{post_id}), поэтому все
+    запросы к нему делят один адаптивный лимит. Не поместившиеся в лимит и
+    очередь запросы сразу получают 503 с Retry-After и не занимают соединение
+    пула БД. Пути из exempt_paths и маршруты из exempt_routes ("METHOD /шаблон",
+    долгие загрузки и скачивания) не ограничиваются.
+
+    Задержка для адаптивного лимита измеряется до последнего куска тела:
+    потоковые страницы (/my_posts) читают посты из БД уже после начала ответа.
+    Долгие передачи файлов, где время зависит от клиента, исключены через exempt_routes.
+    """
+
+    def __init__(self, app: ASGIApp, limits: ConcurrencyLimits, routes: list, exempt_paths: list[str],
+                 exempt_routes: list[str] = (), retry_after: int = 1):
+        self.app = app
+        self.limits = limits
+        self.routes = routes
+        self.exempt_paths = tuple(exempt_paths)
+        self.exempt_routes = frozenset(exempt_routes)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            return await self.app(scope, receive, send)
+        route = self._route(scope)
+        if route is None or route in self.exempt_routes:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limits.limiter(route)
+        try:
+            await limiter.acquire()
+        except Overloaded:
+            response = JSONResponse(status_code=503,
+                                    content={"detail": "Сервер перегружен, повторите запрос позже"},
+                                    headers={"Retry-After": str(self.retry_after)})
+            return await response(scope, receive, send)
+
+        started = time.perf_counter()
+        response_sent = None
+        latency = None
+
+        async def send_timed(message) -> None:
+            nonlocal response_sent
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_sent = time.perf_counter() - started
+
+        try:
+            await self.app(scope, receive, send_timed)
+            latency = response_sent
+        finally:
+            # Прерванные запросы не учитываются в задержке
+            limiter.release(latency)
+
+    def _route(self, scope: Scope) -> str | None:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return f"{scope['method']} {route.path}"
+        return None
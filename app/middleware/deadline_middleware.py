@@ -0,0 +1,91 @@
+import asyncio
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.deadlines import Deadline, Deadlines, current_deadline, stage_of
+
+
+class DeadlineMiddleware:
+    """Отменяет обработку запроса по истечении срока или при отключении клиента.
+
+    Обработчик выполняется отдельной задачей, а сообщения клиента читает
+    эта middleware: так отключение клиента видно сразу, а не только когда
+    обработчик сам обратится к receive. Отмена задачи прерывает и
+    выполняющийся запрос к БД. Если срок истёк до начала ответа, клиент
+    получает 504; этап, на котором стоял обработчик, попадает в статистику.
+    """
+
+    def __init__(self, app: ASGIApp, deadlines: Deadlines, routes: list, exempt_paths: list[str]):
+        self.app = app
+        self.deadlines = deadlines
+        self.routes = routes
+        self.exempt_paths = tuple(exempt_paths)
+        self.header = deadlines.header.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            return await self.app(scope, receive, send)
+        route = self._route(scope)
+        requested = next((value.decode() for name, value in scope["headers"] if name == self.header), None)
+        budget = self.deadlines.budget(route, requested) if route is not None else None
+        if budget is None:
+            return await self.app(scope, receive, send)
+
+        deadline = Deadline(budget)
+        token = current_deadline.set(deadline)
+        try:
+            await self._run(scope, receive, send, route, deadline)
+        finally:
+            current_deadline.reset(token)
+
+    async def _run(self, scope: Scope, receive: Receive, send: Send, route: str, deadline: Deadline) -> None:
+        inbox: asyncio.Queue[Message] = asyncio.Queue(maxsize=1)
+        response = {"started": False, "complete": False, "closed": False}
+
+        async def watch_client() -> None:
+            # Очередь на одно сообщение: тело запроса читается не быстрее, чем его разбирает обработчик
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                await inbox.put(message)
+
+        async def handler_send(message: Message) -> None:
+            if response["closed"]:
+                return
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, inbox.get, handler_send))
+        watcher = asyncio.ensure_future(watch_client())
+        try:
+            done, _ = await asyncio.wait((handler, watcher), timeout=max(deadline.remaining(), 0),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if handler in done or (watcher in done and response["complete"]):
+                # Ответ уже отправлен: фоновые задачи ответа дорабатывают без срока
+                return await handler
+            reason = "disconnect" if watcher in done else "timeout"
+            stage = stage_of(handler)
+            handler.cancel()
+            response["closed"] = True
+            self.deadlines.record(route, reason, stage, deadline)
+            if reason == "timeout" and not response["started"]:
+                await JSONResponse(status_code=504, content={"detail": "Превышено время обработки запроса",
+                                                             "stage": stage})(scope, receive, send)
+            # Отменённый обработчик возвращает соединение БД в пул уже после ответа клиенту
+            await asyncio.wait((handler,))
+        finally:
+            watcher.cancel()
+            handler.cancel()
+
+    def _route(self, scope: Scope) -> str | None:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return f"{scope['method']} {route.path}"
+        return None
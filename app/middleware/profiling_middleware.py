@@ -0,0 +1,80 @@
+import logging
+import random
+from pathlib import Path
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.auth.service.jwt_service import decode_access_token
+from app.core.db_helper import db_helper
+from app.core.profiler import RequestProfile, current_profile, save_profile
+from app.models.user import RoleEnum
+from app.repositories import user_repository
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по заголовку администратора или по доле выборки.
+
+    Для остальных запросов middleware сводится к поиску заголовка и одному
+    вызову random(), профилировщик не запускается.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float, header: str, interval_ms: float, directory: str | Path):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode()
+        self.interval = interval_ms / 1000
+        self.directory = Path(directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requested = any(name == self.header for name, _ in scope["headers"])
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not requested and not sampled:
+            return await self.app(scope, receive, send)
+
+        principal = _principal(scope)
+        if requested and not sampled and not await _is_admin(principal):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(self.interval)
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.stop()
+            current_profile.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            path = save_profile(profile, self.directory, f"{scope['method']} {route}", principal)
+            logger.info("Профиль запроса %s %s сохранён в %s", scope["method"], route, path)
+
+
+def _principal(scope: Scope) -> str | None:
+    headers = dict(scope["headers"])
+    token = None
+    authorization = headers.get(b"authorization", b"").decode()
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    else:
+        for part in headers.get(b"cookie", b"").decode().split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "access_token":
+                token = value
+    if not token:
+        return None
+    try:
+        return decode_access_token(token).get("sub")
+    except Exception:
+        return None
+
+
+async def _is_admin(email: str | None) -> bool:
+    if not email:
+        return False
+    async with db_helper.session_factory() as session:
+        user = await user_repository.get_user_by_email(session, email)
+    return user is not None and user.is_active and user.role == RoleEnum.admin
@@ -0,0 +1,47 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.tracing import Tracer
+
+
+class TracingMiddleware:
+    """Начинает трассу выбранного запроса и делает корневой спан текущим.
+
+    Невыбранный запрос проходит дальше без обёрток: стоимость - поиск
+    заголовка traceparent и один вызов random(). Выбранный запрос получает
+    в ответе заголовок X-Trace-Id, по которому трассу можно найти в
+    GET /admin/traces.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        traceparent = next((value for name, value in scope["headers"] if name == b"traceparent"), None)
+        root = self.tracer.start(scope["method"], traceparent.decode("latin-1") if traceparent else None)
+        if root is None:
+            return await self.app(scope, receive, send)
+
+        trace_id = root.trace.trace_id.encode()
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace_id)]
+            await send(message)
+
+        root.set("http.method", scope["method"])
+        root.set("url.path", scope["path"])
+        try:
+            with root:
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                root.name = f"{scope['method']} {route}"
+                root.set("http.route", route)
+            else:
+                root.name = f"{scope['method']} {scope['path']}"
+            self.tracer.finish(root.trace)
@@ -2,5 +2,11 @@ from app.models.base import Base
 from app.models.user import User
 from app.models.post import Post
 from app.models.access import EntryAccess
+from app.models.counter import Counter
+from app.models.shard import PostShardPlacement, PostIdAllocation
+from app.models.audit import AuditEntry
+from app.models.attachment import PostAttachment
+from app.models.archive import ArchivedUser, ArchivedPost
 
-__all__ = ['Base', 'User', 'Post', 'EntryAccess']
+__all__ = ['Base', 'User', 'Post', 'EntryAccess', 'Counter', 'PostShardPlacement', 'PostIdAllocation',
+           'AuditEntry', 'PostAttachment', 'ArchivedUser', 'ArchivedPost']
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, Enum, Boolean, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+from app.models.user import RoleEnum
+
+
+class ArchivedUser(Base):
+    """Пользователь, перенесённый из users в архив (python -m scripts.archive_users).
+
+    Колонки повторяют users, чтобы строка переносилась обратно без изменений."""
+    __tablename__ = "users_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    username: Mapped[str] = mapped_column(String(60), nullable=False)
+    email: Mapped[str] = mapped_column(String(60), unique=True, nullable=False)
+    password: Mapped[str] = mapped_column(String(100), nullable=False)
+    role: Mapped[RoleEnum] = mapped_column(Enum(RoleEnum), nullable=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    access_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    deactivated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+
+
+class ArchivedPost(Base):
+    """Пост архивного пользователя. Лежит в основной БД, даже если посты шардированы."""
+    __tablename__ = "posts_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    tittle: Mapped[str] = mapped_column(String(70), nullable=False)
+    description: Mapped[str] = mapped_column(String(250))
+    # Без внешних ключей: владелец лежит в users_archive
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    required_access_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, BigInteger, String, DateTime, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+
+class PostAttachment(Base):
+    """Вложение поста. Содержимое лежит в хранилище вложений под своим sha256,
+    одинаковые файлы разных вложений хранятся один раз."""
+    __tablename__ = "post_attachments"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Без внешнего ключа: посты могут лежать на шардах (POST_SHARDS)
+    post_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    content_type: Mapped[str] = mapped_column(String(100), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=func.now())
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import Integer, String, DateTime, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+
+class AuditEntry(Base):
+    """Запись журнала аудита, загруженная из сегментов (AUDIT_DB_ENABLED)."""
+    __tablename__ = "audit_entries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    # Без внешнего ключа: записи переживают удаление пользователя
+    actor_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    action: Mapped[str] = mapped_column(String(30), nullable=False)
+    entity: Mapped[str] = mapped_column(String(30), nullable=False)
+    entity_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    changes: Mapped[dict | None] = mapped_column(JSON, nullable=True)
@@ -0,0 +1,23 @@
+import enum
+from sqlalchemy import Integer, String, Enum, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+
+class CounterScopeEnum(str, enum.Enum):
+    owner_posts = "owner_posts"
+    access_posts = "access_posts"
+    role_active_users = "role_active_users"
+    # Растёт при каждом изменении постов: по нему процессы сбрасывают кольца ленты
+    feed_version = "feed_version"
+
+
+class Counter(Base):
+    __tablename__ = "counters"
+    __table_args__ = (UniqueConstraint("scope", "key", name="uq_counters_scope_key"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    scope: Mapped[CounterScopeEnum] = mapped_column(Enum(CounterScopeEnum), nullable=False)
+    key: Mapped[str] = mapped_column(String(60), nullable=False)
+    value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
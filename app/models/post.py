@@ -21,3 +21,6 @@ class Post(Base):
 
     owners: Mapped[List["User"]] = relationship("User", back_populates="posts")
     required_access: Mapped["EntryAccess"] = relationship("EntryAccess", back_populates="posts")
+
+    # Не колонка: True у объекта, прочитанного из posts_archive (app.repositories.archive_repository)
+    archived = False
@@ -0,0 +1,21 @@
+from sqlalchemy import Integer, String, Boolean
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models import Base
+
+
+class PostShardPlacement(Base):
+    """Владельцы, чьи посты лежат не на шарде, вычисленном по кольцу хешей."""
+    __tablename__ = "post_shard_placements"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    owner_id: Mapped[int] = mapped_column(Integer, unique=True, nullable=False)
+    shard: Mapped[str] = mapped_column(String(60), nullable=False)
+    moving: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+
+class PostIdAllocation(Base):
+    """Выдаёт глобально уникальные id постов, когда посты разнесены по шардам."""
+    __tablename__ = "post_id_allocations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
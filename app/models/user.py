@@ -1,6 +1,7 @@
 import enum
+from datetime import datetime
 from typing import List, TYPE_CHECKING
-from sqlalchemy import Integer, String, Enum, Boolean, ForeignKey
+from sqlalchemy import Integer, String, Enum, Boolean, ForeignKey, DateTime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models import Base
@@ -26,8 +27,13 @@ class User(Base):
     password: Mapped[str] = mapped_column(String(100), nullable=False)
     role: Mapped[RoleEnum] = mapped_column(Enum(RoleEnum), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    # Когда пользователь выключен (is_active=False); по нему пользователь переносится в архив
+    deactivated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
 
     access_id: Mapped[int] = mapped_column(ForeignKey('entry_accesses.id'))
 
     access: Mapped["EntryAccess"] = relationship("EntryAccess", back_populates="users")
     posts: Mapped[List["Post"]] = relationship("Post", back_populates="owners")
+
+    # Не колонка: True у объекта, прочитанного из users_archive (app.repositories.archive_repository)
+    archived = False
@@ -0,0 +1,256 @@
+"""Архив неактивных пользователей: перенос, чтение при промахе и восстановление.
+
+Пользователь, выключенный дольше ARCHIVE_AFTER_DAYS дней, переносится из
+users в users_archive, его посты - из posts (основной БД или шардов) в
+posts_archive основной БД. Перенос идёт короткими транзакциями по
+ARCHIVE_BATCH_SIZE строк: строки сначала копируются (уже скопированные
+пропускаются), затем удаляются из горячей таблицы, поэтому прерванный
+перенос можно просто запустить заново. Счётчики постов меняются вместе с
+удалением, как при переносе постов между шардами, и вместе с ними растёт
+версия ленты: кольца ленты работающего приложения перезагружаются в
+течение FEED_VERSION_TTL, даже когда перенос выполняет отдельный процесс.
+
+Чтения по id и email, не нашедшие строку в горячих таблицах, ищут её в
+архиве и получают объект User/Post с archived=True. Перед изменением такого
+объекта ensure_hot возвращает пользователя со всеми постами обратно:
+повторное включение (PATCH is_active=true) восстанавливает пользователя.
+"""
+import asyncio
+import logging
+from collections import Counter as Tally
+from contextlib import nullcontext
+from datetime import datetime
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.core.single_flight import single_flight
+from app.core.tracing import traced
+from app.models import ArchivedPost, ArchivedUser, Post, User
+from app.models.counter import CounterScopeEnum
+from app.repositories import counter_repository
+from app.repositories.queries import ARCHIVED_AUTHORS_BY_IDS, ARCHIVED_POST_BY_ID, ARCHIVED_POSTS_BY_OWNER
+from app.repositories.read_models import PostRow
+
+logger = logging.getLogger(__name__)
+
+USER_COLUMNS = ("id", "username", "email", "password", "role", "is_active", "access_id", "deactivated_at")
+POST_COLUMNS = ("id", "tittle", "description", "owner_id", "required_access_id")
+
+
+def _detached(model, row, columns: tuple[str, ...]):
+    """Объект горячей модели из строки архива, как будто загруженный и отсоединённый от сессии."""
+    instance = model(**{name: getattr(row, name) for name in columns})
+    make_transient_to_detached(instance)
+    instance.archived = True
+    return instance
+
+
+@traced
+async def find_user(session: AsyncSession, statement, params: dict) -> User | None:
+    if not settings.archive_fallback_enabled:
+        return None
+    row = (await session.execute(statement, params)).scalars().first()
+    return _detached(User, row, USER_COLUMNS) if row is not None else None
+
+
+@traced
+async def find_post(post_id: int, required_access: int) -> Post | None:
+    if not settings.archive_fallback_enabled:
+        return None
+    async with db_helper.session_factory() as session:
+        row = (await session.execute(
+            ARCHIVED_POST_BY_ID, {"post_id": post_id, "required_access": required_access})).scalars().first()
+    return _detached(Post, row, POST_COLUMNS) if row is not None else None
+
+
+@traced
+async def posts_of(session: AsyncSession, owner_id: int, required_access: int) -> list[PostRow]:
+    if not settings.archive_fallback_enabled:
+        return []
+    result = await session.execute(ARCHIVED_POSTS_BY_OWNER, {"owner_id": owner_id, "required_access": required_access})
+    return [PostRow(*row) for row in result]
+
+
+@traced
+async def authors(session: AsyncSession, user_ids) -> list:
+    if not settings.archive_fallback_enabled:
+        return []
+    return (await session.execute(ARCHIVED_AUTHORS_BY_IDS, {"user_ids": list(user_ids)})).all()
+
+
+@traced
+async def email_archived(session: AsyncSession, email: str) -> bool:
+    """Занят ли email архивным пользователем: в users его уже нет, но восстановление вернёт его."""
+    return (await session.execute(select(ArchivedUser.id).where(ArchivedUser.email == email))).first() is not None
+
+
+async def ensure_hot(model) -> None:
+    """Возвращает архивного пользователя (или владельца архивного поста) в горячие таблицы перед изменением."""
+    if not getattr(model, "archived", False):
+        return
+    await restore_user(model.owner_id if isinstance(model, Post) else model.id)
+    model.archived = False
+
+
+async def _insert_missing(session: AsyncSession, model, rows: list[dict]) -> list[dict]:
+    ids = [row["id"] for row in rows]
+    existing = set((await session.execute(select(model.id).where(model.id.in_(ids)))).scalars())
+    missing = [row for row in rows if row["id"] not in existing]
+    if missing:
+        await session.execute(insert(model), missing)
+    return missing
+
+
+async def _bump_posts(session: AsyncSession, rows: list[dict], sign: int) -> None:
+    # feed_version: кольца ленты запущенного приложения заметят перенос, даже если он идёт из scripts.archive_users
+    await counter_repository.bump_feed(session)
+    owners = Tally(row["owner_id"] for row in rows)
+    levels = Tally(row["required_access_id"] for row in rows)
+    for owner_id, count in owners.items():
+        await counter_repository.bump(session, CounterScopeEnum.owner_posts, owner_id, sign * count)
+    for level, count in levels.items():
+        await counter_repository.bump(session, CounterScopeEnum.access_posts, level, sign * count)
+
+
+def _columns(model, columns: tuple[str, ...]):
+    return [model.__table__.c[name] for name in columns]
+
+
+def _post_session_factories() -> list:
+    if shard_router is None:
+        return [db_helper.session_factory]
+    return [shard.session_factory for shard in shard_router.shards.values()]
+
+
+async def copy_users(cutoff: datetime, batch_size: int, pause: float) -> int:
+    """Копирует в users_archive пользователей, выключенных до cutoff. Из users они удаляются после постов."""
+    copied, last_id = 0, 0
+    async with db_helper.session_factory() as session:
+        while True:
+            rows = (await session.execute(
+                select(*_columns(User, USER_COLUMNS))
+                .where(User.is_active.is_(False), User.deactivated_at < cutoff, User.id > last_id)
+                .order_by(User.id).limit(batch_size))).mappings().all()
+            if not rows:
+                return copied
+            copied += len(await _insert_missing(session, ArchivedUser, [dict(row) for row in rows]))
+            await session.commit()
+            last_id = rows[-1]["id"]
+            await asyncio.sleep(pause)
+
+
+async def pending_users() -> set[int]:
+    """Пользователи, скопированные в архив, но ещё не удалённые из users."""
+    async with db_helper.session_factory() as session:
+        return set((await session.execute(select(User.id).join(ArchivedUser, ArchivedUser.id == User.id))).scalars())
+
+
+async def archive_posts(owner_ids: set[int], batch_size: int, pause: float) -> int:
+    """Переносит посты владельцев owner_ids в posts_archive.
+
+    Таблица постов просматривается по возрастанию id окнами по batch_size
+    строк (поиск по первичному ключу, без индекса по владельцу); найденные
+    посты переносятся, как только их наберётся batch_size.
+    """
+    moved = 0
+    for session_factory in _post_session_factories():
+        async with session_factory() as source, db_helper.session_factory() as archive:
+            target = source if shard_router is None else archive
+            last_id, found = 0, []
+            while True:
+                window = (await source.execute(
+                    select(Post.id, Post.owner_id).where(Post.id > last_id).order_by(Post.id).limit(batch_size))).all()
+                found += [row.id for row in window if row.owner_id in owner_ids]
+                if found and (len(found) >= batch_size or not window):
+                    moved += await _archive_post_batch(source, target, found)
+                    found = []
+                    await asyncio.sleep(pause)
+                if not window:
+                    break
+                last_id = window[-1].id
+    return moved
+
+
+async def _archive_post_batch(source: AsyncSession, target: AsyncSession, ids: list[int]) -> int:
+    rows = [dict(row) for row in (await source.execute(
+        select(*_columns(Post, POST_COLUMNS)).where(Post.id.in_(ids)))).mappings()]
+    await _insert_missing(target, ArchivedPost, rows)
+    if target is not source:
+        await target.commit()
+    await source.execute(delete(Post).where(Post.id.in_([row["id"] for row in rows])))
+    await _bump_posts(source, rows, -1)
+    await source.commit()
+    return len(rows)
+
+
+async def remove_users(user_ids: set[int], batch_size: int, pause: float) -> tuple[int, int]:
+    """Удаляет из users перенесённых пользователей. Включённых за время переноса восстанавливает.
+
+    Возвращает (удалено, восстановлено)."""
+    removed, restored = 0, 0
+    ordered = sorted(user_ids)
+    for start in range(0, len(ordered), batch_size):
+        chunk = ordered[start:start + batch_size]
+        async with db_helper.session_factory() as session:
+            active = set((await session.execute(
+                select(User.id).where(User.id.in_(chunk), User.is_active.is_(True)))).scalars())
+            try:
+                result = await session.execute(
+                    delete(User).where(User.id.in_([user_id for user_id in chunk if user_id not in active])))
+                await session.commit()
+                removed += result.rowcount
+            except IntegrityError:
+                # Посты, созданные после просмотра таблицы постов: пачка переносится следующим запуском
+                await session.rollback()
+                logger.warning("Пропущена пачка пользователей %d-%d: у них появились новые посты", chunk[0], chunk[-1])
+        for user_id in active:
+            await restore_user(user_id, reset_clock=False)
+            restored += 1
+        await asyncio.sleep(pause)
+    return removed, restored
+
+
+async def restore_user(user_id: int, batch_size: int | None = None, reset_clock: bool = True) -> int:
+    """Возвращает пользователя и его посты из архива. Возвращает число восстановленных постов.
+
+    Пользователь возвращается первым (на него ссылаются посты), строка архива
+    удаляется последней: прерванное восстановление можно повторить. Если
+    пользователь всё ещё выключен, срок до архива (deactivated_at) отсчитывается заново.
+    """
+    batch_size = batch_size or settings.archive_batch_size
+    async with db_helper.session_factory() as session:
+        row = (await session.execute(
+            select(*_columns(ArchivedUser, USER_COLUMNS)).where(ArchivedUser.id == user_id))).mappings().first()
+        if row is not None:
+            user = dict(row)
+            if reset_clock and not user["is_active"]:
+                user["deactivated_at"] = datetime.utcnow()
+            await _insert_missing(session, User, [user])
+            await session.commit()
+
+    restored = 0
+    async with db_helper.session_factory() as archive:
+        async with (shard_router.session(user_id, write=True) if shard_router is not None
+                    else nullcontext(archive)) as target:
+            while True:
+                rows = [dict(row) for row in (await archive.execute(
+                    select(*_columns(ArchivedPost, POST_COLUMNS)).where(ArchivedPost.owner_id == user_id)
+                    .order_by(ArchivedPost.id).limit(batch_size))).mappings()]
+                if not rows:
+                    break
+                await _bump_posts(target, await _insert_missing(target, Post, rows), 1)
+                if target is not archive:
+                    await target.commit()
+                await archive.execute(delete(ArchivedPost).where(ArchivedPost.id.in_([row["id"] for row in rows])))
+                await archive.commit()
+                restored += len(rows)
+        await archive.execute(delete(ArchivedUser).where(ArchivedUser.id == user_id))
+        await archive.commit()
+    single_flight.invalidate("user", "post", "feed")
+    return restored
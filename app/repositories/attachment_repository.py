@@ -0,0 +1,101 @@
+from typing import AsyncIterable
+
+from fastapi import HTTPException
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.core.attachments import attachment_storage, AttachmentTooLarge
+from app.core.audit import audit_log
+from app.core.tracing import traced
+from app.models import PostAttachment
+from app.repositories.memory_backend import memory_backend
+
+
+@traced
+async def get_attachments(session: AsyncSession, post_id: int) -> list[PostAttachment]:
+    try:
+        if memory_backend is not None:
+            return memory_backend.post_attachments(post_id)
+        result = await session.execute(
+            select(PostAttachment).where(PostAttachment.post_id == post_id).order_by(PostAttachment.id))
+        return list(result.scalars().all())
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def get_attachment(session: AsyncSession, post_id: int, attachment_id: int) -> PostAttachment | None:
+    try:
+        if memory_backend is not None:
+            return memory_backend.attachment(post_id, attachment_id)
+        result = await session.execute(select(PostAttachment).where(
+            PostAttachment.id == attachment_id, PostAttachment.post_id == post_id))
+        return result.scalars().first()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def create_attachment(session: AsyncSession, post_id: int, filename: str, content_type: str,
+                            chunks: AsyncIterable[bytes]) -> PostAttachment:
+    """Записывает поток в хранилище вложений и добавляет запись вложения к посту."""
+    try:
+        sha256, size, temporary = await attachment_storage.save(chunks)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Размер вложения превышает {e.args[0]} байт")
+    try:
+        if memory_backend is not None:
+            attachment = memory_backend.add_attachment(post_id, filename, content_type, size, sha256)
+        else:
+            attachment = PostAttachment(post_id=post_id, filename=filename, content_type=content_type,
+                                        size=size, sha256=sha256)
+            session.add(attachment)
+            await session.commit()
+            await session.refresh(attachment)
+        attachment_storage.confirm(sha256, temporary)
+        await audit_log.record("create", "attachment", attachment.id,
+                               {"post_id": post_id, "filename": filename, "size": size, "sha256": sha256})
+        return attachment
+    except Exception as e:
+        if memory_backend is None:
+            await session.rollback()
+        attachment_storage.discard(temporary)
+        await _release(session, sha256)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def delete_attachment(session: AsyncSession, attachment: PostAttachment) -> None:
+    try:
+        if memory_backend is not None:
+            memory_backend.delete_attachment(attachment)
+        else:
+            await session.delete(attachment)
+            await session.commit()
+        await _release(session, attachment.sha256)
+        await audit_log.record("delete", "attachment", attachment.id)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def delete_post_attachments(session: AsyncSession, post_id: int) -> None:
+    """Удаляет вложения удалённого поста вместе с файлами, на которые больше никто не ссылается."""
+    for attachment in await get_attachments(session, post_id):
+        await delete_attachment(session, attachment)
+
+
+@traced
+async def _release(session: AsyncSession, sha256: str) -> None:
+    """Удаляет файл из хранилища, если на это содержимое не ссылается ни одно вложение."""
+    async def referenced() -> bool:
+        if memory_backend is not None:
+            return memory_backend.sha256_referenced(sha256)
+        found = await session.scalar(select(exists().where(PostAttachment.sha256 == sha256)))
+        # Каждая проверка в своей транзакции: в снимке SQLite не видны записи, закоммиченные после её начала
+        await session.commit()
+        return found
+
+    await attachment_storage.release(sha256, referenced)
@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.core.db_helper import db_helper
+from app.models import AuditEntry
+
+
+async def load_batch(batch: list[tuple]) -> None:
+    """Массовая загрузка пачки записей аудита одним INSERT с набором параметров."""
+    rows = [{
+        "ts": datetime.fromtimestamp(ts),
+        "actor_id": actor_id,
+        "action": action,
+        "entity": entity,
+        "entity_id": entity_id,
+        "changes": changes,
+    } for ts, actor_id, action, entity, entity_id, changes in batch]
+    async with db_helper.session_factory() as session:
+        await session.execute(insert(AuditEntry), rows)
+        await session.commit()
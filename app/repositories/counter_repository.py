@@ -0,0 +1,150 @@
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.core.sharding import shard_router, owner_session
+from app.core.tracing import traced
+from app.models import Post, User
+from app.models.counter import CounterScopeEnum
+from app.repositories.memory_backend import memory_backend
+from app.repositories.queries import COUNTER_VALUE, COUNTER_SCOPE, COUNTER_UPSERT
+
+POST_SCOPES = (CounterScopeEnum.owner_posts, CounterScopeEnum.access_posts, CounterScopeEnum.feed_version)
+FEED_VERSION_KEY = "posts"
+
+
+@traced
+async def bump(session: AsyncSession, scope: CounterScopeEnum, key, delta: int) -> None:
+    """Изменяет счётчик в текущей транзакции. Коммит выполняет вызывающий код."""
+    if not delta:
+        return
+    await session.execute(COUNTER_UPSERT[session.bind.dialect.name],
+                          {"counter_scope": scope, "counter_key": str(key), "delta": delta})
+
+
+@traced
+async def bump_post(session: AsyncSession, owner_id: int, required_access_id: int, delta: int) -> None:
+    await bump(session, CounterScopeEnum.owner_posts, owner_id, delta)
+    await bump(session, CounterScopeEnum.access_posts, required_access_id, delta)
+
+
+@traced
+async def bump_feed(session: AsyncSession) -> None:
+    """Отмечает изменение постов для колец ленты всех процессов (FeedCache.check_version)."""
+    await bump(session, CounterScopeEnum.feed_version, FEED_VERSION_KEY, 1)
+
+
+@traced
+async def feed_version(session: AsyncSession) -> int:
+    """Сумма версий ленты по основной БД или по всем шардам: растёт при любой записи постов."""
+    return sum((await get_scope(session, CounterScopeEnum.feed_version)).values())
+
+
+@traced
+async def bump_role(session: AsyncSession, role, is_active: bool, delta: int) -> None:
+    if is_active:
+        await bump(session, CounterScopeEnum.role_active_users, role_key(role), delta)
+
+
+@traced
+async def bump_user(session: AsyncSession, user: User, delta: int) -> None:
+    await bump_role(session, user.role, user.is_active, delta)
+
+
+@traced
+async def get_counter(session: AsyncSession, scope: CounterScopeEnum, key) -> int:
+    try:
+        if memory_backend is not None:
+            return memory_backend.counter(scope, key)
+        if scope == CounterScopeEnum.owner_posts:
+            async with owner_session(session, int(key)) as posts_session:
+                return await _read_counter(posts_session, scope, key)
+        return await _read_counter(session, scope, key)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def get_scope(session: AsyncSession, scope: CounterScopeEnum) -> dict[str, int]:
+    try:
+        if memory_backend is not None:
+            return memory_backend.scope(scope)
+        if scope in POST_SCOPES and shard_router is not None:
+            # Счётчики постов лежат на шардах вместе с постами, суммируем по всем
+            total: dict[str, int] = {}
+            for part in await shard_router.scatter(lambda shard_session: _read_scope(shard_session, scope)):
+                for key, value in part.items():
+                    total[key] = total.get(key, 0) + value
+            return dict(sorted(total.items()))
+        return await _read_scope(session, scope)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@traced
+async def _read_counter(session: AsyncSession, scope: CounterScopeEnum, key) -> int:
+    result = await session.execute(COUNTER_VALUE, {"counter_scope": scope, "counter_key": str(key)})
+    return result.scalar() or 0
+
+
+@traced
+async def _read_scope(session: AsyncSession, scope: CounterScopeEnum) -> dict[str, int]:
+    result = await session.execute(COUNTER_SCOPE, {"counter_scope": scope})
+    return {key: value for key, value in result.all()}
+
+
+@traced
+async def count_posts(session: AsyncSession) -> dict[CounterScopeEnum, dict[str, int]]:
+    """Считает агрегаты постов напрямую по таблице. Используется только при сверке."""
+    owner_rows = await session.execute(select(Post.owner_id, func.count()).group_by(Post.owner_id))
+    access_rows = await session.execute(
+        select(Post.required_access_id, func.count()).group_by(Post.required_access_id))
+    return {
+        CounterScopeEnum.owner_posts: {str(key): value for key, value in owner_rows.all()},
+        CounterScopeEnum.access_posts: {str(key): value for key, value in access_rows.all()},
+    }
+
+
+@traced
+async def count_users(session: AsyncSession) -> dict[CounterScopeEnum, dict[str, int]]:
+    role_rows = await session.execute(select(User.role, func.count()).where(User.is_active).group_by(User.role))
+    return {CounterScopeEnum.role_active_users: {role_key(key): value for key, value in role_rows.all()}}
+
+
+@traced
+async def reconcile(session: AsyncSession, fix: bool = False) -> list[dict]:
+    """Сравнивает счётчики с фактическими данными и возвращает расхождения.
+
+    При fix=True расхождения исправляются в той же транзакции (на шардах -
+    в транзакции каждого шарда).
+    """
+    drift = await _reconcile(session, await count_users(session), fix)
+    if shard_router is None:
+        drift += await _reconcile(session, await count_posts(session), fix)
+    else:
+        for name, shard in shard_router.shards.items():
+            async with shard.session_factory() as shard_session:
+                for item in await _reconcile(shard_session, await count_posts(shard_session), fix):
+                    drift.append({**item, "shard": name})
+    return drift
+
+
+@traced
+async def _reconcile(session: AsyncSession, actual: dict[CounterScopeEnum, dict[str, int]], fix: bool) -> list[dict]:
+    drift = []
+    for scope, expected in actual.items():
+        stored = await _read_scope(session, scope)
+        for key in sorted(set(expected) | set(stored)):
+            real, cached = expected.get(key, 0), stored.get(key, 0)
+            if real != cached:
+                drift.append({"scope": scope.value, "key": key, "stored": cached, "actual": real})
+                if fix:
+                    await bump(session, scope, key, real - cached)
+    if fix and drift:
+        await session.commit()
+    return drift
+
+
+def role_key(role) -> str:
+    return role.name if hasattr(role, "name") else str(role)
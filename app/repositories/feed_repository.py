@@ -0,0 +1,191 @@
+import asyncio
+import time
+from bisect import bisect_left
+from heapq import merge
+from itertools import islice
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.core.single_flight import single_flight
+from app.core.tracing import traced
+from app.models import Post
+from app.repositories import counter_repository
+from app.repositories.memory_backend import memory_backend
+from app.repositories.queries import FEED_PAGE, FEED_PAGE_BEFORE
+from app.repositories.read_models import PostRow
+
+# Уровень для анонимной главной страницы: видны заголовки всех постов.
+ANY_LEVEL = 2 ** 31 - 1
+
+
+class FeedRing:
+    """Последние посты, видимые на одном уровне доступа, по убыванию id.
+
+    Кольцо достоверно для всех id >= floor: любой пост из этого диапазона,
+    видимый на уровне, в нём есть. exhaustive означает, что в кольце все
+    видимые посты, и запрос в БД не нужен даже для последних страниц.
+    """
+
+    def __init__(self, level: int, capacity: int):
+        self.level = level
+        self.capacity = capacity
+        self.items: list[PostRow] = []
+        self.keys: list[int] = []  # -id, для bisect по убыванию id
+        self.floor = 0
+        self.exhaustive = False
+
+    def load(self, items: list[PostRow]) -> None:
+        self.items = items
+        self.keys = [-item.id for item in items]
+        self.exhaustive = len(items) < self.capacity
+        self.floor = 0 if self.exhaustive else items[-1].id
+
+    def upsert(self, item: PostRow) -> None:
+        self.remove(item.id)
+        if item.required_access_id > self.level or item.id < self.floor:
+            return
+        index = bisect_left(self.keys, -item.id)
+        self.items.insert(index, item)
+        self.keys.insert(index, -item.id)
+        if len(self.items) > self.capacity:
+            self.items.pop()
+            self.keys.pop()
+            self.floor = self.items[-1].id
+            self.exhaustive = False
+
+    def remove(self, post_id: int) -> None:
+        index = bisect_left(self.keys, -post_id)
+        if index < len(self.keys) and self.keys[index] == -post_id:
+            del self.items[index]
+            del self.keys[index]
+
+    def page(self, limit: int, before_id: int | None) -> list[PostRow] | None:
+        """Страница из памяти или None, если кольцо не покрывает её целиком."""
+        start = 0 if before_id is None else bisect_left(self.keys, -before_id + 1)
+        items = self.items[start:start + limit]
+        if len(items) == limit or self.exhaustive:
+            return items
+        return None
+
+
+class FeedCache:
+    """Кольца ленты процесса.
+
+    Записи этого процесса сразу применяются к кольцам (upsert/remove). Записи
+    других процессов видны по версии ленты в БД (счётчик feed_version,
+    растёт в транзакции каждой записи постов): раз в version_ttl секунд она
+    сверяется, и если она выросла больше, чем на число записей этого процесса
+    (committed()), кольца сбрасываются и загружаются заново.
+    """
+
+    def __init__(self, capacity: int, version_ttl: float = 1.0):
+        self.capacity = capacity
+        self.version_ttl = version_ttl
+        self.rings: dict[int, FeedRing] = {}
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self.db_version: int | None = None
+        self.db_version_checked_at = float("-inf")
+        # Записи постов этого процесса: всего и учтённые в db_version
+        self.own_writes = 0
+        self.checked_own_writes = 0
+        self._lock = asyncio.Lock()
+
+    @traced
+    async def check_version(self, session: AsyncSession) -> None:
+        if memory_backend is not None or time.monotonic() - self.db_version_checked_at < self.version_ttl:
+            return
+        # Одна сверка на version_ttl: остальные запросы до её окончания читают текущие кольца
+        self.db_version_checked_at = time.monotonic()
+        own_writes = self.own_writes
+        db_version = await counter_repository.feed_version(session)
+        # Запись, закоммиченная во время чтения, могла и попасть в db_version, и нет - тогда сбрасываем
+        expected = None if self.db_version is None else self.db_version + own_writes - self.checked_own_writes
+        if self.db_version is not None and (db_version != expected or self.own_writes != own_writes):
+            self.clear()
+        self.db_version = db_version
+        self.checked_own_writes = self.own_writes
+
+    def committed(self) -> None:
+        """Вызывается сразу после коммита записи постов этого процесса (одно увеличение feed_version)."""
+        self.own_writes += 1
+
+    @traced
+    async def ring(self, session: AsyncSession, level: int) -> FeedRing:
+        await self.check_version(session)
+        ring = self.rings.get(level)
+        if ring is not None:
+            return ring
+        async with self._lock:
+            ring = self.rings.get(level)
+            while ring is None:
+                # Запись, закоммиченная во время загрузки, не попадёт в кольцо - загружаем заново
+                version = self.version
+                items = await _select_page(level, self.capacity, None)
+                if version == self.version:
+                    ring = FeedRing(level, self.capacity)
+                    ring.load(items)
+                    self.rings[level] = ring
+        return ring
+
+    def upsert(self, post: Post) -> None:
+        self.version += 1
+        item = PostRow.from_post(post)
+        for ring in self.rings.values():
+            ring.upsert(item)
+
+    def remove(self, post_id: int) -> None:
+        self.version += 1
+        for ring in self.rings.values():
+            ring.remove(post_id)
+
+    def clear(self) -> None:
+        # Загрузка кольца, идущая сейчас, могла прочитать старые данные - она начнётся заново
+        self.version += 1
+        self.rings.clear()
+
+
+feed_cache = FeedCache(capacity=settings.feed_ring_size, version_ttl=settings.feed_version_ttl)
+
+
+@traced
+async def _select_page(level: int, limit: int, before_id: int | None) -> list[PostRow]:
+    if memory_backend is not None:
+        return [PostRow.from_post(post) for post in memory_backend.feed_page(level, limit, before_id)]
+    if before_id is None:
+        stmt, params = FEED_PAGE, {"level": level, "limit": limit}
+    else:
+        stmt, params = FEED_PAGE_BEFORE, {"level": level, "before_id": before_id, "limit": limit}
+    if shard_router is not None:
+        # Каждый шард отдаёт свою первую страницу, слияние по убыванию id
+        async def shard_page(shard_session: AsyncSession):
+            return [PostRow(*row) for row in (await shard_session.execute(stmt, params)).all()]
+
+        pages = await shard_router.scatter(shard_page)
+        return list(islice(merge(*pages, key=lambda item: -item.id), limit))
+    async with db_helper.session_factory() as session:
+        result = await session.execute(stmt, params)
+        return [PostRow(*row) for row in result.all()]
+
+
+@traced
+async def get_feed(session: AsyncSession, access_level: int, limit: int,
+                   before_id: int | None = None) -> list[PostRow]:
+    try:
+        ring = await feed_cache.ring(session, access_level)
+        items = ring.page(limit, before_id)
+        if items is not None:
+            feed_cache.hits += 1
+            return items
+        feed_cache.misses += 1
+        # Страница глубже кольца: keyset-запрос по первичному ключу
+        return await single_flight.run("feed", (access_level, limit, before_id),
+                                       lambda: _select_page(access_level, limit, before_id))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
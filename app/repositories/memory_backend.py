@@ -0,0 +1,235 @@
+"""Хранилище репозиториев в памяти процесса (REPOSITORY_BACKEND=memory).
+
+Без ввода-вывода: позволяет измерить накладные расходы фреймворка,
+сериализации и аутентификации отдельно от запросов к БД. Функции
+репозиториев сохраняют свой интерфейс и при включённом бэкенде вместо
+запросов обращаются к memory_backend.
+
+Данные живут до перезапуска процесса и не делятся между воркерами.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import islice
+
+from app.auth.service.password_hashing import hash_cost
+from app.core.config import settings
+from app.models.counter import CounterScopeEnum
+
+
+class UserRecord:
+    __slots__ = ("id", "username", "email", "password", "role", "is_active", "access_id")
+
+    def __init__(self, id: int, username: str, email: str, password: str, role, is_active: bool,
+                 access_id: int):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.password = password
+        self.role = role
+        self.is_active = is_active
+        self.access_id = access_id
+
+
+class PostRecord:
+    __slots__ = ("id", "tittle", "description", "required_access_id", "owner_id")
+
+    def __init__(self, id: int, tittle: str, description: str, required_access_id: int, owner_id: int):
+        self.id = id
+        self.tittle = tittle
+        self.description = description
+        self.required_access_id = required_access_id
+        self.owner_id = owner_id
+
+
+class AttachmentRecord:
+    __slots__ = ("id", "post_id", "filename", "content_type", "size", "sha256", "created_at")
+
+    def __init__(self, id: int, post_id: int, filename: str, content_type: str, size: int, sha256: str):
+        self.id = id
+        self.post_id = post_id
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.created_at = datetime.now()
+
+
+class MemoryBackend:
+    """Пользователи, посты и счётчики с индексами по id, email и owner_id.
+
+    Пользователи лежат в массиве по id, посты - в словаре по id и в списках
+    владельцев по возрастанию id. Счётчики ведутся так же, как в БД: при
+    каждой записи, затрагивающей владельца, уровень доступа или роль.
+    """
+
+    def __init__(self):
+        self.users: list[UserRecord | None] = [None]  # индекс - id, id 0 не выдаётся
+        self.users_by_email: dict[str, UserRecord] = {}
+        self.posts: dict[int, PostRecord] = {}
+        self.post_ids: list[int] = []
+        self.posts_by_owner: dict[int, list[PostRecord]] = {}
+        self.counters: dict[CounterScopeEnum, dict[str, int]] = {scope: {} for scope in CounterScopeEnum}
+        self.attachments: dict[int, AttachmentRecord] = {}
+        self.next_post_id = 1
+        self.next_attachment_id = 1
+
+    # Пользователи
+
+    def user_by_id(self, user_id: int) -> UserRecord | None:
+        return self.users[user_id] if 0 < user_id < len(self.users) else None
+
+    def user_by_email(self, email: str) -> UserRecord | None:
+        return self.users_by_email.get(email)
+
+    def active_users(self) -> list[UserRecord]:
+        return [user for user in self.users if user is not None and user.is_active]
+
+    def authors(self, user_ids) -> list[UserRecord]:
+        return [user for user in map(self.user_by_id, user_ids) if user is not None]
+
+    def add_user(self, username: str, email: str, password: str, role, is_active: bool,
+                 access_id: int) -> UserRecord:
+        if email in self.users_by_email:
+            raise ValueError(f"Пользователь с email {email} уже существует")
+        user = UserRecord(len(self.users), username, email, password, role, is_active, access_id)
+        self.users.append(user)
+        self.users_by_email[email] = user
+        self._bump_role(user.role, user.is_active, 1)
+        return user
+
+    def delete_user(self, user: UserRecord) -> None:
+        if self.user_by_id(user.id) is not user:
+            return
+        self.users[user.id] = None
+        del self.users_by_email[user.email]
+        self._bump_role(user.role, user.is_active, -1)
+
+    def replace_password(self, user_id: int, old_password: str, new_password: str) -> bool:
+        user = self.user_by_id(user_id)
+        if user is None or user.password != old_password:
+            return False
+        user.password = new_password
+        return True
+
+    def password_costs(self) -> dict[str, int]:
+        costs: dict[str, int] = {}
+        for user in self.users:
+            if user is not None:
+                cost = str(hash_cost(user.password) or 0)
+                costs[cost] = costs.get(cost, 0) + 1
+        return dict(sorted(costs.items()))
+
+    # Посты
+
+    def post(self, post_id: int, required_access: int) -> PostRecord | None:
+        post = self.posts.get(post_id)
+        return post if post is not None and post.required_access_id <= required_access else None
+
+    def posts_of(self, owner_id: int, required_access: int) -> list[PostRecord]:
+        return [post for post in self.posts_by_owner.get(owner_id, ())
+                if post.required_access_id <= required_access]
+
+    def all_posts(self) -> list[PostRecord]:
+        return [self.posts[post_id] for post_id in self.post_ids]
+
+    def feed_page(self, level: int, limit: int, before_id: int | None) -> list[PostRecord]:
+        """Посты по убыванию id, как keyset-запрос FEED_PAGE_BEFORE."""
+        end = len(self.post_ids) if before_id is None else bisect_left(self.post_ids, before_id)
+        visible = (self.posts[self.post_ids[index]] for index in range(end - 1, -1, -1))
+        return list(islice((post for post in visible if post.required_access_id <= level), limit))
+
+    def add_post(self, tittle: str, description: str, required_access_id: int, owner_id: int,
+                 post_id: int | None = None) -> PostRecord:
+        post_id = post_id or self.next_post_id
+        if post_id in self.posts:
+            raise ValueError(f"Пост {post_id} уже существует")
+        self.next_post_id = max(self.next_post_id, post_id + 1)
+        post = PostRecord(post_id, tittle, description, required_access_id, owner_id)
+        self.posts[post_id] = post
+        insort(self.post_ids, post_id)
+        self._index_post(post)
+        return post
+
+    def delete_post(self, post: PostRecord) -> None:
+        if self.posts.pop(post.id, None) is None:
+            return
+        del self.post_ids[bisect_left(self.post_ids, post.id)]
+        self._unindex_post(post)
+
+    def _index_post(self, post: PostRecord) -> None:
+        owner_posts = self.posts_by_owner.setdefault(post.owner_id, [])
+        keys = [item.id for item in owner_posts]
+        owner_posts.insert(bisect_left(keys, post.id), post)
+        self._bump_post(post, 1)
+
+    def _unindex_post(self, post: PostRecord) -> None:
+        owner_posts = self.posts_by_owner[post.owner_id]
+        owner_posts.remove(post)
+        if not owner_posts:
+            del self.posts_by_owner[post.owner_id]
+        self._bump_post(post, -1)
+
+    # Вложения (содержимое - в хранилище вложений, здесь только записи)
+
+    def post_attachments(self, post_id: int) -> list[AttachmentRecord]:
+        return [attachment for attachment in self.attachments.values() if attachment.post_id == post_id]
+
+    def attachment(self, post_id: int, attachment_id: int) -> AttachmentRecord | None:
+        attachment = self.attachments.get(attachment_id)
+        return attachment if attachment is not None and attachment.post_id == post_id else None
+
+    def add_attachment(self, post_id: int, filename: str, content_type: str, size: int,
+                       sha256: str) -> AttachmentRecord:
+        attachment = AttachmentRecord(self.next_attachment_id, post_id, filename, content_type, size, sha256)
+        self.attachments[attachment.id] = attachment
+        self.next_attachment_id += 1
+        return attachment
+
+    def delete_attachment(self, attachment: AttachmentRecord) -> None:
+        self.attachments.pop(attachment.id, None)
+
+    def sha256_referenced(self, sha256: str) -> bool:
+        return any(attachment.sha256 == sha256 for attachment in self.attachments.values())
+
+    # Изменение записей
+
+    def update(self, record: UserRecord | PostRecord, changes: dict) -> None:
+        """Применяет изменения и перестраивает затронутые индексы и счётчики."""
+        if isinstance(record, PostRecord):
+            self._unindex_post(record)
+            for key, value in changes.items():
+                setattr(record, key, value)
+            self._index_post(record)
+            return
+        email = changes.get("email", record.email)
+        if email != record.email and email in self.users_by_email:
+            raise ValueError(f"Пользователь с email {email} уже существует")
+        self._bump_role(record.role, record.is_active, -1)
+        del self.users_by_email[record.email]
+        for key, value in changes.items():
+            setattr(record, key, value)
+        self.users_by_email[record.email] = record
+        self._bump_role(record.role, record.is_active, 1)
+
+    # Счётчики
+
+    def counter(self, scope: CounterScopeEnum, key) -> int:
+        return self.counters[scope].get(str(key), 0)
+
+    def scope(self, scope: CounterScopeEnum) -> dict[str, int]:
+        return dict(sorted(self.counters[scope].items()))
+
+    def _bump(self, scope: CounterScopeEnum, key, delta: int) -> None:
+        values = self.counters[scope]
+        values[str(key)] = values.get(str(key), 0) + delta
+
+    def _bump_post(self, post: PostRecord, delta: int) -> None:
+        self._bump(CounterScopeEnum.owner_posts, post.owner_id, delta)
+        self._bump(CounterScopeEnum.access_posts, post.required_access_id, delta)
+
+    def _bump_role(self, role, is_active: bool, delta: int) -> None:
+        if is_active:
+            self._bump(CounterScopeEnum.role_active_users, role.name if hasattr(role, "name") else role, delta)
+
+
+memory_backend = MemoryBackend() if settings.repository_backend == "memory" else None
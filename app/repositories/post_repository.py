@@ -1,35 +1,115 @@
+from heapq import merge
+from typing import AsyncIterator
+
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from starlette import status
 
+from app.core.audit import audit_log
+from app.core.db_helper import db_helper
+from app.core.post_events import post_events
+from app.core.sharding import shard_router, owner_session, attach
+from app.core.single_flight import single_flight
+from app.core.tracing import traced, span
 from app.models import Post
+from app.repositories import archive_repository, attachment_repository, counter_repository
+from app.repositories.memory_backend import memory_backend
+from app.repositories.queries import POSTS_BY_OWNER, POST_BY_ID, ALL_POSTS
+from app.repositories.feed_repository import feed_cache
+from app.repositories.read_models import PostRow
 from app.schemas.post import PostCreate
 
 
-async def get_posts(session: AsyncSession, owner_id: int, required_access: int):
+@traced
+async def get_posts(session: AsyncSession, owner_id: int, required_access: int,
+                    archived: bool = False) -> list[PostRow]:
+    """Посты владельца; archived - владелец прочитан из архива (User.archived), его посты ищутся в posts_archive."""
     try:
-        result = await session.execute(
-            select(Post).where(Post.owner_id == owner_id, Post.required_access_id <= required_access).order_by(Post.id))
-        posts = result.scalars().all()
+        if memory_backend is not None:
+            return memory_backend.posts_of(owner_id, required_access)
+        async with owner_session(session, owner_id) as posts_session:
+            result = await posts_session.execute(
+                POSTS_BY_OWNER, {"owner_id": owner_id, "required_access": required_access})
+            posts = [PostRow(*row) for row in result]
+        # Посты архивного владельца лежат в posts_archive; у остальных пустой список - просто нет постов
+        if not posts and archived:
+            return await archive_repository.posts_of(session, owner_id, required_access)
         return posts
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
-async def get_all_posts(session: AsyncSession):
+async def stream_posts(owner_id: int, required_access: int, batch_size: int = 500,
+                       archived: bool = False) -> AsyncIterator[PostRow]:
+    """Посты владельца по одному, строки читаются из БД пачками по batch_size.
+
+    Для потокового рендера страниц: весь список в памяти не собирается.
+    Сессия открывается своя, так как сессия запроса закрывается до отправки тела ответа.
+    """
+    if memory_backend is not None:
+        for post in memory_backend.posts_of(owner_id, required_access):
+            yield post
+        return
+    if shard_router is not None:
+        posts_session = shard_router.session(owner_id)
+    else:
+        posts_session = db_helper.session_factory()
+    found = False
+    async with posts_session as session:
+        result = await session.stream(
+            POSTS_BY_OWNER, {"owner_id": owner_id, "required_access": required_access},
+            execution_options={"yield_per": batch_size})
+        async for row in result:
+            found = True
+            yield PostRow(*row)
+    if not found and archived:
+        async with db_helper.session_factory() as session:
+            for post in await archive_repository.posts_of(session, owner_id, required_access):
+                yield post
+
+
+@traced
+async def get_all_posts(session: AsyncSession) -> list[PostRow]:
     try:
-        result = await session.execute(select(Post).order_by(Post.id))
-        return result.scalars().all()
+        if memory_backend is not None:
+            return memory_backend.all_posts()
+        if shard_router is not None:
+            async def shard_posts(shard_session: AsyncSession):
+                result = await shard_session.execute(ALL_POSTS)
+                return [PostRow(*row) for row in result]
+
+            return list(merge(*await shard_router.scatter(shard_posts), key=lambda post: post.id))
+        result = await session.execute(ALL_POSTS)
+        return [PostRow(*row) for row in result]
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@traced
+async def _select_post(post_id: int, required_access: int) -> Post | None:
+    if memory_backend is not None:
+        return memory_backend.post(post_id, required_access)
+    params = {"post_id": post_id, "required_access": required_access}
+
+    async def find(posts_session: AsyncSession):
+        return (await posts_session.execute(POST_BY_ID, params)).scalars().first()
+
+    if shard_router is not None:
+        post = next((found for found in await shard_router.scatter(find) if found), None)
+    else:
+        async with db_helper.session_factory() as posts_session:
+            post = await find(posts_session)
+    return post if post is not None else await archive_repository.find_post(post_id, required_access)
+
+
+@traced
 async def get_post_by_id(session: AsyncSession, post_id: int, required_access: int) -> Post | None:
+    """Пост, доступный уровню required_access. Объект отсоединён от сессии:
+    одновременные одинаковые запросы получают один и тот же результат,
+    поэтому изменять его нужно через attach (как в update_entry и delete_post)."""
     try:
-        result = await session.execute(
-            select(Post).where(Post.id == post_id, Post.required_access_id <= required_access))
-        post = result.scalars().first()
+        post = await single_flight.run("post", (post_id, required_access),
+                                       lambda: _select_post(post_id, required_access))
         if not post:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -41,25 +121,62 @@ async def get_post_by_id(session: AsyncSession, post_id: int, required_access: i
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ошибка при получении поста {post_id}: {str(e)}")
 
 
+@traced
 async def create_post(session: AsyncSession, post_in: PostCreate, required_access: int, owner_id: int) -> Post:
     try:
-        db_post = Post(
-            tittle=post_in.tittle,
-            description=post_in.description,
-            required_access_id=required_access,
-            owner_id=owner_id,
-        )
-        session.add(db_post)
-        await session.commit()
-        await session.refresh(db_post)
+        if memory_backend is not None:
+            db_post = memory_backend.add_post(post_in.tittle, post_in.description, required_access, owner_id)
+            single_flight.invalidate("post", "feed")
+        else:
+            async with owner_session(session, owner_id, write=True) as posts_session:
+                db_post = Post(
+                    tittle=post_in.tittle,
+                    description=post_in.description,
+                    required_access_id=required_access,
+                    owner_id=owner_id,
+                )
+                if shard_router is not None:
+                    db_post.id = await shard_router.allocate_post_id()
+                posts_session.add(db_post)
+                await counter_repository.bump_post(posts_session, owner_id, required_access, 1)
+                await counter_repository.bump_feed(posts_session)
+                with span("session.commit"):
+                    await posts_session.commit()
+                feed_cache.committed()
+                single_flight.invalidate("post", "feed")
+                with span("session.refresh"):
+                    await posts_session.refresh(db_post)
+        feed_cache.upsert(db_post)
+        post_events.publish("created", db_post)
+        await audit_log.record("create", "post", db_post.id, post_in.model_dump())
         return db_post
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@traced
 async def delete_post(session: AsyncSession, post: Post) -> None:
     try:
-        await session.delete(post)
-        await session.commit()
+        if memory_backend is not None:
+            memory_backend.delete_post(post)
+            single_flight.invalidate("post", "feed")
+        else:
+            await archive_repository.ensure_hot(post)
+            async with owner_session(session, post.owner_id, write=True) as posts_session:
+                post = await attach(posts_session, post)
+                await posts_session.delete(post)
+                await counter_repository.bump_post(posts_session, post.owner_id, post.required_access_id, -1)
+                await counter_repository.bump_feed(posts_session)
+                await posts_session.commit()
+                feed_cache.committed()
+                single_flight.invalidate("post", "feed")
+        await attachment_repository.delete_post_attachments(session, post.id)
+        feed_cache.remove(post.id)
+        post_events.publish("deleted", post)
+        await audit_log.record("delete", "post", post.id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
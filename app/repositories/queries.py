@@ -0,0 +1,141 @@
+"""Запросы репозиториев, построенные один раз при импорте.
+
+Конструкция select() с bindparam собирается один раз, и SQLAlchemy
+запоминает её ключ кеша компиляции: при выполнении не нужно заново строить
+выражение и обходить его для ключа, значения передаются параметрами.
+
+install_warmup() регистрирует обработчик connect: каждое новое соединение
+пула сразу выполняет горячие запросы с пустыми параметрами, и драйвер
+(asyncpg) подготавливает их до первого пользовательского запроса.
+"""
+import logging
+
+from sqlalchemy import select, update, bindparam, event, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.models import Post, User, Counter, ArchivedPost, ArchivedUser
+
+logger = logging.getLogger(__name__)
+
+# Списки выбирают колонки в порядке полей PostRow/UserRow (app.repositories.read_models)
+_POST_COLUMNS = select(Post.id, Post.tittle, Post.description, Post.required_access_id, Post.owner_id)
+_USER_COLUMNS = select(User.id, User.username, User.email, User.role, User.is_active, User.access_id)
+
+POSTS_BY_OWNER = (
+    _POST_COLUMNS
+    .where(Post.owner_id == bindparam("owner_id"), Post.required_access_id <= bindparam("required_access"))
+    .order_by(Post.id)
+)
+POST_BY_ID = select(Post).where(Post.id == bindparam("post_id"),
+                                Post.required_access_id <= bindparam("required_access"))
+ALL_POSTS = _POST_COLUMNS.order_by(Post.id)
+
+FEED_PAGE = (
+    _POST_COLUMNS.where(Post.required_access_id <= bindparam("level"))
+    .order_by(Post.id.desc()).limit(bindparam("limit", type_=Integer))
+)
+FEED_PAGE_BEFORE = (
+    _POST_COLUMNS.where(Post.required_access_id <= bindparam("level"), Post.id < bindparam("before_id"))
+    .order_by(Post.id.desc()).limit(bindparam("limit", type_=Integer))
+)
+
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+ACTIVE_USERS = _USER_COLUMNS.where(User.is_active).order_by(User.id)
+AUTHORS_BY_IDS = select(User.id, User.username).where(User.id.in_(bindparam("user_ids", expanding=True)))
+# Чтения из архива при промахе горячих таблиц (app.repositories.archive_repository)
+ARCHIVED_USER_BY_EMAIL = select(ArchivedUser).where(ArchivedUser.email == bindparam("email"))
+ARCHIVED_USER_BY_ID = select(ArchivedUser).where(ArchivedUser.id == bindparam("user_id"))
+ARCHIVED_AUTHORS_BY_IDS = (
+    select(ArchivedUser.id, ArchivedUser.username).where(ArchivedUser.id.in_(bindparam("user_ids", expanding=True)))
+)
+ARCHIVED_POST_BY_ID = select(ArchivedPost).where(ArchivedPost.id == bindparam("post_id"),
+                                                ArchivedPost.required_access_id <= bindparam("required_access"))
+ARCHIVED_POSTS_BY_OWNER = (
+    select(ArchivedPost.id, ArchivedPost.tittle, ArchivedPost.description, ArchivedPost.required_access_id,
+           ArchivedPost.owner_id)
+    .where(ArchivedPost.owner_id == bindparam("owner_id"),
+           ArchivedPost.required_access_id <= bindparam("required_access"))
+    .order_by(ArchivedPost.id)
+)
+# Обновляется, только если пароль не сменили, пока шло перехеширование
+USER_PASSWORD_REHASH = (
+    update(User).where(User.id == bindparam("user_id"), User.password == bindparam("old_password"))
+    .values(password=bindparam("new_password"))
+)
+
+# Имена параметров не совпадают с колонками: в UPDATE/INSERT такие имена заняты
+COUNTER_VALUE = select(Counter.value).where(Counter.scope == bindparam("counter_scope"),
+                                            Counter.key == bindparam("counter_key"))
+COUNTER_SCOPE = (
+    select(Counter.key, Counter.value).where(Counter.scope == bindparam("counter_scope")).order_by(Counter.key)
+)
+
+
+def _counter_upsert(dialect_insert):
+    # Одна инструкция вместо UPDATE и INSERT при промахе: две первые записи
+    # по новому ключу в параллельных транзакциях не нарушают uq_counters_scope_key
+    statement = dialect_insert(Counter).values(scope=bindparam("counter_scope"), key=bindparam("counter_key"),
+                                               value=bindparam("delta", type_=Integer))
+    return statement.on_conflict_do_update(index_elements=[Counter.scope, Counter.key],
+                                           set_={"value": Counter.value + statement.excluded.value})
+
+
+COUNTER_UPSERT = {"postgresql": _counter_upsert(postgresql.insert), "sqlite": _counter_upsert(sqlite.insert)}
+
+# Горячие запросы и параметры-пустышки для прогрева соединений
+POST_WARMUP = (
+    (POST_BY_ID, {"post_id": 0, "required_access": 0}),
+    (POSTS_BY_OWNER, {"owner_id": 0, "required_access": 0}),
+    (FEED_PAGE, {"level": 0, "limit": 1}),
+    (FEED_PAGE_BEFORE, {"level": 0, "before_id": 0, "limit": 1}),
+    (COUNTER_VALUE, {"counter_scope": "owner_posts", "counter_key": ""}),
+)
+MAIN_WARMUP = (
+    (USER_BY_EMAIL, {"email": ""}),
+    (USER_BY_ID, {"user_id": 0}),
+    (COUNTER_VALUE, {"counter_scope": "role_active_users", "counter_key": ""}),
+)
+
+
+def _compile(statement, params: dict, dialect) -> tuple[str, tuple | dict]:
+    compiled = statement.compile(dialect=dialect)
+    values = compiled.construct_params(params)
+    if compiled.positional:
+        return compiled.string, tuple(values[name] for name in compiled.positiontup)
+    return compiled.string, values
+
+
+def warm_connection(dbapi_connection, statements, dialect) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for statement, params in statements:
+            cursor.execute(*_compile(statement, params, dialect))
+            cursor.fetchall()
+    except Exception as e:
+        # Прогрев не должен мешать соединению: например, таблиц ещё нет при первом запуске
+        logger.warning("Прогрев соединения пропущен: %s", e)
+    finally:
+        cursor.close()
+        dbapi_connection.rollback()
+
+
+def install_warmup(engine: AsyncEngine, statements) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def warm(dbapi_connection, connection_record):
+        warm_connection(dbapi_connection, statements, sync_engine.dialect)
+
+
+def install_warmups() -> None:
+    """Прогрев основной БД и шардов: запросы постов - там, где лежат посты."""
+    if shard_router is None:
+        install_warmup(db_helper.engine, MAIN_WARMUP + POST_WARMUP)
+        return
+    install_warmup(db_helper.engine, MAIN_WARMUP)
+    for shard in shard_router.shards.values():
+        install_warmup(shard.engine, POST_WARMUP)
@@ -0,0 +1,37 @@
+"""Компактные строки для списков, читаемые мимо ORM.
+
+Списочные запросы выбирают явные колонки, и каждая строка результата
+превращается в объект со __slots__: без регистрации в identity map,
+состояния экземпляра и механизма ленивых связей. Схемы ответа
+(from_attributes) принимают такие строки так же, как модели ORM.
+"""
+from app.models import Post
+
+
+class PostRow:
+    __slots__ = ("id", "tittle", "description", "required_access_id", "owner_id")
+
+    def __init__(self, id: int, tittle: str, description: str, required_access_id: int, owner_id: int):
+        self.id = id
+        self.tittle = tittle
+        self.description = description
+        self.required_access_id = required_access_id
+        self.owner_id = owner_id
+
+    @classmethod
+    def from_post(cls, post: Post) -> "PostRow":
+        return cls(post.id, post.tittle, post.description, post.required_access_id, post.owner_id)
+
+
+class UserRow:
+    """Пользователь для списков: без хеша пароля, он в ответах не нужен."""
+
+    __slots__ = ("id", "username", "email", "role", "is_active", "access_id")
+
+    def __init__(self, id: int, username: str, email: str, role, is_active: bool, access_id: int):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.is_active = is_active
+        self.access_id = access_id
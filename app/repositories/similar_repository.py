@@ -1,3 +1,5 @@
+from contextlib import nullcontext
+from datetime import datetime
 from typing import TypeVar
 
 from fastapi import HTTPException
@@ -5,19 +7,101 @@ from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from app.models import User
+from app.core.audit import audit_log
+from app.core.post_events import post_events
+from app.core.sharding import owner_session, attach
+from app.core.single_flight import single_flight
+from app.core.tracing import traced, span
+from app.models import User, Post
+from app.repositories import archive_repository, counter_repository
+from app.repositories.feed_repository import feed_cache
+from app.repositories.memory_backend import memory_backend, PostRecord, UserRecord
 
 ModelType = TypeVar("ModelType")
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
 
+POST_TYPES = (Post, PostRecord)
+USER_TYPES = (User, UserRecord)
 
+
+@traced
 async def update_entry(session: AsyncSession, model: ModelType, schema: SchemaType,
                        partial: bool = False) -> User:
     try:
-        for key, value in schema.model_dump(exclude_unset=partial).items():
-            setattr(model, key, value)
-        await session.commit()
-        await session.refresh(model)
+        changes = schema.model_dump(exclude_unset=partial)
+        previous_access = model.required_access_id if isinstance(model, POST_TYPES) else None
+        if memory_backend is not None:
+            memory_backend.update(model, changes)
+            single_flight.invalidate(*_flight_namespaces(model))
+        else:
+            await archive_repository.ensure_hot(model)
+            async with _entry_session(session, model) as entry_session:
+                model = await attach(entry_session, model)
+                before = _counted_state(model)
+                for key, value in changes.items():
+                    setattr(model, key, value)
+                if isinstance(model, User) and before[1] != model.is_active:
+                    model.deactivated_at = None if model.is_active else datetime.utcnow()
+                await _update_counters(entry_session, model, before)
+                with span("session.commit"):
+                    await entry_session.commit()
+                if isinstance(model, Post):
+                    feed_cache.committed()
+                single_flight.invalidate(*_flight_namespaces(model))
+                with span("session.refresh"):
+                    await entry_session.refresh(model)
+        if isinstance(model, POST_TYPES):
+            feed_cache.upsert(model)
+            post_events.publish("updated", model, previous_access)
+        await audit_log.record("update", _entity_name(model), model.id, changes)
         return model
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+def _entry_session(session: AsyncSession, model):
+    # Посты могут лежать на шарде владельца, остальные модели - в основной БД
+    if isinstance(model, Post):
+        return owner_session(session, model.owner_id, write=True)
+    return nullcontext(session)
+
+
+def _entity_name(model) -> str:
+    if isinstance(model, POST_TYPES):
+        return "post"
+    if isinstance(model, USER_TYPES):
+        return "user"
+    return type(model).__name__.lower()
+
+
+def _flight_namespaces(model) -> tuple[str, ...]:
+    if isinstance(model, POST_TYPES):
+        return "post", "feed"
+    if isinstance(model, USER_TYPES):
+        return ("user",)
+    return ()
+
+
+def _counted_state(model) -> tuple | None:
+    if isinstance(model, Post):
+        return model.owner_id, model.required_access_id
+    if isinstance(model, User):
+        return model.role, model.is_active
+    return None
+
+
+@traced
+async def _update_counters(session: AsyncSession, model, before: tuple | None) -> None:
+    if isinstance(model, Post):
+        await counter_repository.bump_feed(session)
+    after = _counted_state(model)
+    if before is None or before == after:
+        return
+    if isinstance(model, Post):
+        await counter_repository.bump_post(session, before[0], before[1], -1)
+        await counter_repository.bump_post(session, after[0], after[1], 1)
+    else:
+        await counter_repository.bump_role(session, before[0], before[1], -1)
+        await counter_repository.bump_role(session, after[0], after[1], 1)
@@ -0,0 +1,107 @@
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.core.db_helper import db_helper
+from app.core.sharding import attach
+from app.core.single_flight import single_flight
+from app.core.tracing import traced
+from app.models import User
+from app.repositories import archive_repository
+from app.repositories.memory_backend import memory_backend
+from app.repositories.queries import USER_BY_EMAIL, USER_BY_ID, AUTHORS_BY_IDS, ARCHIVED_USER_BY_EMAIL, \
+    ARCHIVED_USER_BY_ID
+from app.schemas.post import PostWithAuthor
+from app.schemas.user import AuthorSummary
+
+
+class UserLoader:
+    """Загрузчик авторов в рамках одного запроса (в стиле dataloader).
+
+    Все id авторов страницы собираются в один запрос WHERE id IN (...).
+    Уже загруженные авторы и текущий пользователь берутся из кеша загрузчика,
+    повторные id не запрашиваются.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.cache: dict[int, AuthorSummary | None] = {}
+        self.queries = 0
+
+    def prime(self, user: User) -> None:
+        self.cache[user.id] = AuthorSummary.model_validate(user)
+
+    @traced
+    async def load_many(self, user_ids) -> dict[int, AuthorSummary]:
+        user_ids = set(user_ids)
+        missing = user_ids - self.cache.keys()
+        if missing:
+            if memory_backend is not None:
+                rows = memory_backend.authors(missing)
+            else:
+                self.queries += 1
+                rows = (await self.session.execute(AUTHORS_BY_IDS, {"user_ids": list(missing)})).all()
+                if len(rows) < len(missing):
+                    found = {row.id for row in rows}
+                    rows += await archive_repository.authors(self.session, missing - found)
+            for row in rows:
+                self.cache[row.id] = AuthorSummary(id=row.id, username=row.username)
+            for user_id in missing:
+                self.cache.setdefault(user_id, None)
+        return {user_id: self.cache[user_id] for user_id in user_ids if self.cache[user_id] is not None}
+
+
+@traced
+async def with_authors(loader: UserLoader, posts: list) -> list[PostWithAuthor]:
+    try:
+        authors = await loader.load_many(post.owner_id for post in posts)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return [PostWithAuthor.model_validate(post).model_copy(update={"author": authors.get(post.owner_id)})
+            for post in posts]
+
+
+@traced
+async def _select_user(statement, archived_statement, params: dict) -> User | None:
+    async with db_helper.session_factory() as session:
+        result = await session.execute(statement, params)
+        user = result.scalars().first()
+        if user is None:
+            user = await archive_repository.find_user(session, archived_statement, params)
+        return user
+
+
+async def _attach_user(session: AsyncSession, user: User | None) -> User | None:
+    if user is None:
+        return None
+    attached = await attach(session, user)
+    # Отметка архива не колонка и при merge не копируется
+    attached.archived = user.archived
+    return attached
+
+
+@traced
+async def load_user_by_email(session: AsyncSession, email: str) -> User | None:
+    """Пользователь по email, привязанный к session.
+
+    Одинаковые одновременные поиски (аутентификация каждого запроса) выполняют
+    один SELECT в отдельной сессии, каждый вызывающий получает свою копию.
+    """
+    if memory_backend is not None:
+        return memory_backend.user_by_email(email)
+    user = await single_flight.run("user", ("email", email),
+                                   lambda: _select_user(USER_BY_EMAIL, ARCHIVED_USER_BY_EMAIL, {"email": email}))
+    return await _attach_user(session, user)
+
+
+@traced
+async def load_user_by_id(session: AsyncSession, user_id: int) -> User | None:
+    if memory_backend is not None:
+        return memory_backend.user_by_id(user_id)
+    user = await single_flight.run("user", ("id", user_id),
+                                   lambda: _select_user(USER_BY_ID, ARCHIVED_USER_BY_ID, {"user_id": user_id}))
+    return await _attach_user(session, user)
+
+
+def user_loader_dependency(session: AsyncSession = Depends(db_helper.scoped_session_dependency)) -> UserLoader:
+    return UserLoader(session)
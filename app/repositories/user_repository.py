@@ -1,34 +1,62 @@
+import asyncio
+import logging
+from datetime import datetime
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, func
 from sqlalchemy.engine import Result
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
 from app.auth.service.jwt_service import get_password_hash
+from app.auth.service.password_hashing import password_stats
+from app.core.audit import audit_log
+from app.core.db_helper import db_helper
+from app.core.single_flight import single_flight
+from app.core.tracing import traced
 from app.models import User
+from app.repositories import archive_repository, counter_repository
+from app.repositories.memory_backend import memory_backend
+from app.repositories.queries import ACTIVE_USERS, USER_PASSWORD_REHASH
+from app.repositories.read_models import UserRow
+from app.repositories.user_loader import load_user_by_email, load_user_by_id
 from app.schemas.user import UserCreate
 
+logger = logging.getLogger(__name__)
+
 
-async def get_users(session: AsyncSession) -> list[User]:
+@traced
+async def get_users(session: AsyncSession) -> list[UserRow]:
     try:
-        stmt = select(User).where(User.is_active).order_by(User.id)
-        result: Result = await session.execute(stmt)
-        return list(result.scalars().all())
+        if memory_backend is not None:
+            return memory_backend.active_users()
+        result: Result = await session.execute(ACTIVE_USERS)
+        return [UserRow(*row) for row in result]
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@traced
 async def get_user_by_id(session: AsyncSession, user_id: int) -> User | None:
     try:
-        return await session.get(User, user_id)
+        return await load_user_by_id(session, user_id)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"User {user_id} not found. More detailed {str(e)}")
 
 
+@traced
 async def create_user(session: AsyncSession, user_in: UserCreate) -> User:
     try:
         hashed_password = get_password_hash(user_in.password)
+        if memory_backend is not None:
+            db_user = memory_backend.add_user(user_in.username, user_in.email, hashed_password, user_in.role,
+                                              user_in.is_active, user_in.access_id)
+            single_flight.invalidate("user")
+            return db_user
+        if await archive_repository.email_archived(session, user_in.email):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Пользователь с таким email уже существует")
         db_user = User(
             username=user_in.username,
             email=user_in.email,
@@ -38,37 +66,94 @@ async def create_user(session: AsyncSession, user_in: UserCreate) -> User:
             access_id=user_in.access_id,
         )
         session.add(db_user)
+        await counter_repository.bump_user(session, db_user, 1)
         await session.commit()
+        single_flight.invalidate("user")
         await session.refresh(db_user)
         return db_user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@traced
 async def get_user_by_email(session: AsyncSession, email: str) -> User | None:
     try:
-        result = await session.execute(select(User).where(User.email == email))
-        return result.scalars().first()
+        return await load_user_by_email(session, email)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+@traced
 async def delete_user(session: AsyncSession, user: User) -> None:
     try:
-        await session.delete(user)
-        await session.commit()
+        if memory_backend is not None:
+            memory_backend.delete_user(user)
+        else:
+            await archive_repository.ensure_hot(user)
+            await counter_repository.bump_user(session, user, -1)
+            await session.delete(user)
+            await session.commit()
+        single_flight.invalidate("user")
+        await audit_log.record("delete", "user", user.id)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@traced
 async def soft_delete_user(session: AsyncSession, user: User) -> User:
     try:
-        user.is_active = False
-        await session.commit()
-        await session.refresh(user)
+        if memory_backend is not None:
+            memory_backend.update(user, {"is_active": False})
+            single_flight.invalidate("user")
+        else:
+            await archive_repository.ensure_hot(user)
+            await counter_repository.bump_user(session, user, -1)
+            user.is_active = False
+            user.deactivated_at = datetime.utcnow()
+            await session.commit()
+            single_flight.invalidate("user")
+            await session.refresh(user)
+        await audit_log.record("soft_delete", "user", user.id)
         return user
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при мягком удалении пользователя: {str(e)}"
         )
+
+
+@traced
+async def rehash_password(user_id: int, password: str, old_hash: str) -> None:
+    """Перехеширует пароль с текущей стоимостью bcrypt.
+
+    Запускается фоновой задачей после успешного входа: хеш считается в
+    потоке, а не в цикле событий, ошибки только логируются.
+    """
+    try:
+        new_hash = await asyncio.to_thread(get_password_hash, password)
+        if memory_backend is not None:
+            updated = memory_backend.replace_password(user_id, old_hash, new_hash)
+        else:
+            async with db_helper.session_factory() as session:
+                result = await session.execute(USER_PASSWORD_REHASH, {
+                    "user_id": user_id, "old_password": old_hash, "new_password": new_hash})
+                await session.commit()
+            updated = result.rowcount
+        if updated:
+            password_stats.rehashed += 1
+            single_flight.invalidate("user")
+    except Exception:
+        password_stats.rehash_failures += 1
+        logger.exception("Не удалось перехешировать пароль пользователя %s", user_id)
+
+
+@traced
+async def password_cost_distribution(session: AsyncSession) -> dict[str, int]:
+    """Число пользователей по стоимости bcrypt: хеш имеет вид $2b$12$..."""
+    if memory_backend is not None:
+        return memory_backend.password_costs()
+    cost = func.substr(User.password, 5, 2)
+    result = await session.execute(select(cost, func.count()).group_by(cost).order_by(cost))
+    return {str(key): value for key, value in result.all()}
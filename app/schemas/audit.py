@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class AuditStats(BaseModel):
+    enqueued: int
+    written: int
+    dropped: int
+    load_errors: int
+    queue_depth: int
+    queue_size: int
+    segment: str | None
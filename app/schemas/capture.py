@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class CaptureStats(BaseModel):
+    enabled: bool
+    sample_rate: float
+    captured: int
+    written: int
+    dropped: int
+    segment: str | None
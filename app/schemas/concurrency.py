@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class RouteLimit(BaseModel):
+    limit: float
+    in_flight: int
+    waiting: int
+    baseline_ms: float | None
+    last_latency_ms: float | None
+    accepted: int
+    queued: int
+    shed: int
+    timed_out: int
+
+
+class ConcurrencyLimitsRead(BaseModel):
+    enabled: bool
+    routes: dict[str, RouteLimit]
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class Stats(BaseModel):
+    my_posts: int
+    posts_by_access: dict[str, int]
+    active_users_by_role: dict[str, int]
@@ -0,0 +1,23 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class DeadlineEvent(BaseModel):
+    route: str
+    reason: Literal["timeout", "disconnect"]
+    stage: str
+    statement: str | None
+    budget_ms: float
+    elapsed_ms: float
+    at: float
+
+
+class DeadlinesRead(BaseModel):
+    enabled: bool
+    default: float
+    routes: dict[str, float]
+    header: str
+    exceeded: dict[str, dict[str, int]]
+    disconnected: dict[str, int]
+    recent: list[DeadlineEvent]
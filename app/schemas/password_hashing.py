@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class PasswordHashingRead(BaseModel):
+    bcrypt_rounds: int
+    budget_ms: float
+    stored_costs: dict[str, int]
+    verifications: dict[str, int]
+    mean_verify_ms: dict[str, float]
+    rehashed: int
+    rehash_failures: int
@@ -1,5 +1,7 @@
 from pydantic import BaseModel, ConfigDict
 
+from app.schemas.user import AuthorSummary
+
 
 class PostBase(BaseModel):
     tittle: str
@@ -22,6 +24,15 @@ class PostRead(BaseModel):
         from_attributes = True
 
 
+class PostWithAuthor(PostRead):
+    author: AuthorSummary | None = None
+
+
+class FeedPage(BaseModel):
+    items: list[PostWithAuthor]
+    next_before_id: int | None = None
+
+
 class PostUpdate(PostBase):
     tittle: str | None = None
     description: str | None = None
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class PostEventsStats(BaseModel):
+    subscribers: int
+    by_level: dict[str, int]
+    last_event_id: str
+    replay_events: int
+    published: int
+    delivered: int
+    evicted: int
+    resumed: int
+    resets: int
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+
+class QueryStat(BaseModel):
+    fingerprint: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    p95_ms: float
+    max_ms: float
+    rows: int
+
+
+class QueryStatsRead(BaseModel):
+    fingerprints: int
+    max_fingerprints: int
+    evicted: int
+    slow_threshold_ms: float
+    top: list[QueryStat]
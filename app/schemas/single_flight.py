@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class FlightStat(BaseModel):
+    calls: int
+    executed: int
+    coalesced: int
+    ratio: float
+
+
+class SingleFlightRead(BaseModel):
+    enabled: bool
+    in_flight: int
+    namespaces: dict[str, FlightStat]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class SpanRead(BaseModel):
+    span_id: str
+    parent_span_id: str | None
+    name: str
+    kind: str
+    start_ms: float
+    duration_ms: float
+    attributes: dict
+    error: str | None = None
+
+
+class TraceRead(BaseModel):
+    trace_id: str
+    name: str
+    started_at: datetime
+    duration_ms: float
+    dropped_spans: int
+    spans: list[SpanRead]
+
+
+class TracesRead(BaseModel):
+    sample_rate: float
+    exporter: str
+    sampled: int
+    exported: int
+    stored: int
+    traces: list[TraceRead]
@@ -43,3 +43,9 @@ class UserRead(UserBase):
 class User(UserBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
+
+
+class AuthorSummary(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    username: str
@@ -0,0 +1,189 @@
+"""Загрузка и отдача многогигабайтных вложений постов.
+
+Запускает uvicorn с временной SQLite-базой и временным хранилищем вложений,
+создаёт пользователя и пост и измеряет:
+- загрузку файла размером --size ГБ (тело запроса кусками по 1 МБ);
+- скачивание целиком и повторную проверку по If-None-Match;
+- случайные диапазоны (Range) по --range-size байт.
+
+Для каждой операции выводятся МБ/с (или запросов/с) и пиковый прирост
+анонимной памяти сервера (RssAnon из /proc/<pid>/status, опрос каждые 20 мс).
+Страницы отображённого файла в этот прирост не входят: это страничный кеш,
+ядро вытесняет его само.
+
+Запуск:
+    python -m benchmarks.attachment_benchmark --size 2
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CHUNK = 1024 * 1024
+
+
+def prepare_env(directory: Path) -> dict[str, str]:
+    from sqlalchemy import create_engine
+
+    db_path = directory / "attachment_benchmark.db"
+    env = dict(os.environ, DB_URL=f"sqlite+aiosqlite:///{db_path}", POST_SHARDS="{}",
+               REPOSITORY_BACKEND="sqlalchemy", CONCURRENCY_ENABLED="False", AUDIT_ENABLED="False",
+               ATTACHMENTS_DIR=str(directory / "attachments"), ATTACHMENT_MAX_SIZE=str(1024 ** 4))
+    os.environ.update(env)
+    from app.models import Base
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return env
+
+
+def write_source(path: Path, size: int) -> str:
+    """Файл из повторяющегося случайного блока и его sha256."""
+    block = os.urandom(CHUNK)
+    digest = hashlib.sha256()
+    with open(path, "wb") as file:
+        for offset in range(0, size, CHUNK):
+            part = block[:min(CHUNK, size - offset)]
+            file.write(part)
+            digest.update(part)
+    return digest.hexdigest()
+
+
+class AnonPeak:
+    """Пиковый прирост RssAnon процесса за время блока with."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = 0
+
+    def read(self) -> int:
+        for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+        return 0
+
+    def __enter__(self):
+        self.base = self.read()
+        self.peak = self.base
+        self.running = True
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.running = False
+        self.thread.join()
+
+    def _poll(self) -> None:
+        while self.running:
+            self.peak = max(self.peak, self.read())
+            time.sleep(0.02)
+
+    @property
+    def growth_mb(self) -> float:
+        return (self.peak - self.base) / 1024 ** 2
+
+
+async def wait_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(300):
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+async def file_chunks(path: Path):
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK):
+            yield chunk
+
+
+def report(name: str, amount: float, unit: str, elapsed: float, peak: AnonPeak) -> None:
+    print(f"{name:<28} {amount / elapsed:>10.1f} {unit:<8} {elapsed:>8.2f} с {peak.growth_mb:>10.1f} МБ")
+
+
+async def main(size_gb: float, ranges: int, range_size: int, port: int) -> None:
+    directory = Path(tempfile.mkdtemp())
+    env = prepare_env(directory)
+    size = int(size_gb * 1024 ** 3)
+    source = directory / "source.bin"
+    sha256 = write_source(source, size)
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning", "--no-access-log"],
+                              cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            await wait_ready(client)
+            await client.post("/auth/reg", json={"username": "bench", "email": "bench@example.com", "password": "bench",
+                                                 "role": "Пользователь", "is_active": True, "access_id": 1})
+            token = (await client.post("/auth/login", data={"username": "bench@example.com",
+                                                            "password": "bench"})).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+            post_id = (await client.post("/post/", json={"tittle": "Вложения", "description": "Бенчмарк"})).json()["id"]
+            url = f"/post/{post_id}/attachments"
+            mb = size / 1024 ** 2
+            print(f"файл: {mb:.0f} МБ, сервер: uvicorn, 1 воркер")
+            print(f"{'операция':<28} {'скорость':>19} {'время':>10} {'пик памяти':>13}")
+
+            with AnonPeak(server.pid) as peak:
+                started = time.perf_counter()
+                response = await client.post(url, params={"filename": "source.bin"}, content=file_chunks(source),
+                                             headers={"Content-Type": "application/octet-stream"})
+                elapsed = time.perf_counter() - started
+            attachment = response.json()
+            assert attachment["sha256"] == sha256, attachment
+            report("загрузка", mb, "МБ/с", elapsed, peak)
+
+            with AnonPeak(server.pid) as peak:
+                started = time.perf_counter()
+                received = 0
+                async with client.stream("GET", f"{url}/{attachment['id']}") as response:
+                    async for chunk in response.aiter_raw():
+                        received += len(chunk)
+                elapsed = time.perf_counter() - started
+            assert received == size
+            report("скачивание целиком", mb, "МБ/с", elapsed, peak)
+
+            started = time.perf_counter()
+            response = await client.get(f"{url}/{attachment['id']}", headers={"If-None-Match": f'"{sha256}"'})
+            assert response.status_code == 304
+            print(f"{'If-None-Match':<28} {'304':>10} {'':<8} {(time.perf_counter() - started) * 1000:>8.2f} мс")
+
+            offsets = [random.randrange(0, size - range_size) for _ in range(ranges)]
+            with AnonPeak(server.pid) as peak:
+                started = time.perf_counter()
+                for offset in offsets:
+                    response = await client.get(f"{url}/{attachment['id']}",
+                                                headers={"Range": f"bytes={offset}-{offset + range_size - 1}"})
+                    assert response.status_code == 206 and len(response.content) == range_size
+                elapsed = time.perf_counter() - started
+            report(f"Range по {range_size // 1024} КБ", ranges, "з/с", elapsed, peak)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(directory)  # исходный файл и хранилище - несколько ГБ
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=float, default=2.0, help="размер файла, ГБ")
+    parser.add_argument("--ranges", type=int, default=500)
+    parser.add_argument("--range-size", type=int, default=64 * 1024)
+    parser.add_argument("--port", type=int, default=8098)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.ranges, args.range_size, args.port))
@@ -0,0 +1,128 @@
+"""Стоимость запроса к API с бэкендом репозиториев sqlalchemy и memory.
+
+Запросы идут в приложение напрямую через ASGI (без сети). С бэкендом memory
+остаются только фреймворк, аутентификация (JWT и поиск пользователя) и
+сериализация ответа, разница с sqlalchemy - доля обращений к БД (временная
+SQLite-база). /health показывает стоимость самого фреймворка.
+
+Бэкенд выбирается при импорте приложения, поэтому без --backend каждый
+бэкенд измеряется в отдельном процессе. Ключи JWT берутся из настроек (.env).
+
+Запуск:
+    python -m benchmarks.backend_benchmark --requests 2000
+    python -m benchmarks.backend_benchmark --backend memory
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKENDS = ("sqlalchemy", "memory")
+EMAIL = "user1@example.com"
+
+
+def configure(backend: str) -> None:
+    # База бенчмарка - всегда временная, чтобы не писать в рабочую БД
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp()) / 'backend_benchmark.db'}"
+    os.environ["POST_SHARDS"] = "{}"
+    os.environ["REPOSITORY_BACKEND"] = backend
+    os.environ["CONCURRENCY_ENABLED"] = "False"
+    os.environ["AUDIT_ENABLED"] = "False"
+
+
+async def seed(users: int, posts: int) -> None:
+    from sqlalchemy import insert
+
+    from app.core.db_helper import db_helper
+    from app.models import Base, Post, User
+    from app.models.user import RoleEnum
+    from app.repositories.memory_backend import memory_backend
+
+    user_rows = [{"username": f"user{i}", "email": f"user{i}@example.com", "password": "x",
+                  "role": RoleEnum.base_user, "is_active": True, "access_id": 3} for i in range(1, users + 1)]
+    post_rows = [{"tittle": f"Пост {i}", "description": "Описание поста. " * 4,
+                  "required_access_id": i % 3 + 1, "owner_id": (i - 1) % users + 1} for i in range(1, posts + 1)]
+    if memory_backend is not None:
+        for row in user_rows:
+            memory_backend.add_user(**row)
+        for row in post_rows:
+            memory_backend.add_post(**row)
+        return
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), user_rows)
+        await conn.execute(insert(Post), post_rows)
+
+
+async def measure(backend: str, requests: int, users: int, posts: int) -> dict[str, float]:
+    configure(backend)
+    import httpx
+
+    from app.auth.service.jwt_service import create_access_token
+    from app.core.db_helper import db_helper
+    from main import app
+
+    await seed(users, posts)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': EMAIL})}"}
+    cases = (
+        ("GET /health", "/health", {}),
+        ("GET /post/{id}", "/post/1", headers),
+        ("GET /post/", "/post/", headers),
+        ("GET /post/feed", "/post/feed", headers),
+        ("GET /stats/", "/stats/", headers),
+        ("GET /user/", "/user/", {}),
+    )
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, path, case_headers in cases:
+            for _ in range(50):  # прогрев кешей и пула соединений
+                (await client.get(path, headers=case_headers)).raise_for_status()
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path, headers=case_headers)
+            results[name] = (time.perf_counter() - started) / requests * 1e6
+    await db_helper.engine.dispose()
+    return results
+
+
+def run_isolated(backend: str, requests: int, users: int, posts: int) -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.backend_benchmark", "--backend", backend, "--json",
+         "--requests", str(requests), "--users", str(users), "--posts", str(posts)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(backend: str | None, requests: int, users: int, posts: int, as_json: bool) -> None:
+    if backend is not None:
+        results = asyncio.run(measure(backend, requests, users, posts))
+        if as_json:
+            print(json.dumps(results))
+            return
+        print(f"бэкенд {backend}, запросов на маршрут: {requests}")
+        for name, us in results.items():
+            print(f"{name:<16} {us:>10.1f} мкс {1e6 / us:>10.0f} запр/с")
+        return
+    measured = {name: run_isolated(name, requests, users, posts) for name in BACKENDS}
+    print(f"запросов на маршрут: {requests}, пользователей: {users}, постов: {posts}")
+    print(f"{'маршрут':<16} {'sqlalchemy, мкс':>16} {'memory, мкс':>12} {'доля БД':>9}")
+    for name, sql_us in measured["sqlalchemy"].items():
+        memory_us = measured["memory"][name]
+        print(f"{name:<16} {sql_us:>16.1f} {memory_us:>12.1f} {max(sql_us - memory_us, 0) / sql_us:>9.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=BACKENDS, help="измерить один бэкенд в этом процессе")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    args = parser.parse_args()
+    main(args.backend, args.requests, args.users, args.posts, args.json)
@@ -0,0 +1,98 @@
+"""Сравнение размера ответов и пропускной способности со сжатием и без.
+
+Рендерит index_auth.html и JSON-список постов на синтетических данных и
+прогоняет запросы в процессе (httpx + ASGITransport), без сети и БД.
+
+Запуск:
+    python -m benchmarks.compression_benchmark --posts 500 --requests 300
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.templating import Jinja2Templates
+
+from app.core.static_files import static_url
+from app.middleware.compression_middleware import CompressionMiddleware, brotli
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+
+class FakeUser:
+    username = "benchmark"
+    access_id = 3
+
+
+def make_posts(count: int) -> list[dict]:
+    return [{
+        "id": i,
+        "tittle": f"Заголовок поста номер {i}",
+        "description": f"Описание поста {i}. " * 8,
+        "required_access_id": i % 3 + 1,
+        "owner_id": i % 50 + 1,
+    } for i in range(1, count + 1)]
+
+
+def build_app(posts: list[dict], compressed: bool) -> FastAPI:
+    app = FastAPI()
+    templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+    templates.env.globals["static_url"] = static_url
+    templates.env.globals["flush"] = str
+
+    @app.get("/index")
+    async def index(request: Request):
+        return templates.TemplateResponse("index_auth.html", {"request": request, "user": FakeUser, "posts": posts,
+                                                                     "authors": {}})
+
+    @app.get("/posts")
+    async def posts_json():
+        return JSONResponse(posts)
+
+    if compressed:
+        app.add_middleware(CompressionMiddleware)
+    return app
+
+
+async def run(app: FastAPI, path: str, encoding: str, requests: int, concurrency: int) -> tuple[int, float]:
+    transport = httpx.ASGITransport(app=app)
+    wire_bytes = 0
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal wire_bytes
+            async with semaphore:
+                async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+                    async for chunk in response.aiter_raw():
+                        wire_bytes += len(chunk)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+    return wire_bytes // requests, requests / elapsed
+
+
+async def main(posts_count: int, requests: int, concurrency: int) -> None:
+    posts = make_posts(posts_count)
+    plain, compressed = build_app(posts, False), build_app(posts, True)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    print(f"{'путь':<8} {'кодировка':<10} {'байт/ответ':>12} {'запр/с':>10}")
+    for path in ("/index", "/posts"):
+        size, rps = await run(plain, path, "identity", requests, concurrency)
+        print(f"{path:<8} {'identity':<10} {size:>12} {rps:>10.1f}")
+        for encoding in encodings:
+            size_c, rps_c = await run(compressed, path, encoding, requests, concurrency)
+            print(f"{path:<8} {encoding:<10} {size_c:>12} {rps_c:>10.1f}  ({size / size_c:.1f}x меньше)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.posts, args.requests, args.concurrency))
@@ -0,0 +1,71 @@
+"""Стоимость SSE-подписчиков событий постов и рассылки им событий.
+
+Создаёт N подписчиков app.core.post_events (потоки ответа крутятся в задачах,
+как под StreamingResponse) на трёх уровнях доступа и измеряет:
+- память на простаивающего подписчика (tracemalloc, вместе с задачей и генератором);
+- время publish на одно событие при рассылке всем подписчикам;
+- отключение медленных клиентов: часть подписчиков не читает поток.
+
+Сетевая часть (сокет и буферы uvicorn) сюда не входит.
+
+Запуск:
+    python -m benchmarks.post_events_benchmark --subscribers 10000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app.core.post_events import PostEvents
+from app.repositories.read_models import PostRow
+
+
+async def consume(stream, stalled: asyncio.Event | None) -> None:
+    async for _ in stream:
+        if stalled is not None:
+            await stalled.wait()  # медленный клиент: после первого кадра перестаёт читать
+
+
+async def main(subscribers: int, events: int, slow_share: float, buffer_size: int) -> None:
+    hub = PostEvents(buffer_size=buffer_size, replay_size=1000, keepalive=15.0)
+    stalled = asyncio.Event()
+    slow = int(subscribers * slow_share)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(consume(hub.stream(i % 3 + 1), stalled if i < slow else None))
+             for i in range(subscribers)]
+    await asyncio.sleep(0.1)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    publish_total = 0.0
+    for i in range(1, events + 1):
+        post = PostRow(i, f"Пост {i}", "Описание поста", i % 3 + 1, 1)
+        started = time.perf_counter()
+        hub.publish("created", post)
+        publish_total += time.perf_counter() - started
+        await asyncio.sleep(0)  # быстрые подписчики забирают кадры
+    await asyncio.sleep(0.1)
+
+    stats = hub.stats()
+    print(f"подписчиков: {subscribers} (медленных {slow}), событий: {events}, буфер: {buffer_size} кадров")
+    print(f"память на простаивающего подписчика: {per_subscriber:.0f} байт")
+    print(f"publish: {publish_total / events * 1e6:.0f} мкс на событие, "
+          f"{publish_total / events / subscribers * 1e9:.0f} нс на подписчика")
+    print(f"доставлено кадров: {stats['delivered']}, отключено медленных: {stats['evicted']}, "
+          f"осталось подписчиков: {stats['subscribers']}")
+    stalled.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--slow-share", type=float, default=0.01)
+    parser.add_argument("--buffer-size", type=int, default=256)
+    args = parser.parse_args()
+    asyncio.run(main(args.subscribers, args.events, args.slow_share, args.buffer_size))
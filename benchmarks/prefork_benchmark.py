@@ -0,0 +1,161 @@
+"""Память на воркер и пропускная способность: текущий запуск против serve.py.
+
+Сравниваются три способа запуска на временной SQLite-базе:
+- uvicorn main:app - один процесс, как в start.sh до serve.py;
+- uvicorn main:app --workers N - каждый воркер сам импортирует приложение;
+- python -m serve --workers N - предзагрузка в мастере, fork и gc.freeze.
+
+Для каждого воркера берутся RSS и PSS из /proc/<pid>/smaps_rollup: PSS делит
+общие страницы между процессами, поэтому показывает, сколько памяти воркер
+реально добавляет. Нагрузку дают несколько процессов с httpx, лимит
+конкурентности приложения на время замера выключен.
+
+Запуск:
+    python -m benchmarks.prefork_benchmark --workers 4 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PATHS = ("/health", "/index")
+
+
+def prepare_env() -> dict[str, str]:
+    from sqlalchemy import create_engine
+
+    directory = Path(tempfile.mkdtemp())
+    db_path = directory / "prefork_benchmark.db"
+    env = dict(os.environ, DB_URL=f"sqlite+aiosqlite:///{db_path}", POST_SHARDS="{}",
+               CONCURRENCY_ENABLED="False", AUDIT_DIR=str(directory / "audit"))
+    os.environ.update(env)
+    from app.models import Base
+
+    # Таблицы создаются заранее, чтобы воркеры не создавали их одновременно при старте
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return env
+
+
+def commands(port: int, workers: int) -> dict[str, list[str]]:
+    uvicorn = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+               "--no-access-log"]
+    return {
+        "uvicorn": uvicorn,
+        f"uvicorn --workers {workers}": uvicorn + ["--workers", str(workers)],
+        f"serve --workers {workers}": [sys.executable, "-m", "serve", "--port", str(port), "--workers", str(workers),
+                                       "--max-requests", "0"],
+    }
+
+
+def children(pid: int) -> list[int]:
+    found = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            fields = (entry / "stat").read_text().rsplit(")", 1)[1].split()
+            cmdline = (entry / "cmdline").read_bytes()
+        except OSError:
+            continue
+        if int(fields[1]) == pid and b"resource_tracker" not in cmdline:
+            found.append(int(entry.name))
+    return found
+
+
+def memory_kb(pid: int) -> tuple[int, int]:
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        key, _, rest = line.partition(":")
+        if key in ("Rss", "Pss"):
+            values[key] = int(rest.split()[0])
+    return values["Rss"], values["Pss"]
+
+
+def wait_ready(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+def load(args: tuple[int, str, float, int]) -> tuple[int, int]:
+    port, path, duration, concurrency = args
+
+    async def run() -> tuple[int, int]:
+        ok = failed = 0
+        deadline = time.monotonic() + duration
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                     limits=httpx.Limits(max_connections=concurrency)) as client:
+            async def worker():
+                nonlocal ok, failed
+                while time.monotonic() < deadline:
+                    try:
+                        response = await client.get(path)
+                        ok, failed = (ok + 1, failed) if response.status_code == 200 else (ok, failed + 1)
+                    except httpx.HTTPError:
+                        failed += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return ok, failed
+
+    return asyncio.run(run())
+
+
+def measure(name: str, command: list[str], env: dict, port: int, duration: float, clients: int,
+            concurrency: int) -> None:
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        time.sleep(2)  # остальные воркеры заканчивают запуск
+        workers = children(process.pid) or [process.pid]
+        rates = {}
+        with multiprocessing.Pool(clients) as pool:
+            for path in PATHS:
+                results = pool.map(load, [(port, path, duration, concurrency)] * clients)
+                rates[path] = sum(ok for ok, _ in results) / duration
+        memory = [memory_kb(pid) for pid in workers]
+        rss = sum(value for value, _ in memory) / len(memory) / 1024
+        pss = sum(value for _, value in memory) / len(memory) / 1024
+        total_pss = sum(value for _, value in memory) / 1024
+        if workers != [process.pid]:
+            total_pss += memory_kb(process.pid)[1] / 1024
+        print(f"{name:<22} {len(workers):>7} {rss:>12.1f} {pss:>12.1f} {total_pss:>11.1f} "
+              + " ".join(f"{rates[path]:>12.0f}" for path in PATHS))
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+
+def main(workers: int, port: int, duration: float, clients: int, concurrency: int) -> None:
+    env = prepare_env()
+    print(f"ядер: {os.cpu_count()}, нагрузка: {clients} процессов x {concurrency} соединений, {duration:.0f} с")
+    print(f"{'запуск':<22} {'воркеры':>7} {'RSS/воркер':>12} {'PSS/воркер':>12} {'PSS всего':>11} "
+          + " ".join(f"{path + ', з/с':>12}" for path in PATHS))
+    for name, command in commands(port, workers).items():
+        measure(name, command, env, port, duration, clients, concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=2, help="процессов, создающих нагрузку")
+    parser.add_argument("--concurrency", type=int, default=32, help="соединений на процесс нагрузки")
+    args = parser.parse_args()
+    main(args.workers, args.port, args.duration, args.clients, args.concurrency)
@@ -0,0 +1,113 @@
+"""Списки постов и пользователей: экземпляры ORM против строк read_models.
+
+Заполняет временную SQLite-базу (по умолчанию 100 000 постов и столько же
+пользователей) и читает полные списки двумя способами:
+- select(Post) / select(User) с экземплярами ORM, как было раньше;
+- post_repository.get_all_posts / user_repository.get_users (явные колонки
+  в PostRow / UserRow).
+
+Для каждого способа выводятся строки в секунду для чтения и для чтения с
+преобразованием в схему ответа, а также память на строку (tracemalloc,
+отдельным прогоном, пока список и сессия живы) и размер строки в JSON-ответе.
+
+Запуск:
+    python -m benchmarks.read_model_benchmark --rows 100000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# База бенчмарка - всегда временная, чтобы не писать в рабочую БД
+_DB_PATH = Path(tempfile.mkdtemp()) / "read_model_benchmark.db"
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["POST_SHARDS"] = "{}"
+os.environ["REPOSITORY_BACKEND"] = "sqlalchemy"
+os.environ["SLOW_QUERY_THRESHOLD_MS"] = "1e9"  # полные списки заведомо дольше порога
+
+from sqlalchemy import select, insert  # noqa: E402
+
+from app.core.db_helper import db_helper  # noqa: E402
+from app.models import Base, Post, User  # noqa: E402
+from app.models.user import RoleEnum  # noqa: E402
+from app.repositories import post_repository, user_repository  # noqa: E402
+from app.schemas.post import PostRead  # noqa: E402
+from app.schemas.user import User as UserSchema  # noqa: E402
+
+
+async def seed(count: int) -> None:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{
+            "id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "$2b$12$" + "x" * 53,
+            "role": RoleEnum.base_user, "is_active": True, "access_id": 1,
+        } for i in range(1, count + 1)])
+        await conn.execute(insert(Post), [{
+            "id": i, "tittle": f"Заголовок поста {i}", "description": f"Описание поста {i}",
+            "required_access_id": i % 3 + 1, "owner_id": i,
+        } for i in range(1, count + 1)])
+
+
+async def orm_posts(session):
+    return (await session.execute(select(Post).order_by(Post.id))).scalars().all()
+
+
+async def orm_users(session):
+    return (await session.execute(select(User).where(User.is_active).order_by(User.id))).scalars().all()
+
+
+CASES = (
+    ("посты", "ORM", orm_posts, PostRead),
+    ("посты", "строки", post_repository.get_all_posts, PostRead),
+    ("пользователи", "ORM", orm_users, UserSchema),
+    ("пользователи", "строки", user_repository.get_users, UserSchema),
+)
+
+
+async def rows_per_second(read, schema, repeats: int, convert: bool) -> float:
+    best = 0.0
+    for _ in range(repeats):
+        async with db_helper.session_factory() as session:
+            started = time.perf_counter()
+            items = await read(session)
+            if convert:
+                [schema.model_validate(item) for item in items]
+            best = max(best, len(items) / (time.perf_counter() - started))
+    return best
+
+
+async def bytes_per_row(read) -> float:
+    async with db_helper.session_factory() as session:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        items = await read(session)
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return retained / len(items)
+
+
+async def main(rows: int, repeats: int) -> None:
+    await seed(rows)
+    print(f"строк: {rows}")
+    print(f"{'список':<13} {'способ':<7} {'строк/с':>10} {'+ схема, строк/с':>17} "
+          f"{'байт/строку':>12} {'JSON, байт':>11}")
+    for name, kind, read, schema in CASES:
+        plain = await rows_per_second(read, schema, repeats, convert=False)
+        converted = await rows_per_second(read, schema, repeats, convert=True)
+        size = await bytes_per_row(read)
+        async with db_helper.session_factory() as session:
+            sample = (await read(session))[:1000]
+        payload = sum(len(schema.model_validate(item).model_dump_json()) for item in sample) / len(sample)
+        print(f"{name:<13} {kind:<7} {plain:>10.0f} {converted:>17.0f} {size:>12.0f} {payload:>11.0f}")
+    await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeats))
@@ -0,0 +1,88 @@
+"""Нагрузочный тест объединения одинаковых чтений (single-flight).
+
+Заполняет временную SQLite-базу и выполняет конкурентные чтения постов через
+post_repository.get_post_by_id, где большая часть запросов приходится на
+несколько «горячих» постов. Считает SQL-запросы, реально отправленные в БД,
+с включённым и выключенным single-flight.
+
+Запуск:
+    python -m benchmarks.single_flight_benchmark --requests 5000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+# База бенчмарка - всегда временная, чтобы не писать в рабочую БД
+_DB_PATH = Path(tempfile.mkdtemp()) / "single_flight_benchmark.db"
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["POST_SHARDS"] = "{}"
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.core.db_helper import db_helper  # noqa: E402
+from app.core.single_flight import single_flight  # noqa: E402
+from app.models import Base, Post  # noqa: E402
+from app.repositories import post_repository  # noqa: E402
+
+ACCESS_LEVEL = 3
+
+
+async def seed(count: int) -> None:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Post), [{
+            "id": i, "tittle": f"Пост {i}", "description": "Описание", "required_access_id": 1, "owner_id": 1,
+        } for i in range(1, count + 1)])
+
+
+async def run(post_ids: list[int], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(post_id: int):
+        async with semaphore:
+            await post_repository.get_post_by_id(None, post_id, ACCESS_LEVEL)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(post_id) for post_id in post_ids))
+    return time.perf_counter() - started
+
+
+async def main(requests: int, concurrency: int, posts: int, hot_keys: int, hot_share: float) -> None:
+    await seed(posts)
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(db_helper.engine.sync_engine, "before_cursor_execute", count_statement)
+    rng = random.Random(42)
+    post_ids = [rng.randint(1, hot_keys) if rng.random() < hot_share else rng.randint(1, posts)
+                for _ in range(requests)]
+
+    print(f"запросов: {requests}, конкурентность: {concurrency}, "
+          f"{hot_share:.0%} запросов к {hot_keys} горячим постам из {posts}")
+    print(f"{'single-flight':<14} {'SQL-запросов':>13} {'запр/с':>10} {'объединено':>11}")
+    for enabled in (False, True):
+        single_flight.enabled = enabled
+        single_flight.reset()
+        statements = 0
+        elapsed = await run(post_ids, concurrency)
+        ratio = single_flight.stats["post"].as_dict()["ratio"] if enabled else 0.0
+        print(f"{'вкл' if enabled else 'выкл':<14} {statements:>13} {requests / elapsed:>10.1f} {ratio:>11.1%}")
+    await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--hot-keys", type=int, default=5)
+    parser.add_argument("--hot-share", type=float, default=0.9)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.posts, args.hot_keys, args.hot_share))
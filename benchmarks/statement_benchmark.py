@@ -0,0 +1,106 @@
+"""Накладные расходы Python на запрос: построение select() на каждый вызов
+против запросов из app.repositories.queries, построенных один раз.
+
+Для горячих запросов аутентификации и списков измеряются:
+- сборка выражения и вычисление ключа кеша компиляции SQLAlchemy;
+- полное выполнение через AsyncSession на временной SQLite-базе (сеть и
+  планировщик БД почти не влияют, разница - это работа Python).
+
+Запуск:
+    python -m benchmarks.statement_benchmark --iterations 5000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# База бенчмарка - всегда временная, чтобы не писать в рабочую БД
+_DB_PATH = Path(tempfile.mkdtemp()) / "statement_benchmark.db"
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["POST_SHARDS"] = "{}"
+
+from sqlalchemy import select, insert  # noqa: E402
+
+from app.core.db_helper import db_helper  # noqa: E402
+from app.models import Base, Post, User  # noqa: E402
+from app.models.user import RoleEnum  # noqa: E402
+from app.repositories import queries  # noqa: E402
+
+EMAIL = "user1@example.com"
+
+# (название, построение на каждый вызов как раньше, готовый запрос, параметры)
+CASES = (
+    ("user_by_email",
+     lambda: (select(User).where(User.email == EMAIL), None),
+     (queries.USER_BY_EMAIL, {"email": EMAIL})),
+    ("posts_by_owner",
+     lambda: (select(Post.id, Post.tittle, Post.description, Post.required_access_id, Post.owner_id)
+              .where(Post.owner_id == 1, Post.required_access_id <= 3).order_by(Post.id), None),
+     (queries.POSTS_BY_OWNER, {"owner_id": 1, "required_access": 3})),
+    ("active_users",
+     lambda: (select(User.id, User.username, User.email, User.role, User.is_active, User.access_id)
+              .where(User.is_active).order_by(User.id), None),
+     (queries.ACTIVE_USERS, None)),
+)
+
+
+async def seed() -> None:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{
+            "id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x",
+            "role": RoleEnum.base_user, "is_active": True, "access_id": 1,
+        } for i in range(1, 21)])
+        await conn.execute(insert(Post), [{
+            "id": i, "tittle": f"Пост {i}", "description": "Описание", "required_access_id": 1, "owner_id": 1,
+        } for i in range(1, 21)])
+
+
+def per_call_us(started: float, iterations: int) -> float:
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure_construct(build, prebuilt, iterations: int) -> tuple[float, float]:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        build()[0]._generate_cache_key()
+    before = per_call_us(started, iterations)
+    statement = prebuilt[0]
+    started = time.perf_counter()
+    for _ in range(iterations):
+        statement._generate_cache_key()
+    return before, per_call_us(started, iterations)
+
+
+async def measure_execute(build, prebuilt, iterations: int) -> tuple[float, float]:
+    results = []
+    async with db_helper.session_factory() as session:
+        for make in (build, lambda: prebuilt):
+            for _ in range(200):  # прогрев кеша компиляции
+                (await session.execute(*make())).all()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                (await session.execute(*make())).all()
+            results.append(per_call_us(started, iterations))
+    return results[0], results[1]
+
+
+async def main(iterations: int) -> None:
+    await seed()
+    print(f"{'запрос':<16} {'сборка, мкс':>22} {'выполнение, мкс':>24}")
+    print(f"{'':<16} {'до':>10} {'после':>11} {'до':>11} {'после':>12}")
+    for name, build, prebuilt in CASES:
+        construct_before, construct_after = measure_construct(build, prebuilt, iterations)
+        execute_before, execute_after = await measure_execute(build, prebuilt, iterations)
+        print(f"{name:<16} {construct_before:>10.1f} {construct_after:>11.1f} "
+              f"{execute_before:>11.1f} {execute_after:>12.1f}")
+    await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,135 @@
+"""Сравнение обычного и потокового рендера страницы /my_posts.
+
+Заполняет временную SQLite-базу постами одного владельца и рендерит
+my_posts.html двумя способами: TemplateResponse по готовому списку постов и
+StreamingTemplates по потоку строк из БД. Для каждого способа измеряются
+время до первого байта (TTFB), полное время ответа и пиковая память
+(tracemalloc, отдельным прогоном, чтобы не искажать время).
+
+Запуск:
+    python -m benchmarks.streaming_benchmark --posts 10000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# База бенчмарка - всегда временная, чтобы не писать в рабочую БД
+_DB_PATH = Path(tempfile.mkdtemp()) / "streaming_benchmark.db"
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["POST_SHARDS"] = "{}"
+
+from fastapi.templating import Jinja2Templates  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from app.core.db_helper import db_helper  # noqa: E402
+from app.core.static_files import static_url  # noqa: E402
+from app.core.streaming_templates import StreamingTemplates  # noqa: E402
+from app.models import Base, Post  # noqa: E402
+from app.repositories import post_repository  # noqa: E402
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+OWNER_ID = 1
+
+
+class FakeUser:
+    id = OWNER_ID
+    username = "benchmark"
+    access_id = 3
+
+
+async def seed(count: int) -> None:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Post), [{
+            "id": i,
+            "tittle": f"Заголовок поста номер {i}",
+            "description": f"Описание поста {i}. " * 8,
+            "required_access_id": i % 3 + 1,
+            "owner_id": OWNER_ID,
+        } for i in range(1, count + 1)])
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/my_posts", "headers": [], "query_string": b""})
+
+
+async def send_response(response, started: float) -> tuple[float, float, int]:
+    first_byte = None
+    size = 0
+    never = asyncio.Event()
+
+    async def receive():
+        await never.wait()
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message["type"] == "http.response.body":
+            if first_byte is None:
+                first_byte = time.perf_counter()
+            size += len(message.get("body", b""))
+
+    await response(make_request().scope, receive, send)
+    return first_byte - started, time.perf_counter() - started, size
+
+
+async def buffered(templates: Jinja2Templates, count: int):
+    started = time.perf_counter()
+    async with db_helper.session_factory() as session:
+        posts = await post_repository.get_posts(session, OWNER_ID, FakeUser.access_id)
+    response = templates.TemplateResponse("my_posts.html", {
+        "request": make_request(), "user": FakeUser, "posts": posts, "posts_count": count})
+    return await send_response(response, started)
+
+
+async def streaming(templates: StreamingTemplates, count: int, batch_size: int):
+    started = time.perf_counter()
+    posts = post_repository.stream_posts(OWNER_ID, FakeUser.access_id, batch_size=batch_size)
+    response = templates.TemplateResponse(make_request(), "my_posts.html", {
+        "user": FakeUser, "posts": posts, "posts_count": count})
+    return await send_response(response, started)
+
+
+async def measure(run, repeats: int) -> tuple[float, float, int, int]:
+    ttfbs, totals = [], []
+    size = 0
+    for _ in range(repeats):
+        ttfb, total, size = await run()
+        ttfbs.append(ttfb)
+        totals.append(total)
+    tracemalloc.start()
+    await run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(ttfbs), statistics.median(totals), size, peak
+
+
+async def main(count: int, repeats: int, batch_size: int, chunk_size: int) -> None:
+    await seed(count)
+    templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+    templates.env.globals["static_url"] = static_url
+    templates.env.globals["flush"] = str
+    streaming_templates = StreamingTemplates(directory=str(TEMPLATES_DIR), chunk_size=chunk_size)
+
+    print(f"постов: {count}")
+    print(f"{'рендер':<10} {'TTFB, мс':>10} {'всего, мс':>10} {'байт':>10} {'пик памяти, КБ':>15}")
+    for name, run in (("обычный", lambda: buffered(templates, count)),
+                      ("потоковый", lambda: streaming(streaming_templates, count, batch_size))):
+        ttfb, total, size, peak = await measure(run, repeats)
+        print(f"{name:<10} {ttfb * 1000:>10.1f} {total * 1000:>10.1f} {size:>10} {peak // 1024:>15}")
+    await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    args = parser.parse_args()
+    asyncio.run(main(args.posts, args.repeats, args.batch_size, args.chunk_size))
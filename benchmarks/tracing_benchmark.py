@@ -0,0 +1,143 @@
+"""Стоимость трассировки для выбранных и невыбранных запросов.
+
+Две части:
+- точки трассировки без выбранного запроса: вызов функции под @traced
+  против той же функции без декоратора и пустой with span(...);
+- запросы к API через ASGI (без сети, временная SQLite-база) с долей выборки
+  TRACING_SAMPLE_RATE 0, 0.01 и 1. Доля выбирается при импорте приложения,
+  поэтому каждая измеряется в отдельном процессе.
+
+Ключи JWT берутся из настроек (.env).
+
+Запуск:
+    python -m benchmarks.tracing_benchmark --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+SAMPLE_RATES = (0.0, 0.01, 1.0)
+EMAIL = "user1@example.com"
+
+
+def configure(sample_rate: float) -> None:
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp()) / 'tracing_benchmark.db'}"
+    os.environ["POST_SHARDS"] = "{}"
+    os.environ["REPOSITORY_BACKEND"] = "sqlalchemy"
+    os.environ["CONCURRENCY_ENABLED"] = "False"
+    os.environ["AUDIT_ENABLED"] = "False"
+    os.environ["TRACING_SAMPLE_RATE"] = str(sample_rate)
+    os.environ["TRACING_EXPORTER"] = "memory"
+
+
+async def overhead(calls: int) -> dict[str, float]:
+    """Нс на вызов точки трассировки вне выбранного запроса."""
+    from app.core.tracing import span, traced
+
+    async def plain():
+        return None
+
+    wrapped = traced(plain)
+
+    async def loop(fn) -> float:
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            await fn()
+        return (time.perf_counter_ns() - started) / calls
+
+    async def with_span():
+        with span("benchmark"):
+            return None
+
+    base = await loop(plain)
+    return {"@traced": await loop(wrapped) - base, "with span()": await loop(with_span) - base}
+
+
+async def seed(users: int, posts: int) -> None:
+    from sqlalchemy import insert
+
+    from app.core.db_helper import db_helper
+    from app.models import Base, Post, User
+    from app.models.user import RoleEnum
+
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [{
+            "username": f"user{i}", "email": f"user{i}@example.com", "password": "x",
+            "role": RoleEnum.base_user, "is_active": True, "access_id": 3} for i in range(1, users + 1)])
+        await conn.execute(insert(Post), [{
+            "tittle": f"Пост {i}", "description": "Описание поста. " * 4,
+            "required_access_id": i % 3 + 1, "owner_id": (i - 1) % users + 1} for i in range(1, posts + 1)])
+
+
+async def measure(sample_rate: float, requests: int, users: int, posts: int) -> dict[str, float]:
+    configure(sample_rate)
+    import httpx
+
+    from app.auth.service.jwt_service import create_access_token
+    from app.core.db_helper import db_helper
+    from main import app
+
+    await seed(users, posts)
+    token = create_access_token({"sub": EMAIL})
+    headers = {"Authorization": f"Bearer {token}"}
+    cases = (
+        ("GET /health", "/health", {}, {}),
+        ("GET /post/{id}", "/post/1", headers, {}),
+        ("GET /post/feed", "/post/feed", headers, {}),
+        ("GET /index", "/index", {}, {"access_token": token}),
+    )
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for name, path, case_headers, cookies in cases:
+            client.cookies = cookies
+            for _ in range(50):
+                (await client.get(path, headers=case_headers)).raise_for_status()
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get(path, headers=case_headers)
+            results[name] = (time.perf_counter() - started) / requests * 1e6
+    await db_helper.engine.dispose()
+    return results
+
+
+def run_isolated(sample_rate: float, requests: int, users: int, posts: int) -> dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.tracing_benchmark", "--sample-rate", str(sample_rate), "--json",
+         "--requests", str(requests), "--users", str(users), "--posts", str(posts)],
+        check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(sample_rate: float | None, requests: int, users: int, posts: int, as_json: bool) -> None:
+    if sample_rate is not None:
+        results = asyncio.run(measure(sample_rate, requests, users, posts))
+        print(json.dumps(results) if as_json else results)
+        return
+    configure(0.0)
+    print("вне выбранного запроса, нс на вызов:")
+    for name, ns in asyncio.run(overhead(200_000)).items():
+        print(f"  {name:<14} {ns:>8.0f}")
+    measured = {rate: run_isolated(rate, requests, users, posts) for rate in SAMPLE_RATES}
+    print(f"запросов на маршрут: {requests}, мкс на запрос при доле выборки:")
+    print(f"{'маршрут':<16} " + " ".join(f"{rate:>10g}" for rate in SAMPLE_RATES))
+    for name in measured[SAMPLE_RATES[0]]:
+        print(f"{name:<16} " + " ".join(f"{measured[rate][name]:>10.1f}" for rate in SAMPLE_RATES))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample-rate", type=float, help="измерить одну долю выборки в этом процессе")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    args = parser.parse_args()
+    main(args.sample_rate, args.requests, args.users, args.posts, args.json)
@@ -2,42 +2,110 @@ from pathlib import Path
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 from starlette.responses import HTMLResponse
 
 from app.core.config import settings
 from app.core.db_helper import DataBaseHelper
+from app.core.static_files import HashedStaticFiles, static_url
+from app.core.sharding import shard_router
+from app.core.audit import audit_log
+from app.core.concurrency import concurrency_limits
+from app.core.deadlines import deadlines
+from app.core.traffic_capture import traffic_capture
+from app.core.tracing import tracer, TracedTemplate
 from app.models import Base
+from app.repositories import audit_repository, queries
+from app.repositories.memory_backend import memory_backend
 from app.auth.controller.jwt_controller import router as auth_router
 from app.controllers.user_controller import router as user_router
 from app.controllers.post_controller import router as post_router
 from app.controllers.web_controller import router as web_router
+from app.controllers.stats_controller import router as stats_router
+from app.controllers.admin_controller import router as admin_router
+from app.middleware.profiling_middleware import ProfilingMiddleware
+from app.middleware.compression_middleware import CompressionMiddleware
+from app.middleware.concurrency_middleware import ConcurrencyLimitMiddleware
+from app.middleware.deadline_middleware import DeadlineMiddleware
+from app.middleware.capture_middleware import TrafficCaptureMiddleware
+from app.middleware.tracing_middleware import TracingMiddleware
 
 db_helper = DataBaseHelper(
     url=settings.db_url,
     echo=settings.db_echo
 )
 
+if settings.statement_warmup_enabled:
+    queries.install_warmups()
+
 app = FastAPI(title="FastAPI V1")
+app.add_middleware(ProfilingMiddleware,
+                   sample_rate=settings.profiling_sample_rate,
+                   header=settings.profiling_header,
+                   interval_ms=settings.profiling_interval_ms,
+                   directory=settings.profiling_dir)
+app.add_middleware(CompressionMiddleware,
+                   minimum_size=settings.compression_minimum_size,
+                   gzip_level=settings.compression_gzip_level,
+                   brotli_quality=settings.compression_brotli_quality)
+if settings.concurrency_enabled:
+    # Внешний слой: лишние запросы отбрасываются до сжатия и до обращения к БД
+    app.add_middleware(ConcurrencyLimitMiddleware,
+                       limits=concurrency_limits,
+                       routes=app.router.routes,
+                       exempt_paths=settings.concurrency_exempt_paths,
+                       exempt_routes=settings.concurrency_exempt_routes,
+                       retry_after=settings.concurrency_retry_after)
+if settings.deadline_enabled:
+    # Снаружи лимита конкурентности: ожидание в очереди входит в срок запроса
+    app.add_middleware(DeadlineMiddleware,
+                       deadlines=deadlines,
+                       routes=app.router.routes,
+                       exempt_paths=settings.deadline_exempt_paths)
+if settings.capture_enabled:
+    # Снаружи дедлайнов: в запись попадают и ответы 504
+    app.add_middleware(TrafficCaptureMiddleware,
+                       capture=traffic_capture,
+                       exempt_paths=settings.capture_exempt_paths)
+# Самый внешний слой: в трассу попадает и ожидание в очереди лимита конкурентности
+app.add_middleware(TracingMiddleware, tracer=tracer)
 app.include_router(router=auth_router, prefix="/auth")
 app.include_router(router=user_router, prefix="/user")
 app.include_router(router=post_router, prefix="/post")
+app.include_router(router=stats_router, prefix="/stats")
+app.include_router(router=admin_router, prefix="/admin")
 app.include_router(router=web_router)
 
 BASE_DIR = Path(__file__).parent
 STATIC_DIR = BASE_DIR / "static"
 TEMPLATES_DIR = BASE_DIR / "templates"
 
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+app.mount("/static", HashedStaticFiles(directory=STATIC_DIR), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+templates.env.template_class = TracedTemplate
+templates.env.globals["static_url"] = static_url
 
 
 @app.on_event("startup")
 async def on_startup():
-    async with db_helper.engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if memory_backend is None:
+        async with db_helper.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        if shard_router is not None:
+            await shard_router.create_all()
+    if settings.audit_enabled:
+        if settings.audit_db_enabled:
+            audit_log.loader = audit_repository.load_batch
+        await audit_log.start()
+    if settings.capture_enabled:
+        await traffic_capture.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await audit_log.stop()
+    await traffic_capture.stop()
 
 
 @app.exception_handler(SQLAlchemyError)
@@ -50,6 +118,11 @@ async def global_exception_handler(request, exc: Exception):
     return JSONResponse(status_code=500, content="Внутренняя ошибка сервера")
 
 
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
@@ -0,0 +1,199 @@
+"""Перенос неактивных пользователей и их постов в архив (users_archive, posts_archive).
+
+Команды:
+    python -m scripts.archive_users run [--days 180] [--batch-size 500]
+        переносит пользователей, выключенных дольше --days дней (ARCHIVE_AFTER_DAYS);
+        до и после переноса выводит размеры таблиц и время горячих запросов
+    python -m scripts.archive_users restore --user 42
+        возвращает пользователя и его посты из архива
+    python -m scripts.archive_users report
+        размеры горячих и архивных таблиц и время горячих запросов
+
+Перенос идёт короткими транзакциями по --batch-size строк с паузой
+ARCHIVE_BATCH_PAUSE между ними: сначала пользователи копируются в архив,
+затем таблица постов просматривается по id и посты этих пользователей
+переносятся, затем пользователи удаляются из users. Прерванный запуск
+продолжается повторным запуском той же команды. Пользователей, включённых
+во время переноса, команда сразу восстанавливает.
+
+Приложение читает архив при промахе горячих таблиц (ARCHIVE_FALLBACK_ENABLED)
+и восстанавливает архивного пользователя при любом изменении его данных.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.models import ArchivedPost, ArchivedUser, Post, User
+from app.repositories import archive_repository
+from app.repositories.queries import ACTIVE_USERS, FEED_PAGE, POSTS_BY_OWNER, USER_BY_EMAIL
+
+# Сколько пользователей и повторов берётся для замера горячих запросов
+PROBE_USERS = 20
+PROBE_REPEAT = 5
+
+
+async def _table_bytes(session: AsyncSession, table: str) -> int | None:
+    """Размер таблицы вместе с индексами; None, если БД его не сообщает.
+
+    PostgreSQL сообщает размер файлов: место удалённых строк переиспользуется
+    новыми, а файлы уменьшает только VACUUM FULL. Для SQLite считаются занятые
+    байты страниц (dbstat), без свободного места внутри страниц.
+    """
+    if session.bind.dialect.name == "postgresql":
+        return (await session.execute(text("SELECT pg_total_relation_size(:table)"), {"table": table})).scalar()
+    try:
+        return (await session.execute(text(
+            "SELECT sum(d.pgsize - d.unused) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+            "WHERE m.tbl_name = :table"), {"table": table})).scalar() or 0
+    except Exception:
+        # SQLite собран без dbstat
+        return None
+
+
+async def _measure(session: AsyncSession, model) -> tuple[int, int | None]:
+    rows = (await session.execute(select(func.count()).select_from(model))).scalar()
+    return rows, await _table_bytes(session, model.__tablename__)
+
+
+def _add(total: tuple[int, int | None], part: tuple[int, int | None]) -> tuple[int, int | None]:
+    return total[0] + part[0], None if total[1] is None or part[1] is None else total[1] + part[1]
+
+
+async def sizes() -> dict[str, tuple[int, int | None]]:
+    async with db_helper.session_factory() as session:
+        result = {
+            "users": await _measure(session, User),
+            "users_archive": await _measure(session, ArchivedUser),
+            "posts_archive": await _measure(session, ArchivedPost),
+        }
+        posts = (0, 0)
+        if shard_router is None:
+            posts = await _measure(session, Post)
+    if shard_router is not None:
+        for shard in shard_router.shards.values():
+            async with shard.session_factory() as shard_session:
+                posts = _add(posts, await _measure(shard_session, Post))
+    result["posts"] = posts
+    return result
+
+
+async def probe_sample() -> list[tuple[int, str, int]]:
+    """Активные пользователи для замера: (id, email, уровень доступа)."""
+    async with db_helper.session_factory() as session:
+        top = (await session.execute(select(func.max(User.id)))).scalar() or 0
+        ids = random.Random(0).sample(range(1, top + 1), min(top, PROBE_USERS * 5))
+        rows = (await session.execute(select(User.id, User.email, User.access_id)
+                                      .where(User.id.in_(ids), User.is_active.is_(True)))).all()
+    return [tuple(row) for row in rows[:PROBE_USERS]]
+
+
+async def _timed(session: AsyncSession, statement, params: dict) -> float:
+    started = time.perf_counter()
+    (await session.execute(statement, params)).all()
+    return (time.perf_counter() - started) * 1000
+
+
+async def probe(sample: list[tuple[int, str, int]]) -> dict[str, float]:
+    """Медиана времени горячих запросов приложения, мс."""
+    timings: dict[str, list[float]] = {"USER_BY_EMAIL": [], "POSTS_BY_OWNER": [], "FEED_PAGE": [], "ACTIVE_USERS": []}
+    async with db_helper.session_factory() as session:
+        for _ in range(PROBE_REPEAT):
+            for user_id, email, access_id in sample:
+                timings["USER_BY_EMAIL"].append(await _timed(session, USER_BY_EMAIL, {"email": email}))
+                if shard_router is None:
+                    timings["POSTS_BY_OWNER"].append(await _timed(
+                        session, POSTS_BY_OWNER, {"owner_id": user_id, "required_access": access_id}))
+            timings["FEED_PAGE"].append(await _timed(session, FEED_PAGE, {"level": 3, "limit": settings.feed_page_size}))
+            timings["ACTIVE_USERS"].append(await _timed(session, ACTIVE_USERS, {}))
+    if shard_router is not None:
+        for _ in range(PROBE_REPEAT):
+            for user_id, email, access_id in sample:
+                async with shard_router.session(user_id) as shard_session:
+                    timings["POSTS_BY_OWNER"].append(await _timed(
+                        shard_session, POSTS_BY_OWNER, {"owner_id": user_id, "required_access": access_id}))
+    return {name: statistics.median(values) for name, values in timings.items() if values}
+
+
+def _format_bytes(size: int | None) -> str:
+    return "-" if size is None else f"{size / 1024 ** 2:.1f} МБ"
+
+
+def print_sizes(current: dict, before: dict | None = None) -> None:
+    print(f"{'таблица':<14} {'строк':>10} {'размер':>10}" + (f" {'было строк':>11} {'было':>10}" if before else ""))
+    for table in ("users", "posts", "users_archive", "posts_archive"):
+        rows, size = current[table]
+        line = f"{table:<14} {rows:>10} {_format_bytes(size):>10}"
+        if before:
+            line += f" {before[table][0]:>11} {_format_bytes(before[table][1]):>10}"
+        print(line)
+
+
+def print_probe(current: dict, before: dict | None = None) -> None:
+    print(f"{'запрос':<15} {'p50, мс':>9}" + (f" {'было':>9} {'Δ':>6}" if before else ""))
+    for name, value in current.items():
+        line = f"{name:<15} {value:>9.2f}"
+        if before and before.get(name):
+            line += f" {before[name]:>9.2f} {(value - before[name]) / before[name] * 100:>+5.0f}%"
+        print(line)
+
+
+async def run(days: int, batch_size: int, pause: float) -> None:
+    sample = await probe_sample()
+    sizes_before, probe_before = await sizes(), await probe(sample)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    started = time.perf_counter()
+    copied = await archive_repository.copy_users(cutoff, batch_size, pause)
+    pending = await archive_repository.pending_users()
+    print(f"скопировано пользователей: {copied}, к переносу: {len(pending)}")
+    moved = await archive_repository.archive_posts(pending, batch_size, pause) if pending else 0
+    removed, restored = await archive_repository.remove_users(pending, batch_size, pause) if pending else (0, 0)
+    print(f"перенесено постов: {moved}, пользователей: {removed}, восстановлено включённых: {restored} "
+          f"за {time.perf_counter() - started:.1f} с")
+    print_sizes(await sizes(), sizes_before)
+    print_probe(await probe(sample), probe_before)
+
+
+async def restore(user_id: int, batch_size: int) -> None:
+    posts = await archive_repository.restore_user(user_id, batch_size)
+    print(f"Пользователь {user_id} восстановлен, постов: {posts}")
+
+
+async def report() -> None:
+    print_sizes(await sizes())
+    print_probe(await probe(await probe_sample()))
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "run":
+            await run(args.days, args.batch_size, settings.archive_batch_pause)
+        elif args.command == "restore":
+            await restore(args.user, args.batch_size)
+        elif args.command == "report":
+            await report()
+    finally:
+        if shard_router is not None:
+            await shard_router.dispose()
+        await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("run", "restore", "report"))
+    parser.add_argument("--days", type=int, default=settings.archive_after_days,
+                        help="переносить пользователей, выключенных дольше стольких дней")
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size, help="строк в одной транзакции")
+    parser.add_argument("--user", type=int, help="id пользователя для restore")
+    args = parser.parse_args()
+    if args.command == "restore" and args.user is None:
+        parser.error("restore требует --user")
+    asyncio.run(main(args))
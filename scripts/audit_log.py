@@ -0,0 +1,69 @@
+"""Чтение журнала аудита за интервал времени.
+
+Запуск:
+    python -m scripts.audit_log --since 2h
+    python -m scripts.audit_log --since 2026-10-19T10:00 --until 2026-10-19T12:00 --action delete
+    python -m scripts.audit_log --since 1d --actor 42 --json
+
+--since/--until принимают дату ISO 8601 или относительное время: 30s, 15m, 2h, 7d.
+Сегменты вне интервала не открываются, у остальных JSON разбирается только
+для строк, подходящих по времени.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime
+
+from app.core.audit import read
+from app.core.config import settings
+
+RELATIVE = re.compile(r"^(\d+)([smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(value: str | None) -> float | None:
+    if value is None:
+        return None
+    relative = RELATIVE.match(value)
+    if relative:
+        return time.time() - int(relative.group(1)) * UNITS[relative.group(2)]
+    return datetime.fromisoformat(value).timestamp()
+
+
+def matches(record: dict, args: argparse.Namespace) -> bool:
+    return ((args.actor is None or record["actor_id"] == args.actor)
+            and (args.action is None or record["action"] == args.action)
+            and (args.entity is None or record["entity"] == args.entity)
+            and (args.entity_id is None or record["entity_id"] == args.entity_id))
+
+
+def main(args: argparse.Namespace) -> int:
+    found = 0
+    for record in read(args.dir, parse_time(args.since), parse_time(args.until)):
+        if not matches(record, args):
+            continue
+        found += 1
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+        else:
+            ts = datetime.fromtimestamp(record["ts"]).isoformat(sep=" ", timespec="milliseconds")
+            changes = json.dumps(record["changes"], ensure_ascii=False) if record.get("changes") else ""
+            print(f"{ts} actor={record['actor_id']} {record['action']} "
+                  f"{record['entity']}#{record['entity_id']} {changes}".rstrip())
+    print(f"Записей: {found}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since")
+    parser.add_argument("--until")
+    parser.add_argument("--actor", type=int)
+    parser.add_argument("--action")
+    parser.add_argument("--entity")
+    parser.add_argument("--entity-id", type=int)
+    parser.add_argument("--dir", default=settings.audit_dir)
+    parser.add_argument("--json", action="store_true", help="вывод в JSON Lines")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+"""Сборка статических файлов для отдачи с неизменяемым кешем.
+
+Для каждого файла из static/ (кроме static/dist) создаёт в static/dist копию
+с хешем содержимого в имени, рядом - сжатые копии .gz и .br (если установлен
+brotli), и записывает static/dist/manifest.json вида {"style.css": "style.3f2a9c1b0d.css"}.
+
+Запуск:
+    python -m scripts.build_static
+"""
+import gzip
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Пути совпадают с app/core/static_files.py. Модули app здесь не импортируются,
+# чтобы сборка работала без .env (например, на этапе docker build).
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+DIST_DIR = STATIC_DIR / "dist"
+MANIFEST_PATH = DIST_DIR / "manifest.json"
+
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".html", ".svg", ".json", ".txt", ".map", ".xml"}
+
+
+def build() -> dict[str, str]:
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True)
+    manifest = {}
+    for source in sorted(STATIC_DIR.rglob("*")):
+        if not source.is_file() or DIST_DIR in source.parents:
+            continue
+        data = source.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        relative = source.relative_to(STATIC_DIR)
+        hashed = relative.with_name(f"{source.stem}.{digest}{source.suffix}")
+        target = DIST_DIR / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        if source.suffix in COMPRESSIBLE_SUFFIXES:
+            target.with_name(target.name + ".gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                target.with_name(target.name + ".br").write_bytes(brotli.compress(data, quality=11))
+        manifest[relative.as_posix()] = hashed.as_posix()
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    return manifest
+
+
+if __name__ == "__main__":
+    result = build()
+    for name, hashed in result.items():
+        print(f"{name} -> dist/{hashed}")
+    if brotli is None:
+        print("brotli не установлен: .br копии не созданы", file=sys.stderr)
@@ -0,0 +1,51 @@
+"""Подбор стоимости bcrypt под бюджет времени хеширования на этой машине.
+
+Запуск:
+    python -m scripts.calibrate_password_hashing                   # бюджет из PASSWORD_HASH_BUDGET_MS
+    python -m scripts.calibrate_password_hashing --budget-ms 150
+    python -m scripts.calibrate_password_hashing --write           # записать результат в .env
+
+Запускайте на том типе машины, где работает приложение. После смены
+PASSWORD_BCRYPT_ROUNDS пароли перехешируются при следующем входе пользователя.
+"""
+import argparse
+import re
+
+from app.auth.service.password_hashing import calibrate
+from app.core.config import settings, BASE_DIR
+
+ENV_PATH = BASE_DIR / ".env"
+ENV_KEY = "PASSWORD_BCRYPT_ROUNDS"
+
+
+def write_env(rounds: int) -> None:
+    text = ENV_PATH.read_text(encoding="utf-8") if ENV_PATH.exists() else ""
+    line = f"{ENV_KEY}={rounds}"
+    pattern = re.compile(rf"^{ENV_KEY}=.*$", re.MULTILINE)
+    if pattern.search(text):
+        text = pattern.sub(line, text)
+    else:
+        text = text + ("" if not text or text.endswith("\n") else "\n") + line + "\n"
+    ENV_PATH.write_text(text, encoding="utf-8")
+
+
+def main(budget_ms: float, samples: int, write: bool) -> None:
+    rounds, timings = calibrate(budget_ms, samples)
+    for cost, elapsed in timings.items():
+        mark = " <-" if cost == rounds else ""
+        print(f"стоимость {cost}: {elapsed:.1f} мс{mark}")
+    print(f"Бюджет {budget_ms:.0f} мс, текущая стоимость {settings.password_bcrypt_rounds}, подобрана {rounds}")
+    if write:
+        write_env(rounds)
+        print(f"{ENV_KEY}={rounds} записано в {ENV_PATH}")
+    else:
+        print(f"{ENV_KEY}={rounds}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=settings.password_hash_budget_ms)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--write", action="store_true", help=f"записать {ENV_KEY} в .env")
+    args = parser.parse_args()
+    main(args.budget_ms, args.samples, args.write)
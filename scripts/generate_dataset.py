@@ -0,0 +1,298 @@
+"""Генерация синтетических данных в масштабе production: users, posts, entry_accesses.
+
+Запуск:
+    python -m scripts.generate_dataset --users 1000000 --posts 10000000
+    python -m scripts.generate_dataset --users 1000000 --posts 10000000 --seed 7 --batch-size 100000
+
+Запускайте на пустой базе (таблицы создаются, если их нет). Данные полностью
+определяются --seed и размерами: пачка N строится своим генератором случайных
+чисел, поэтому прерванный запуск продолжается с первой незаписанной пачки
+(каждая пачка пишется одной транзакцией вместе со счётчиками), а повторный
+запуск с теми же параметрами ничего не меняет.
+
+Распределения:
+- роли: 90% пользователей, 7% ВИП, 2.5% модераторов, 0.5% администраторов;
+  уровень доступа зависит от роли, 3% пользователей удалены (is_active=False)
+  в течение двух лет до 2026-01-01 (deactivated_at);
+- авторы постов по закону Ципфа (--skew): немногие пишут тысячи постов,
+  большинство - единицы или ничего;
+- уровень доступа постов: 60% - 1, 25% - 2, 15% - 3.
+
+Пароль пользователя user<k>@<domain> - dataset-<k % --passwords>: bcrypt
+считается один раз на пароль, хеши переиспользуются.
+
+Запись идёт самым быстрым путём драйвера: COPY для PostgreSQL (asyncpg),
+executemany подготовленного INSERT для SQLite. Посты пишутся в основную БД;
+при включённом шардировании перенесите их командой python -m scripts.reshard import-main.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import sys
+import time
+from bisect import bisect
+from collections import Counter as Tally
+from datetime import datetime, timedelta
+
+from passlib.hash import bcrypt
+from sqlalchemy import select, insert, func, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.models import Base, EntryAccess, Post, User
+from app.models.access import AccessRoleEnum
+from app.models.counter import CounterScopeEnum
+from app.models.user import RoleEnum
+from app.repositories.counter_repository import FEED_VERSION_KEY
+
+USER_COLUMNS = ("id", "username", "email", "password", "role", "is_active", "access_id", "deactivated_at")
+POST_COLUMNS = ("id", "tittle", "description", "owner_id", "required_access_id")
+COUNTER_COLUMNS = ("scope", "key", "value")
+
+ACCESS_LEVELS = (
+    (1, AccessRoleEnum.default_role, "Стандартный доступ"),
+    (2, AccessRoleEnum.premium_role, "Премиум-доступ"),
+    (3, AccessRoleEnum.vip_role, "ВИП-доступ"),
+)
+ROLES = (RoleEnum.base_user, RoleEnum.premium_user, RoleEnum.moderator, RoleEnum.admin)
+ROLE_WEIGHTS = tuple(itertools.accumulate((0.9, 0.07, 0.025, 0.005)))
+# Уровень доступа пользователя в зависимости от роли: накопленные веса уровней 1, 2, 3
+ROLE_ACCESS = {
+    RoleEnum.base_user: tuple(itertools.accumulate((0.7, 0.2, 0.1))),
+    RoleEnum.premium_user: tuple(itertools.accumulate((0.0, 0.2, 0.8))),
+    RoleEnum.moderator: tuple(itertools.accumulate((0.0, 0.0, 1.0))),
+    RoleEnum.admin: tuple(itertools.accumulate((0.0, 0.0, 1.0))),
+}
+POST_ACCESS_WEIGHTS = tuple(itertools.accumulate((0.6, 0.25, 0.15)))
+INACTIVE_SHARE = 0.03
+# Удалённые пользователи выключены в случайный момент за INACTIVE_DAYS дней до DATASET_EPOCH
+DATASET_EPOCH = datetime(2026, 1, 1)
+INACTIVE_DAYS = 730
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+NAMES = ("alex", "maria", "ivan", "olga", "dmitry", "anna", "sergey", "elena", "pavel", "natalia", "igor",
+         "tatiana", "nikita", "daria", "roman", "irina", "artem", "polina", "maxim", "sofia")
+WORDS = ("новости", "проект", "обзор", "заметка", "релиз", "отчёт", "идея", "вопрос", "итоги", "планы",
+         "команда", "продукт", "данные", "сервис", "запуск", "опыт", "задача", "решение", "архитектура",
+         "производительность", "база", "запрос", "кеш", "очередь", "нагрузка", "метрики", "пользователи",
+         "доступ", "безопасность", "тесты", "сборка", "деплой", "ошибка", "исправление", "версия", "неделя",
+         "месяц", "год", "быстро", "просто", "подробно", "кратко", "важно", "новый", "старый", "большой",
+         "маленький", "первый", "последний", "лучший", "и", "в", "на", "для", "с", "по", "о", "как", "что")
+
+
+def _batch_rng(seed: int, table: str, batch: int) -> random.Random:
+    # Строковое зерно хешируется sha512 - одинаково в любом процессе, в отличие от hash()
+    return random.Random(f"{seed}:{table}:{batch}")
+
+
+def password_hashes(seed: int, count: int) -> list[str]:
+    """bcrypt паролей dataset-<i> со стоимостью из настроек. Соль выводится из seed,
+    поэтому хеши, как и остальные данные, повторяются от запуска к запуску."""
+    rng = random.Random(f"{seed}:passwords")
+    hasher = bcrypt.using(rounds=settings.password_bcrypt_rounds)
+    # Последний символ соли bcrypt несёт только 2 бита, допустимы ".Oeu"
+    return [hasher.using(salt="".join(rng.choices(BCRYPT_ALPHABET, k=21)) + rng.choice(".Oeu"))
+            .hash(f"dataset-{index}") for index in range(count)]
+
+
+def _phrase(rng: random.Random, words: int, limit: int) -> str:
+    return " ".join(rng.choices(WORDS, k=words))[:limit].rstrip()
+
+
+class Dataset:
+    """Детерминированное построение пачек строк по номеру пачки."""
+
+    def __init__(self, seed: int, users: int, posts: int, batch_size: int, domain: str, password_hashes: list[str],
+                 skew: float):
+        self.seed = seed
+        self.users = users
+        self.posts = posts
+        self.batch_size = batch_size
+        self.domain = domain
+        self.password_hashes = password_hashes
+        self.skew = skew
+        self._authors: list[int] | None = None
+        self._author_weights: list[float] | None = None
+
+    def user_rows(self, batch: int) -> list[tuple]:
+        rng = _batch_rng(self.seed, "users", batch)
+        start = batch * self.batch_size + 1
+        rows = []
+        for user_id in range(start, min(start + self.batch_size, self.users + 1)):
+            role = ROLES[bisect(ROLE_WEIGHTS, rng.random() * ROLE_WEIGHTS[-1])]
+            access = ROLE_ACCESS[role]
+            username = f"{rng.choice(NAMES)}_{user_id}"
+            is_active = rng.random() >= INACTIVE_SHARE
+            access_id = bisect(access, rng.random() * access[-1]) + 1
+            deactivated_at = None if is_active else DATASET_EPOCH - timedelta(
+                seconds=rng.randrange(INACTIVE_DAYS * 86400))
+            rows.append((
+                user_id,
+                username,
+                f"user{user_id}@{self.domain}",
+                self.password_hashes[user_id % len(self.password_hashes)],
+                role.name,
+                is_active,
+                access_id,
+                deactivated_at,
+            ))
+        return rows
+
+    def post_rows(self, batch: int) -> list[tuple]:
+        authors, weights = self._author_distribution()
+        rng = _batch_rng(self.seed, "posts", batch)
+        start = batch * self.batch_size + 1
+        ids = range(start, min(start + self.batch_size, self.posts + 1))
+        owners = rng.choices(authors, cum_weights=weights, k=len(ids))
+        rows = []
+        for post_id, owner_id in zip(ids, owners):
+            rows.append((
+                post_id,
+                _phrase(rng, rng.randint(2, 6), 70).capitalize(),
+                _phrase(rng, rng.randint(5, 30), 250).capitalize(),
+                owner_id,
+                bisect(POST_ACCESS_WEIGHTS, rng.random() * POST_ACCESS_WEIGHTS[-1]) + 1,
+            ))
+        return rows
+
+    def _author_distribution(self) -> tuple[list[int], list[float]]:
+        """Пользователи в порядке убывания активности и накопленные веса Ципфа.
+
+        Ранги перемешаны, иначе самые активные авторы были бы первыми по id.
+        """
+        if self._authors is None:
+            self._authors = list(range(1, self.users + 1))
+            random.Random(f"{self.seed}:authors").shuffle(self._authors)
+            self._author_weights = list(itertools.accumulate(
+                rank ** -self.skew for rank in range(1, self.users + 1)))
+        return self._authors, self._author_weights
+
+
+async def _copy(conn: AsyncConnection, table: str, columns: tuple[str, ...], rows: list[tuple]) -> None:
+    raw = (await conn.get_raw_connection()).driver_connection
+    if conn.dialect.name == "postgresql":
+        await raw.copy_records_to_table(table, records=rows, columns=columns)
+    else:
+        placeholders = ", ".join("?" * len(columns))
+        await raw.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+async def _bump_counters(conn: AsyncConnection, rows: list[tuple]) -> None:
+    """Прибавляет значения к counters одним executemany (INSERT ... ON CONFLICT)."""
+    raw = (await conn.get_raw_connection()).driver_connection
+    if conn.dialect.name == "postgresql":
+        values = "$1, $2, $3"
+    else:
+        values = "?, ?, ?"
+    await raw.executemany(
+        f"INSERT INTO counters ({', '.join(COUNTER_COLUMNS)}) VALUES ({values}) "
+        "ON CONFLICT (scope, key) DO UPDATE SET value = counters.value + excluded.value", rows)
+
+
+async def _check_resume(conn: AsyncConnection, table, expected: tuple, columns: tuple[str, ...]) -> int:
+    """Сколько строк уже записано. Пачки пишутся по порядку, поэтому это max(id).
+
+    Первая строка сверяется с тем, что построил бы этот запуск: другой --seed
+    или чужие данные в таблице останавливают генерацию.
+    """
+    done = (await conn.execute(select(func.max(table.c.id)))).scalar() or 0
+    if done:
+        stored = (await conn.execute(select(*(table.c[name] for name in columns)).where(table.c.id == 1))).first()
+        if stored is None or tuple(_normalize(value) for value in stored) != tuple(map(_normalize, expected)):
+            raise SystemExit(f"Таблица {table.name} заполнена не этим генератором или с другими параметрами "
+                             f"(--seed, --users, --domain)")
+    return done
+
+
+def _normalize(value):
+    return value.name if isinstance(value, RoleEnum) else value
+
+
+async def _fill(dataset: Dataset, name: str, table, columns: tuple[str, ...], total: int, build,
+                counters) -> None:
+    batches = (total + dataset.batch_size - 1) // dataset.batch_size
+    async with db_helper.engine.connect() as conn:
+        done = await _check_resume(conn, table, build(0)[0], columns) if total else 0
+        await conn.commit()
+    if done >= total:
+        print(f"{name}: {done} из {total}, уже записано")
+        return
+    first = done // dataset.batch_size
+    if done % dataset.batch_size:
+        raise SystemExit(f"{name}: записано {done} строк, это не граница пачки - запускайте с тем же --batch-size")
+    started, written = time.perf_counter(), 0
+    for batch in range(first, batches):
+        rows = build(batch)
+        async with db_helper.engine.begin() as conn:
+            await _copy(conn, table.name, columns, rows)
+            await _bump_counters(conn, counters(rows))
+        written += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {done + written} из {total}, {written / elapsed:.0f} строк/с", file=sys.stderr)
+    print(f"{name}: записано {written} за {time.perf_counter() - started:.1f} с")
+
+
+def _user_counters(rows: list[tuple]) -> list[tuple]:
+    active = Tally(role for _, _, _, _, role, is_active, *_ in rows if is_active)
+    return [(CounterScopeEnum.role_active_users.name, role, count) for role, count in sorted(active.items())]
+
+
+def _post_counters(rows: list[tuple]) -> list[tuple]:
+    owners = Tally(row[3] for row in rows)
+    levels = Tally(row[4] for row in rows)
+    return ([(CounterScopeEnum.owner_posts.name, str(owner), count) for owner, count in sorted(owners.items())]
+            + [(CounterScopeEnum.access_posts.name, str(level), count) for level, count in sorted(levels.items())]
+            + [(CounterScopeEnum.feed_version.name, FEED_VERSION_KEY, 1)])
+
+
+async def _prepare() -> None:
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if not (await conn.execute(select(func.count()).select_from(EntryAccess))).scalar():
+            await conn.execute(insert(EntryAccess), [
+                {"id": level, "access_tittle": title, "description": description}
+                for level, title, description in ACCESS_LEVELS])
+
+
+async def _sync_sequences() -> None:
+    """После вставки с явными id последовательности PostgreSQL продолжают с max(id)."""
+    async with db_helper.engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            return
+        for table in ("users", "posts"):
+            await conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                    f"(SELECT coalesce(max(id), 1) FROM {table}))"))
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.posts and not args.users:
+        raise SystemExit("Посты без пользователей создать нельзя: укажите --users")
+    started = time.perf_counter()
+    hashes = password_hashes(args.seed, args.passwords)
+    print(f"хешей паролей: {len(hashes)} за {time.perf_counter() - started:.1f} с")
+    dataset = Dataset(args.seed, args.users, args.posts, args.batch_size, args.domain, hashes, args.skew)
+    try:
+        await _prepare()
+        await _fill(dataset, "users", User.__table__, USER_COLUMNS, args.users, dataset.user_rows, _user_counters)
+        await _fill(dataset, "posts", Post.__table__, POST_COLUMNS, args.posts, dataset.post_rows, _post_counters)
+        await _sync_sequences()
+    finally:
+        await db_helper.engine.dispose()
+    if shard_router is not None and args.posts:
+        print("Посты записаны в основную БД: перенесите их на шарды командой python -m scripts.reshard import-main")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--posts", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=50_000, help="строк в одной транзакции")
+    parser.add_argument("--skew", type=float, default=0.8, help="показатель закона Ципфа для авторов постов")
+    parser.add_argument("--passwords", type=int, default=8, help="различных паролей (и хешей bcrypt)")
+    parser.add_argument("--domain", default="dataset.example", help="домен почты пользователей")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,35 @@
+"""Сверка таблицы counters с фактическими данными.
+
+Запуск:
+    python -m scripts.reconcile_counters          # только отчёт о расхождениях
+    python -m scripts.reconcile_counters --fix    # отчёт и исправление
+
+Код возврата 1, если найдены расхождения (удобно для cron/CI).
+"""
+import argparse
+import asyncio
+import sys
+
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router
+from app.repositories import counter_repository
+
+
+async def main(fix: bool) -> int:
+    async with db_helper.session_factory() as session:
+        drift = await counter_repository.reconcile(session, fix=fix)
+    for item in drift:
+        shard = f"{item['shard']}:" if "shard" in item else ""
+        print(f"{shard}{item['scope']}[{item['key']}]: stored={item['stored']} actual={item['actual']}")
+    print(f"Расхождений: {len(drift)}" + (" (исправлено)" if fix and drift else ""))
+    await db_helper.engine.dispose()
+    if shard_router is not None:
+        await shard_router.dispose()
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка счётчиков постов и пользователей")
+    parser.add_argument("--fix", action="store_true", help="исправить найденные расхождения")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.fix)))
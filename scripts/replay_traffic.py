@@ -0,0 +1,255 @@
+"""Воспроизведение записанного трафика (CAPTURE_ENABLED) на локально запущенном приложении.
+
+Запуск:
+    python -m scripts.replay_traffic captures/ --url http://127.0.0.1:8000 --save run.json
+    python -m scripts.replay_traffic captures/ --speed 10 --concurrency 64 --baseline run.json
+
+Запросы отправляются в записанном порядке и с записанными интервалами,
+ускоренными в --speed раз (0 - без пауз), не больше --concurrency
+одновременно. Если приложение не успевает, расписание сдвигается, отставание
+выводится в итогах.
+
+Приложение должно работать на базе scripts/generate_dataset с теми же
+--users, --passwords и --domain: псевдоним записанного пользователя
+отображается на user<k>@<domain>, k = псевдоним % --users + 1, id
+пользователей в пути - на тот же k. Токены выпускаются ключом приложения
+(JWT_PRIVATE_KEY_PATH из .env) без входа через bcrypt, пароль в формах
+входа - пароль набора данных, регистрации получают новые адреса. Записи и
+удаления воспроизводятся как есть: запускайте на копии базы.
+
+Итоги по маршрутам: число запросов, ответы с другим статусом, чем при
+записи, p50/p95/p99 в мс. С --baseline выводится изменение p50 и p95
+относительно сохранённого (--save) прогона.
+"""
+import argparse
+import asyncio
+import http.cookiejar
+import json
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from app.auth.service.jwt_service import create_access_token
+from app.core.traffic_capture import read, segments
+
+MARKER = re.compile(r"<(email|id):([0-9a-f]+)>")
+LOGIN_ROUTES = frozenset({"POST /auth/login", "POST /login"})
+REGISTRATION_ROUTES = frozenset({"POST /auth/reg", "POST /register", "POST /user/"})
+# Пароль пользователей, созданных при воспроизведении регистраций
+REPLAY_PASSWORD = "replay-password"
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+class Remapper:
+    """Подставляет в обезличенные запросы пользователей и токены тестовой базы."""
+
+    def __init__(self, users: int, passwords: int, domain: str):
+        self.users = users
+        self.passwords = passwords
+        self.domain = domain
+        self.run = uuid.uuid4().hex[:8]
+        self.registered = 0
+        self.tokens: dict[int, str] = {}
+
+    def user(self, pseudonym: str) -> int:
+        return int(pseudonym, 16) % self.users + 1
+
+    def email(self, k: int) -> str:
+        return f"user{k}@{self.domain}"
+
+    def password(self, k: int) -> str:
+        return f"dataset-{k % self.passwords}"
+
+    def token(self, k: int) -> str:
+        if k not in self.tokens:
+            self.tokens[k] = create_access_token({"sub": self.email(k)})
+        return self.tokens[k]
+
+    def request(self, entry: dict) -> dict:
+        route = entry["route"]
+        registering = route in REGISTRATION_ROUTES
+        if registering:
+            self.registered += 1
+        login_user = None
+
+        def value(raw):
+            nonlocal login_user
+            if not isinstance(raw, str):
+                return raw
+            match = MARKER.fullmatch(raw)
+            if match is None:
+                return raw
+            k = self.user(match.group(2))
+            if match.group(1) == "id":
+                return str(k)
+            if registering:
+                return f"replay-{self.run}-{self.registered}@{self.domain}"
+            login_user = k
+            return self.email(k)
+
+        def password() -> str:
+            return self.password(login_user) if route in LOGIN_ROUTES and login_user else REPLAY_PASSWORD
+
+        def fields(pairs):
+            values = [(key, value(item)) for key, item in pairs]
+            return [(key, password() if item == "***" else item) for key, item in values]
+
+        request = {
+            "method": entry["method"],
+            "url": MARKER.sub(lambda match: value(match.group(0)), entry["path"]),
+            "headers": {},
+        }
+        if "query" in entry:
+            request["params"] = fields(entry["query"])
+        if "json" in entry:
+            request["json"] = self._json(entry["json"], value, password)
+        elif "form" in entry:
+            request["data"] = dict(fields(entry["form"]))
+        elif entry.get("size"):
+            # Тело не записано (не JSON и не форма или больше CAPTURE_MAX_BODY): того же размера
+            request["content"] = bytes(entry["size"])
+            request["headers"]["content-type"] = entry.get("type") or "application/octet-stream"
+        if "user" in entry and entry.get("auth"):
+            token = self.token(self.user(entry["user"]))
+            if entry["auth"] == "bearer":
+                request["headers"]["authorization"] = f"Bearer {token}"
+            else:
+                request["headers"]["cookie"] = f"access_token={token}"
+        return request
+
+    def _json(self, body, value, password):
+        if isinstance(body, dict):
+            return {key: password() if key == "password" and item == "***" else self._json(item, value, password)
+                    for key, item in body.items()}
+        if isinstance(body, list):
+            return [self._json(item, value, password) for item in body]
+        return value(body)
+
+
+async def replay(entries: list[dict], remapper: Remapper, args: argparse.Namespace) -> dict:
+    latencies: dict[str, list[float]] = {}
+    mismatched: dict[str, int] = {}
+    errors: dict[str, int] = {}
+    lag = 0.0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Клиент не сохраняет cookie ответов: у каждого запроса только записанная аутентификация
+    cookies = http.cookiejar.CookieJar(policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits, cookies=cookies) as client:
+        async def send(entry: dict, request: dict) -> None:
+            route = entry["route"]
+            try:
+                started = time.perf_counter()
+                response = await client.request(**request)
+                latencies.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+                if response.status_code != entry["status"]:
+                    mismatched[route] = mismatched.get(route, 0) + 1
+            except httpx.HTTPError:
+                errors[route] = errors.get(route, 0) + 1
+            finally:
+                semaphore.release()
+
+        tasks = set()
+        started = time.perf_counter()
+        for entry in entries:
+            request = remapper.request(entry)
+            if args.speed:
+                delay = started + entry["t"] / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await semaphore.acquire()
+            if args.speed:
+                lag = max(lag, time.perf_counter() - started - entry["t"] / args.speed)
+            task = asyncio.create_task(send(entry, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    routes = {}
+    for route in sorted(set(latencies) | set(errors)):
+        values = latencies.get(route, [])
+        routes[route] = {
+            "count": len(values) + errors.get(route, 0),
+            "mismatched": mismatched.get(route, 0),
+            "errors": errors.get(route, 0),
+            "p50_ms": round(percentile(values, 0.5), 2),
+            "p95_ms": round(percentile(values, 0.95), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+        }
+    return {
+        "capture": str(args.capture),
+        "requests": len(entries),
+        "speed": args.speed,
+        "concurrency": args.concurrency,
+        "elapsed": round(elapsed, 3),
+        "lag": round(lag, 3),
+        "routes": routes,
+    }
+
+
+def _delta(current: float, previous: float | None) -> str:
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def report(result: dict, baseline: dict | None) -> None:
+    width = max([len(route) for route in result["routes"]] + [7])
+    header = f"{'маршрут':<{width}} {'запросов':>8} {'≠статус':>7} {'ошибок':>6} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline is not None:
+        header += f" {'Δp50':>6} {'Δp95':>6}"
+    print(header)
+    for route, stats in result["routes"].items():
+        line = (f"{route:<{width}} {stats['count']:>8} {stats['mismatched']:>7} {stats['errors']:>6} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+        if baseline is not None:
+            previous = baseline["routes"].get(route, {})
+            line += (f" {_delta(stats['p50_ms'], previous.get('p50_ms')):>6}"
+                     f" {_delta(stats['p95_ms'], previous.get('p95_ms')):>6}")
+        print(line)
+    print(f"{result['requests']} запросов за {result['elapsed']:.1f} с "
+          f"({result['requests'] / result['elapsed']:.0f} запросов/с), "
+          f"отставание от расписания до {result['lag']:.2f} с")
+
+
+def main(args: argparse.Namespace) -> None:
+    paths = segments(args.capture) if args.capture.is_dir() else [args.capture]
+    entries = read(paths)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        raise SystemExit(f"В {args.capture} нет записанных запросов")
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    remapper = Remapper(args.users, args.passwords, args.domain)
+    print(f"запросов: {len(entries)} из {len(paths)} сегментов, "
+          f"записано за {entries[-1]['t']:.1f} с", file=sys.stderr)
+    result = asyncio.run(replay(entries, remapper, args))
+    report(result, baseline)
+    if args.save:
+        args.save.write_text(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", type=Path, help="каталог записи (CAPTURE_DIR) или файл сегмента")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение относительно записи, 0 - без пауз")
+    parser.add_argument("--concurrency", type=int, default=32, help="одновременных запросов не больше")
+    parser.add_argument("--timeout", type=float, default=30.0, help="тайм-аут запроса, с")
+    parser.add_argument("--limit", type=int, default=0, help="воспроизвести только первые N запросов")
+    parser.add_argument("--users", type=int, default=1_000_000, help="как в scripts.generate_dataset")
+    parser.add_argument("--passwords", type=int, default=8, help="как в scripts.generate_dataset")
+    parser.add_argument("--domain", default="dataset.example", help="как в scripts.generate_dataset")
+    parser.add_argument("--save", type=Path, help="сохранить итоги прогона в JSON")
+    parser.add_argument("--baseline", type=Path, help="итоги предыдущего прогона (--save) для сравнения")
+    main(parser.parse_args())
@@ -0,0 +1,239 @@
+"""Управление шардами постов (POST_SHARDS в .env).
+
+Команды:
+    python -m scripts.reshard status
+        количество постов и владельцев на каждом шарде, закреплённые владельцы
+    python -m scripts.reshard import-main
+        перенос постов из основной БД на шарды при включении шардирования
+    python -m scripts.reshard pin --shards '{"s0": "...", "s1": "...", "s2": "..."}'
+        перед сменой списка шардов: закрепляет на текущих шардах владельцев,
+        которых новое кольцо отправит на другой шард
+    python -m scripts.reshard move --owner 42 --to s2
+        онлайн-перенос постов одного владельца
+    python -m scripts.reshard rebalance
+        переносит всех закреплённых владельцев на их шард по кольцу
+
+Порядок включения шардирования: import-main (первым делом резервирует id
+постов основной БД) -> запуск приложения с POST_SHARDS -> повторный
+import-main для постов, созданных в основной БД во время переноса. Пока id
+не зарезервированы, приложение с POST_SHARDS отвечает на создание постов 503.
+
+Порядок добавления шарда: pin с новым списком -> деплой нового POST_SHARDS -> rebalance.
+
+Перенос владельца: владелец помечается moving (его записи получают 503 с
+Retry-After, чтение продолжается со старого шарда), после ожидания TTL кеша
+размещений посты копируются пачками, затем чтение переключается на новый шард,
+и после ещё одного TTL посты удаляются со старого. Повторный запуск после сбоя
+безопасен: уже скопированные id пропускаются.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter as Tally
+
+from sqlalchemy import select, delete, insert, func, distinct, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.db_helper import db_helper
+from app.core.sharding import shard_router, HashRing, Shard
+from app.models import Post, PostShardPlacement, PostIdAllocation
+from app.models.counter import CounterScopeEnum
+from app.repositories import counter_repository
+
+POST_COLUMNS = (Post.id, Post.tittle, Post.description, Post.owner_id, Post.required_access_id)
+
+
+async def _bump_posts(session: AsyncSession, rows, sign: int) -> None:
+    owners = Tally(row.owner_id for row in rows)
+    levels = Tally(row.required_access_id for row in rows)
+    for owner_id, count in owners.items():
+        await counter_repository.bump(session, CounterScopeEnum.owner_posts, owner_id, sign * count)
+    for level, count in levels.items():
+        await counter_repository.bump(session, CounterScopeEnum.access_posts, level, sign * count)
+
+
+async def _insert_missing(session: AsyncSession, rows) -> int:
+    ids = [row.id for row in rows]
+    existing = dict((await session.execute(select(Post.id, Post.owner_id).where(Post.id.in_(ids)))).all())
+    # Уже скопированный пост того же владельца пропускается, чужой пост с тем же id - потеря данных
+    taken = [row.id for row in rows if existing.get(row.id, row.owner_id) != row.owner_id]
+    if taken:
+        raise SystemExit(f"id постов {taken[:10]} на шарде заняты постами других владельцев: "
+                         f"приложение выдало их до import-main")
+    missing = [row for row in rows if row.id not in existing]
+    if missing:
+        await session.execute(insert(Post), [dict(row._mapping) for row in missing])
+        await _bump_posts(session, missing, 1)
+    await session.commit()
+    return len(missing)
+
+
+async def _set_placement(owner_id: int, shard: str | None, moving: bool = False, refresh: bool = True) -> None:
+    async with db_helper.session_factory() as session:
+        placement = (await session.execute(
+            select(PostShardPlacement).where(PostShardPlacement.owner_id == owner_id))).scalars().first()
+        if shard is None:
+            if placement is not None:
+                await session.delete(placement)
+        elif placement is None:
+            session.add(PostShardPlacement(owner_id=owner_id, shard=shard, moving=moving))
+        else:
+            placement.shard, placement.moving = shard, moving
+        await session.commit()
+    if refresh:
+        await shard_router.refresh_placements(force=True)
+
+
+async def copy_owner(owner_id: int, source: Shard, target: Shard, batch_size: int) -> int:
+    copied, last_id = 0, 0
+    async with source.session_factory() as source_session, target.session_factory() as target_session:
+        while True:
+            rows = (await source_session.execute(
+                select(*POST_COLUMNS).where(Post.owner_id == owner_id, Post.id > last_id)
+                .order_by(Post.id).limit(batch_size))).all()
+            if not rows:
+                return copied
+            copied += await _insert_missing(target_session, rows)
+            last_id = rows[-1].id
+
+
+async def purge_owner(owner_id: int, shard: Shard, batch_size: int) -> int:
+    removed = 0
+    async with shard.session_factory() as session:
+        while True:
+            rows = (await session.execute(
+                select(*POST_COLUMNS).where(Post.owner_id == owner_id).order_by(Post.id).limit(batch_size))).all()
+            if not rows:
+                return removed
+            await session.execute(delete(Post).where(Post.id.in_([row.id for row in rows])))
+            await _bump_posts(session, rows, -1)
+            await session.commit()
+            removed += len(rows)
+
+
+async def move_owner(owner_id: int, target_name: str, batch_size: int) -> None:
+    await shard_router.refresh_placements(force=True)
+    source = await shard_router.shard_for(owner_id)
+    target = shard_router.shards[target_name]
+    if source is target:
+        print(f"Владелец {owner_id} уже на шарде {target_name}")
+        return
+    wait = shard_router.placement_ttl + 1
+
+    await _set_placement(owner_id, source.name, moving=True)
+    await asyncio.sleep(wait)  # все воркеры увидели moving и перестали писать
+    copied = await copy_owner(owner_id, source, target, batch_size)
+
+    home = shard_router.ring.node_for(owner_id)
+    await _set_placement(owner_id, None if home == target_name else target_name)
+    await asyncio.sleep(wait)  # все воркеры читают с нового шарда
+    removed = await purge_owner(owner_id, source, batch_size)
+    print(f"Владелец {owner_id}: {source.name} -> {target_name}, скопировано {copied}, удалено {removed}")
+
+
+async def rebalance(batch_size: int) -> None:
+    await shard_router.refresh_placements(force=True)
+    for owner_id, (shard, _) in sorted(shard_router.placements.items()):
+        home = shard_router.ring.node_for(owner_id)
+        if shard != home:
+            await move_owner(owner_id, home, batch_size)
+        else:
+            await _set_placement(owner_id, None)
+
+
+async def pin(new_shards: dict[str, str]) -> None:
+    new_ring = HashRing(list(new_shards), shard_router.vnodes)
+    await shard_router.refresh_placements(force=True)
+    pinned = 0
+    for name, shard in shard_router.shards.items():
+        async with shard.session_factory() as session:
+            owners = (await session.execute(select(distinct(Post.owner_id)))).scalars().all()
+        for owner_id in owners:
+            if owner_id not in shard_router.placements and new_ring.node_for(owner_id) != name:
+                await _set_placement(owner_id, name, refresh=False)
+                pinned += 1
+    print(f"Закреплено владельцев: {pinned}")
+
+
+async def reserve_post_ids(session: AsyncSession) -> int:
+    """Поднимает выдачу id постов (PostIdAllocation) выше всех id постов основной БД."""
+    floor = (await session.execute(select(func.max(Post.id)))).scalar() or 0
+    allocated = (await session.execute(select(func.max(PostIdAllocation.id)))).scalar() or 0
+    if floor > allocated:
+        await session.execute(insert(PostIdAllocation).values(id=floor))
+    if session.bind.dialect.name == "postgresql":
+        # Явно вставленный id не двигает последовательность
+        await session.execute(text("SELECT setval(pg_get_serial_sequence('post_id_allocations', 'id'), "
+                                   "(SELECT coalesce(max(id), 1) FROM post_id_allocations))"))
+    await session.commit()
+    return floor
+
+
+async def import_main(batch_size: int) -> None:
+    last_id, imported = 0, 0
+    async with db_helper.session_factory() as main_session:
+        # До копирования: посты, созданные на шардах во время импорта, не займут id постов основной БД
+        await reserve_post_ids(main_session)
+        while True:
+            rows = (await main_session.execute(
+                select(*POST_COLUMNS).where(Post.id > last_id).order_by(Post.id).limit(batch_size))).all()
+            if not rows:
+                break
+            by_shard: dict[str, list] = {}
+            for row in rows:
+                by_shard.setdefault((await shard_router.shard_for(row.owner_id)).name, []).append(row)
+            for name, shard_rows in by_shard.items():
+                async with shard_router.shards[name].session_factory() as shard_session:
+                    imported += await _insert_missing(shard_session, shard_rows)
+            last_id = rows[-1].id
+        # Посты, созданные в основной БД во время импорта
+        await reserve_post_ids(main_session)
+    print(f"Импортировано постов: {imported}")
+
+
+async def status() -> None:
+    await shard_router.refresh_placements(force=True)
+    for name, shard in shard_router.shards.items():
+        async with shard.session_factory() as session:
+            posts, owners = (await session.execute(
+                select(func.count(), func.count(distinct(Post.owner_id))).select_from(Post))).one()
+        print(f"{name}: постов {posts}, владельцев {owners}")
+    for owner_id, (shard, moving) in sorted(shard_router.placements.items()):
+        print(f"  владелец {owner_id} -> {shard}{' (переносится)' if moving else ''}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await shard_router.create_all()
+        if args.command == "status":
+            await status()
+        elif args.command == "import-main":
+            await import_main(args.batch_size)
+        elif args.command == "pin":
+            await pin(json.loads(args.shards))
+        elif args.command == "move":
+            await move_owner(args.owner, args.to, args.batch_size)
+        elif args.command == "rebalance":
+            await rebalance(args.batch_size)
+    finally:
+        await shard_router.dispose()
+        await db_helper.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    commands.add_parser("import-main")
+    commands.add_parser("rebalance")
+    pin_parser = commands.add_parser("pin")
+    pin_parser.add_argument("--shards", required=True, help="новый POST_SHARDS в формате JSON")
+    move_parser = commands.add_parser("move")
+    move_parser.add_argument("--owner", type=int, required=True)
+    move_parser.add_argument("--to", required=True)
+    parsed = parser.parse_args()
+    if shard_router is None:
+        sys.exit("Шардирование выключено: задайте POST_SHARDS")
+    asyncio.run(main(parsed))
@@ -0,0 +1,194 @@
+"""Запуск приложения в production: мастер с предзагрузкой и воркеры через fork.
+
+Мастер один раз импортирует и прогревает приложение, замораживает объекты
+сборщика мусора (gc.freeze) и открывает слушающий сокет, после чего
+порождает воркеры через fork. Страницы памяти с кодом и данными
+приложения остаются общими между воркерами, пока их не изменят
+(copy-on-write), поэтому каждый следующий воркер почти не добавляет памяти.
+
+Воркер обслуживает до SERVER_MAX_REQUESTS запросов (с разбросом
+SERVER_MAX_REQUESTS_JITTER, чтобы воркеры не перезапускались разом),
+затем корректно завершается, и мастер порождает замену. SIGTERM/SIGINT
+мастеру передаются воркерам, мастер ждёт их завершения.
+
+По умолчанию воркер один (SERVER_WORKERS=1): состояние в памяти процесса
+у каждого воркера своё. Кольца ленты сверяют версию постов в БД
+(FEED_VERSION_TTL), а события SSE и ограничитель нагрузки остаются
+в пределах воркера.
+
+Запуск:
+    python -m serve --port 8000
+    python -m serve --workers 4
+"""
+import argparse
+import gc
+import logging
+import math
+import os
+import random
+import signal
+import socket
+import time
+
+import uvicorn
+
+from app.core.config import settings
+
+logger = logging.getLogger("serve")
+
+try:
+    import uvloop  # noqa: F401
+    LOOP = "uvloop"
+except ImportError:  # uvloop и httptools необязательны, без них - asyncio и h11
+    LOOP = "asyncio"
+
+try:
+    import httptools  # noqa: F401
+    HTTP = "httptools"
+except ImportError:
+    HTTP = "h11"
+
+# Воркер, упавший быстрее этого, перезапускается с паузой, чтобы не крутить fork в цикле
+MIN_WORKER_LIFETIME = 1.0
+
+
+def cpu_count() -> int:
+    """Доступные процессу ядра: маска affinity и квота CPU cgroup v2 (лимит контейнера)."""
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def load_app():
+    """Импорт и прогрев в мастере: всё, что сделано здесь, воркеры получают готовым."""
+    from main import app
+    from app.controllers.web_controller import templates, streaming_templates
+
+    app.openapi()
+    for environment in (templates.env, streaming_templates.env):
+        for name in environment.list_templates():
+            environment.get_template(name)
+    return app
+
+
+def bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, workers: int, max_requests: int, jitter: int,
+                 graceful_timeout: float):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, float] = {}  # pid -> время запуска
+        self.stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0 and time.monotonic() - started < MIN_WORKER_LIFETIME:
+                logger.error("Воркер %s упал сразу после запуска (код %s)", pid, code)
+                time.sleep(MIN_WORKER_LIFETIME)
+            else:
+                logger.info("Воркер %s завершился (код %s), запускаем замену", pid, code)
+            self.spawn()
+        self.sock.close()
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        code = 0
+        try:
+            self.serve_worker()
+        except BaseException:
+            logger.exception("Ошибка воркера")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def serve_worker(self) -> None:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        max_requests = self.max_requests + random.randint(0, self.jitter) if self.max_requests else None
+        config = uvicorn.Config(self.app, loop=LOOP, http=HTTP, lifespan="on", limit_max_requests=max_requests,
+                                timeout_graceful_shutdown=self.graceful_timeout)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        signal.signal(signal.SIGALRM, self.kill)
+        signal.alarm(int(self.graceful_timeout) + 5)
+
+    def kill(self, signum, frame) -> None:
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def main(host: str, port: int, workers: int, max_requests: int, jitter: int, graceful_timeout: float,
+         backlog: int) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(name)s %(message)s")
+    workers = workers or cpu_count()
+    # Пока импортируется приложение, сборка мусора не нужна: всё созданное переживёт fork
+    gc.disable()
+    app = load_app()
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    sock = bind(host, port, backlog)
+    logger.info("Слушаем %s:%s, воркеров: %s, цикл событий: %s, HTTP: %s", host, port, workers, LOOP, HTTP)
+    Master(app, sock, workers, max_requests, jitter, graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers,
+                        help="число воркеров (по умолчанию 1), 0 - по числу доступных ядер")
+    parser.add_argument("--max-requests", type=int, default=settings.server_max_requests,
+                        help="перезапуск воркера после стольких запросов, 0 - без перезапуска")
+    parser.add_argument("--max-requests-jitter", type=int, default=settings.server_max_requests_jitter)
+    parser.add_argument("--graceful-timeout", type=float, default=settings.server_graceful_timeout)
+    parser.add_argument("--backlog", type=int, default=2048)
+    args = parser.parse_args()
+    main(args.host, args.port, args.workers, args.max_requests, args.max_requests_jitter, args.graceful_timeout,
+         args.backlog)
@@ -1,4 +1,4 @@
 #!/bin/bash
 : "${PORT:=8000}"
 
-uvicorn main:app --host 0.0.0.0 --port $PORT
+python -m serve --host 0.0.0.0 --port $PORT
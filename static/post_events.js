@@ -0,0 +1,88 @@
+// Обновление списка постов на главной странице по событиям /events/posts (SSE)
+(function () {
+    "use strict";
+
+    var list = document.getElementById("posts");
+    if (!list || !window.EventSource) {
+        return;
+    }
+    var access = Number(list.dataset.access);
+    var authors = {};
+
+    list.querySelectorAll(".post-card").forEach(function (card) {
+        var author = card.querySelector(".post-author");
+        if (author) {
+            authors[card.dataset.ownerId] = author.textContent;
+        }
+    });
+
+    function renderCard(post) {
+        var card = document.createElement("div");
+        card.className = "post-card";
+        card.id = "post-" + post.id;
+        card.dataset.postId = post.id;
+        card.dataset.ownerId = post.owner_id;
+
+        var title = document.createElement("h2");
+        title.textContent = post.tittle;
+        card.appendChild(title);
+
+        if (authors[post.owner_id]) {
+            var author = document.createElement("span");
+            author.className = "post-author";
+            author.textContent = authors[post.owner_id];
+            card.appendChild(author);
+        }
+        if (access >= post.required_access_id) {
+            var description = document.createElement("p");
+            description.textContent = post.description;
+            card.appendChild(description);
+        } else {
+            var link = document.createElement("a");
+            link.href = "/posts/" + post.id;
+            link.textContent = "Смотреть описание";
+            card.appendChild(link);
+        }
+        return card;
+    }
+
+    // Карточки идут по убыванию id; пост старше последней карточки за пределами страницы
+    function place(card, postId) {
+        var cards = list.querySelectorAll(".post-card");
+        for (var i = 0; i < cards.length; i++) {
+            if (Number(cards[i].dataset.postId) < postId) {
+                list.insertBefore(card, cards[i]);
+                return;
+            }
+        }
+        if (cards.length === 0) {
+            list.appendChild(card);
+        }
+    }
+
+    function upsert(event) {
+        var post = JSON.parse(event.data);
+        var card = renderCard(post);
+        var existing = document.getElementById("post-" + post.id);
+        if (existing) {
+            existing.replaceWith(card);
+        } else {
+            place(card, post.id);
+        }
+    }
+
+    var source = new EventSource(list.dataset.events);
+    source.addEventListener("created", upsert);
+    source.addEventListener("updated", upsert);
+    source.addEventListener("deleted", function (event) {
+        var existing = document.getElementById("post-" + JSON.parse(event.data).id);
+        if (existing) {
+            existing.remove();
+        }
+    });
+    // Пропущенных событий уже нет в журнале сервера: страницу проще перезагрузить
+    source.addEventListener("reset", function () {
+        source.close();
+        window.location.reload();
+    });
+})();
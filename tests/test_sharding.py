@@ -0,0 +1,160 @@
+"""Маршрутизация постов по шардам и решардинг на нескольких локальных SQLite-файлах.
+
+Настройки читаются при импорте app, поэтому окружение задаётся до импорта.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix="post-shards-"))
+SHARDS = {name: f"sqlite+aiosqlite:///{DATA_DIR / name}.db" for name in ("s0", "s1", "s2")}
+os.environ.update({
+    "DB_URL": f"sqlite+aiosqlite:///{DATA_DIR / 'main.db'}",
+    "POST_SHARDS": json.dumps(SHARDS),
+    "POST_SHARD_PLACEMENT_TTL": "0",
+    "JWT_PRIVATE_KEY_PATH": str(DATA_DIR / "unused"),
+    "JWT_PUBLIC_KEY_PATH": str(DATA_DIR / "unused"),
+    "AUDIT_ENABLED": "false",
+})
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import select, insert, func  # noqa: E402
+
+from app.core.db_helper import db_helper  # noqa: E402
+from app.core.sharding import HashRing, shard_router  # noqa: E402
+from app.models import Base, Post  # noqa: E402
+from app.models.counter import CounterScopeEnum  # noqa: E402
+from app.repositories import counter_repository, post_repository  # noqa: E402
+from app.schemas.post import PostCreate  # noqa: E402
+from scripts import reshard  # noqa: E402
+
+MAIN_POSTS = 30
+OWNERS = 10
+
+
+def run(coro):
+    """Каждый тест - свой цикл событий: пулы соединений закрываются в конце."""
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await shard_router.dispose()
+            await db_helper.engine.dispose()
+
+    return asyncio.run(wrapper())
+
+
+async def shard_posts() -> dict[str, list[tuple[int, int]]]:
+    result = {}
+    for name, shard in shard_router.shards.items():
+        async with shard.session_factory() as session:
+            result[name] = (await session.execute(select(Post.id, Post.owner_id).order_by(Post.id))).all()
+    return result
+
+
+async def create_post(owner_id: int) -> Post:
+    async with db_helper.session_factory() as session:
+        return await post_repository.create_post(session, PostCreate(tittle="t", description="d"), 1, owner_id)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def databases():
+    async def create():
+        async with db_helper.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Post), [
+                {"id": post_id, "tittle": f"main {post_id}", "description": "d",
+                 "owner_id": post_id % OWNERS + 1, "required_access_id": post_id % 3 + 1}
+                for post_id in range(1, MAIN_POSTS + 1)])
+        await shard_router.create_all()
+
+    run(create())
+
+
+def test_ring_moves_only_keys_of_new_shard():
+    before = HashRing(["s0", "s1", "s2"])
+    after = HashRing(["s0", "s1", "s2", "s3"])
+    moved = [key for key in range(10000) if before.node_for(key) != after.node_for(key)]
+    assert all(after.node_for(key) == "s3" for key in moved)
+    assert 0.15 < len(moved) / 10000 < 0.35
+
+
+def test_writes_refused_until_import_reserves_ids():
+    with pytest.raises(HTTPException) as error:
+        run(create_post(1))
+    assert error.value.status_code == 503
+
+
+def test_import_main_routes_posts_to_home_shards():
+    run(reshard.import_main(batch_size=7))
+    placed = run(shard_posts())
+    assert sorted(post_id for posts in placed.values() for post_id, _ in posts) == list(range(1, MAIN_POSTS + 1))
+    for name, posts in placed.items():
+        assert all(shard_router.home_shard(owner_id).name == name for _, owner_id in posts)
+
+    async def owner_counters():
+        async with db_helper.session_factory() as session:
+            return {owner_id: await counter_repository.get_counter(session, CounterScopeEnum.owner_posts, owner_id)
+                    for owner_id in range(1, OWNERS + 1)}
+
+    assert run(owner_counters()) == {owner_id: MAIN_POSTS // OWNERS for owner_id in range(1, OWNERS + 1)}
+    # Повторный запуск ничего не дублирует
+    run(reshard.import_main(batch_size=7))
+    assert run(shard_posts()) == placed
+
+
+def test_new_posts_get_fresh_ids_on_owner_shard():
+    post = run(create_post(3))
+    assert post.id > MAIN_POSTS
+    placed = run(shard_posts())
+    assert (post.id, 3) in placed[shard_router.home_shard(3).name]
+
+    async def read():
+        async with db_helper.session_factory() as session:
+            return await post_repository.get_posts(session, 3, 3)
+
+    assert post.id in [row.id for row in run(read())]
+
+
+def test_move_owner_between_shards():
+    owner_id = 4
+    source = shard_router.home_shard(owner_id).name
+    target = next(name for name in SHARDS if name != source)
+    expected = sorted(post_id for post_id, owner in run(shard_posts())[source] if owner == owner_id)
+
+    run(reshard.move_owner(owner_id, target, batch_size=2))
+    placed = run(shard_posts())
+    assert sorted(post_id for post_id, owner in placed[target] if owner == owner_id) == expected
+    assert not [post_id for post_id, owner in placed[source] if owner == owner_id]
+
+    async def read():
+        async with db_helper.session_factory() as session:
+            return [row.id for row in await post_repository.get_posts(session, owner_id, 3)]
+
+    assert sorted(run(read())) == expected
+
+
+def test_import_refuses_id_taken_by_other_owner():
+    async def collide():
+        async with db_helper.session_factory() as session:
+            await session.execute(insert(Post).values(id=MAIN_POSTS + 1000, tittle="main", description="d",
+                                                      owner_id=1, required_access_id=1))
+            await session.commit()
+        async with shard_router.home_shard(1).session_factory() as session:
+            await session.execute(insert(Post).values(id=MAIN_POSTS + 1000, tittle="shard", description="d",
+                                                      owner_id=2, required_access_id=1))
+            await session.commit()
+        await reshard.import_main(batch_size=100)
+
+    with pytest.raises(SystemExit):
+        run(collide())
+
+    async def main_count():
+        async with db_helper.session_factory() as session:
+            return (await session.execute(select(func.count()).select_from(Post))).scalar()
+
+    assert run(main_count()) == MAIN_POSTS + 1